@@ -64,8 +64,11 @@ urlpatterns = [
     path('teacher/classes/<int:class_id>/attendance/<str:date>/edit/', views.attendance_edit, name='attendance_edit'),
     path('teacher/classes/<int:class_id>/attendance/<str:date>/delete/', views.attendance_delete, name='attendance_delete'),
     path('teacher/classes/<int:class_id>/payment-settings/', views.payment_settings_edit, name='payment_settings_edit'),
+    path('teacher/debts/', views.debt_report, name='debt_report'),
+    path('teacher/classes/<int:class_id>/debts/', views.debt_report, name='class_debt_report'),
     path('teacher/classes/<int:class_id>/games/', views.configure_class_games, name='configure_class_games'),
     path('teacher/attendance/update/', views.attendance_update, name='attendance_update'),
+    path('teacher/attendance/update/batch/', views.attendance_update_batch, name='attendance_update_batch'),
     path('teacher/classes/<int:class_id>/attendance/add-date/', views.attendance_add_date, name='attendance_add_date'),
     path('teacher/classes/<int:class_id>/attendance/delete-date/', views.attendance_delete_date, name='attendance_delete_date'),
     
@@ -95,6 +98,16 @@ urlpatterns = [
 
     path('tricks/<int:mode>/', views.tricks, name='tricks'),
 
+    # Пакеты примеров для раунда на клиенте и приём результатов раунда
+    path('multiplication_choose/pack/', views.problem_pack, {'game': 'multiplication_choose'}, name='multiplication_choose_pack'),
+    path('multiplication_choose/results/', views.problem_pack_results, {'game': 'multiplication_choose'}, name='multiplication_choose_results'),
+    path('multiplication_to_20/pack/', views.problem_pack, {'game': 'multiplication_to_20'}, name='multiplication_to_20_pack'),
+    path('multiplication_to_20/results/', views.problem_pack_results, {'game': 'multiplication_to_20'}, name='multiplication_to_20_results'),
+    path('multiplication_base/pack/', views.problem_pack, {'game': 'multiplication_base'}, name='multiplication_base_pack'),
+    path('multiplication_base/results/', views.problem_pack_results, {'game': 'multiplication_base'}, name='multiplication_base_results'),
+    path('tricks/pack/', views.problem_pack, {'game': 'tricks'}, name='tricks_pack'),
+    path('tricks/results/', views.problem_pack_results, {'game': 'tricks'}, name='tricks_results'),
+
     path('simply/<int:mode>/', views.simply, name='simply'),
 
     path('flashcards/<int:mode>/', views.flashcards, name='flashcards'),
@@ -102,6 +115,7 @@ urlpatterns = [
     path('multiplication_table/', views.multiplication_table, name='multiplication_table'),
     
     path('brothers_game/', views.brothers_game, name='brothers_game'),
+    path('brothers_game/chain/', views.brothers_chain, name='brothers_chain'),
     
     # Редирект для обратной совместимости
     path('flashcards/', lambda request: redirect('flashcards', mode=1), name='flashcards_redirect'),
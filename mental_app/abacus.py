@@ -0,0 +1,36 @@
+"""
+Кодирование чисел в колонки абакуса.
+
+Колонка — пара (верхние косточки, нижние косточки), где 1 означает косточку
+на своем месте, а 0 — пустое место, куда косточка сдвинута к перекладине.
+Для каждой цифры колонка одна и та же, поэтому все колонки берутся из
+неизменяемой таблицы BEAD_PATTERNS и не создаются заново.
+"""
+
+# Колонки абакуса для цифр 0-9: верх — пятерка, низ — четыре единицы
+BEAD_PATTERNS = (
+    ((1, 0), (0, 1, 1, 1, 1)),  # 0
+    ((1, 0), (1, 0, 1, 1, 1)),  # 1
+    ((1, 0), (1, 1, 0, 1, 1)),  # 2
+    ((1, 0), (1, 1, 1, 0, 1)),  # 3
+    ((1, 0), (1, 1, 1, 1, 0)),  # 4
+    ((0, 1), (0, 1, 1, 1, 1)),  # 5
+    ((0, 1), (1, 0, 1, 1, 1)),  # 6
+    ((0, 1), (1, 1, 0, 1, 1)),  # 7
+    ((0, 1), (1, 1, 1, 0, 1)),  # 8
+    ((0, 1), (1, 1, 1, 1, 0)),  # 9
+)
+
+# Та же таблица по символу цифры — для кодирования через str(number)
+_PATTERNS_BY_CHAR = {str(digit): pattern for digit, pattern in enumerate(BEAD_PATTERNS)}
+
+
+def encode_number(number):
+    """Колонки абакуса для числа от старшего разряда к младшему"""
+    return tuple(_PATTERNS_BY_CHAR[char] for char in str(abs(int(number))))
+
+
+def encode_numbers(numbers):
+    """Колонки абакуса для списка чисел (по одному кортежу колонок на число)"""
+    patterns = _PATTERNS_BY_CHAR
+    return [tuple(patterns[char] for char in str(abs(int(number)))) for number in numbers]
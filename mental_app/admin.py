@@ -4,7 +4,7 @@ from django.contrib.auth.models import User
 from .models import (
     Students, Class, TeacherProfile, StudentAccount, 
     Homework, PaymentSettings, ClassGameAccess, 
-    Attendance, GameSettings
+    Attendance, GameSettings, StudentMonthBalance, GameResult
 )
 
 class TeacherProfileAdmin(admin.ModelAdmin):
@@ -98,5 +98,32 @@ class GameSettingsAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__first_name', 'user__last_name']
     readonly_fields = ['created_at', 'updated_at']
 
+@admin.register(StudentMonthBalance)
+class StudentMonthBalanceAdmin(admin.ModelAdmin):
+    """Только просмотр: балансы пересчитываются из посещений (rebuild_month_balances)"""
+    list_display = ['student', 'class_group', 'year', 'month', 'lessons', 'attended', 'paid', 'carried_over', 'amount_due']
+    list_filter = ['year', 'month', 'class_group']
+    search_fields = ['student__name', 'student__surname']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(GameResult)
+class GameResultAdmin(admin.ModelAdmin):
+    """Только просмотр: результаты записывают игры"""
+    list_display = ['student', 'game', 'correct_count', 'problem_count', 'duration', 'played_at']
+    list_filter = ['game', 'played_at']
+    search_fields = ['student__name', 'student__surname']
+    list_select_related = ['student__student_class__teacher__user']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Отменяем регистрацию стандартной модели User, так как мы будем использовать TeacherProfile
 # admin.site.unregister(User)
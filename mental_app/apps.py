@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MentalAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mental_app'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (сброс кешей)
+        from . import signals  # noqa: F401
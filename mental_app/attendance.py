@@ -0,0 +1,415 @@
+"""
+Создание записей посещения (ученик × дата занятия) для класса.
+
+Вместо Attendance.objects.create() на каждого ученика и каждую дату строки
+собираются в памяти и записываются пакетно одним bulk_create в одной
+транзакции: месяц занятий для класса — это один-два INSERT, а не сотни
+отдельных запросов (в SQLite каждый из них — отдельная запись на диск).
+"""
+import calendar
+from collections import namedtuple
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from .balances import balance_key, mark_balances_dirty, student_balances
+from .dashboard import mark_teacher_stats_dirty
+from .models import Attendance, MonthlySchedule, Students
+
+
+
+def attendance_written(rows):
+    """
+    Пакетные bulk_create/bulk_update не отправляют сигналы — балансы и
+    статистику учителей по записанным строкам отмечаем сами
+    """
+    rows = list(rows)
+    mark_balances_dirty(balance_key(attendance) for attendance in rows)
+    mark_teacher_stats_dirty(class_ids={attendance.class_group_id for attendance in rows})
+
+
+def create_attendance_rows(class_obj, dates, monthly_schedule=None, is_present=False, student_ids=None):
+    """
+    Создает записи посещения всех учеников класса (или student_ids) на даты dates.
+    Уже существующие записи (ученик, дата, класс) не трогаются.
+    Возвращает количество созданных этим вызовом записей (без пропущенных
+    из-за записей, которые параллельный запрос успел создать раньше).
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return 0
+    if student_ids is None:
+        student_ids = list(Students.objects.filter(student_class=class_obj).values_list('id', flat=True))
+    if not student_ids:
+        return 0
+
+    with transaction.atomic():
+        existing = set(Attendance.objects.filter(
+            class_group=class_obj,
+            date__in=dates,
+            student_id__in=student_ids,
+        ).values_list('student_id', 'date'))
+        rows = [
+            Attendance(
+                student_id=student_id,
+                class_group=class_obj,
+                monthly_schedule=monthly_schedule,
+                date=lesson_date,
+                is_present=is_present,
+                is_paid=False,
+                payment_carried_over=False,
+            )
+            for lesson_date in dates
+            for student_id in student_ids
+            if (student_id, lesson_date) not in existing
+        ]
+        return insert_attendance_rows(rows)
+
+
+def insert_attendance_rows(rows):
+    """
+    Вставляет записи посещения одним bulk_create, пропуская записи, которые
+    параллельный запрос успел создать раньше (ignore_conflicts).
+    Возвращает количество действительно вставленных записей.
+    """
+    if not rows:
+        return 0
+    with transaction.atomic():
+        Attendance.objects.bulk_create(rows, ignore_conflicts=True)
+        attendance_written(rows)
+        # INSERT OR IGNORE не сообщает, какие строки пропущены. Свои строки узнаем
+        # по created_at: bulk_create проставляет его объектам, а у записи,
+        # созданной параллельным запросом, время другое
+        inserted = {(row.student_id, row.class_group_id, row.date, row.created_at) for row in rows}
+        return sum(
+            key in inserted
+            for key in Attendance.objects.filter(
+                student_id__in={row.student_id for row in rows},
+                date__in={row.date for row in rows},
+            ).values_list('student_id', 'class_group_id', 'date', 'created_at')
+        )
+
+
+def load_attendance_grid(class_obj, student_ids, dates, monthly_schedule=None):
+    """
+    Табель класса: {(id ученика, дата): запись посещения} одним запросом.
+    Недостающие клетки создаются одной пакетной вставкой (присутствовал,
+    не оплачено) и табель перечитывается — число запросов не зависит
+    от количества учеников и дат.
+    """
+    def load():
+        return {
+            (attendance.student_id, attendance.date): attendance
+            for attendance in Attendance.objects.filter(
+                class_group=class_obj,
+                date__in=dates,
+                student_id__in=student_ids,
+            )
+        }
+
+    grid = load()
+    if len(grid) < len(student_ids) * len(dates):
+        create_attendance_rows(
+            class_obj, dates,
+            monthly_schedule=monthly_schedule,
+            is_present=True,
+            student_ids=student_ids,
+        )
+        grid = load()
+    return grid
+
+
+def save_attendance_rows(rows, fields):
+    """Сохраняет измененные записи посещения одним bulk_update"""
+    if not rows:
+        return 0
+    now = timezone.now()
+    for attendance in rows:
+        # bulk_update не заполняет auto_now
+        attendance.updated_at = now
+    updated = Attendance.objects.bulk_update(rows, [*fields, 'updated_at'])
+    attendance_written(rows)
+    return updated
+
+
+# Тип изменения из табеля → поле записи посещения
+CHANGE_FIELDS = {
+    'attendance': 'is_present',
+    'payment': 'is_paid',
+}
+
+MAX_BATCH_CHANGES = 1000
+
+
+def parse_attendance_changes(raw_changes):
+    """
+    Проверяет список изменений [{student_id, date, field, value}] из табеля.
+    Повторные изменения одной клетки схлопываются (остается последнее).
+    Возвращает {(id ученика, дата, поле модели): значение}, при ошибке — ValueError.
+    """
+    if not isinstance(raw_changes, list) or not raw_changes:
+        raise ValueError('Нет изменений')
+    if len(raw_changes) > MAX_BATCH_CHANGES:
+        raise ValueError('Слишком много изменений за один запрос')
+
+    changes = {}
+    for change in raw_changes:
+        if not isinstance(change, dict):
+            raise ValueError('Неверный формат изменения')
+        field = CHANGE_FIELDS.get(change.get('field'))
+        value = change.get('value')
+        if field is None:
+            raise ValueError('Неверный тип обновления')
+        if not isinstance(value, bool):
+            raise ValueError('Значение должно быть true или false')
+        try:
+            student_id = int(change.get('student_id'))
+            lesson_date = date.fromisoformat(change.get('date'))
+        except (TypeError, ValueError):
+            raise ValueError('Неверный ученик или дата')
+        changes[(student_id, lesson_date, field)] = value
+    return changes
+
+
+def teacher_student_classes(teacher_profile, student_ids):
+    """{id ученика: id класса} для учеников из классов учителя — одним запросом"""
+    return dict(Students.objects.filter(
+        id__in=set(student_ids),
+        student_class__teacher=teacher_profile,
+    ).values_list('id', 'student_class_id'))
+
+
+def apply_attendance_changes(student_classes, changes):
+    """
+    Применяет изменения из parse_attendance_changes в одной транзакции:
+    существующие записи — одним bulk_update только измененных полей,
+    недостающие создаются одним bulk_create. student_classes — {id ученика: id класса}.
+    Возвращает (обновлено записей, действительно создано записей).
+    """
+    cells = {}
+    for (student_id, lesson_date, field), value in changes.items():
+        cells.setdefault((student_id, lesson_date), {})[field] = value
+    student_ids = {student_id for student_id, _ in cells}
+    dates = {lesson_date for _, lesson_date in cells}
+
+    with transaction.atomic():
+        existing = {
+            (attendance.student_id, attendance.date): attendance
+            for attendance in Attendance.objects.filter(student_id__in=student_ids, date__in=dates)
+            if attendance.class_group_id == student_classes[attendance.student_id]
+        }
+        to_update, to_create, fields = [], [], set()
+        for (student_id, lesson_date), values in cells.items():
+            attendance = existing.get((student_id, lesson_date))
+            if attendance is None:
+                # Как в attendance_update: новая клетка — не присутствовал, не оплачено
+                attendance = Attendance(
+                    student_id=student_id,
+                    class_group_id=student_classes[student_id],
+                    date=lesson_date,
+                    is_present=False,
+                    is_paid=False,
+                )
+                to_create.append(attendance)
+            else:
+                to_update.append(attendance)
+                fields.update(values)
+            for field, value in values.items():
+                setattr(attendance, field, value)
+
+        save_attendance_rows(to_update, sorted(fields))
+        created = insert_attendance_rows(to_create)
+    return len(to_update), created
+
+
+# Флаги клетки табеля в плотной матрице
+CELL_PRESENT = 1
+CELL_PAID = 2
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def next_month(value):
+    """Первое число следующего месяца"""
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def parse_month(value):
+    """'ГГГГ-ММ' из адреса → первое число месяца или None"""
+    try:
+        year, month = (int(part) for part in value.split('-'))
+        return date(year, month, 1)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def attendance_months(class_obj):
+    """Месяцы, в которых у класса есть занятия (первые числа, по возрастанию)"""
+    return list(Attendance.objects.filter(class_group=class_obj).dates('date', 'month'))
+
+
+def pick_month(months, requested=None, today=None):
+    """
+    Месяц для показа: запрошенный, иначе текущий или последний прошедший
+    месяц с занятиями, иначе первый месяц с занятиями.
+    """
+    if requested is not None:
+        return requested
+    if not months:
+        return None
+    current = month_start(today or timezone.localdate())
+    past = [month for month in months if month <= current]
+    return past[-1] if past else months[0]
+
+
+def attendance_grid(class_obj, students, month):
+    """
+    Табель класса за месяц в плотном виде: даты занятий месяца и матрица
+    ученики × даты (по строкам) из флагов CELL_PRESENT | CELL_PAID.
+    Записи месяца читаются одним запросом, остальная история класса не загружается.
+    """
+    rows = list(Attendance.objects.filter(
+        class_group=class_obj,
+        date__gte=month,
+        date__lt=next_month(month),
+    ).values_list('student_id', 'date', 'is_present', 'is_paid'))
+
+    dates = sorted({row[1] for row in rows})
+    date_index = {lesson_date: index for index, lesson_date in enumerate(dates)}
+    student_index = {student.id: index for index, student in enumerate(students)}
+    width = len(dates)
+    matrix = bytearray(len(students) * width)
+    for student_id, lesson_date, is_present, is_paid in rows:
+        row = student_index.get(student_id)
+        if row is not None:
+            matrix[row * width + date_index[lesson_date]] = (
+                (CELL_PRESENT if is_present else 0) | (CELL_PAID if is_paid else 0)
+            )
+    return dates, matrix
+
+
+def grid_rows(students, dates, matrix):
+    """
+    Строки для шаблона: (ученик, [(дата 'ГГГГ-ММ-ДД', присутствовал, оплачено), ...]) —
+    шаблону не нужны фильтры и поиск по словарям в каждой клетке.
+    """
+    iso_dates = [lesson_date.isoformat() for lesson_date in dates]
+    width = len(dates)
+    return [
+        (student, [
+            (iso_date, bool(flags & CELL_PRESENT), bool(flags & CELL_PAID))
+            for iso_date, flags in zip(iso_dates, matrix[row * width:(row + 1) * width])
+        ])
+        for row, student in enumerate(students)
+    ]
+
+
+def grid_payload(students, dates, matrix):
+    """Компактный JSON табеля: id учеников, даты и клетки строкой цифр 0–3 по строкам"""
+    return {
+        'students': [student.id for student in students],
+        'dates': [lesson_date.isoformat() for lesson_date in dates],
+        'cells': ''.join(map(str, matrix)),
+        'present': CELL_PRESENT,
+        'paid': CELL_PAID,
+    }
+
+
+def student_monthly_summary(student, class_obj):
+    """
+    Помесячная сводка ученика из таблицы балансов (StudentMonthBalance) — выборка по индексу:
+    [{'month': первое число месяца, 'total', 'attended', 'paid', 'carried', 'amount_due'}, ...] по возрастанию.
+    """
+    return [
+        {
+            'month': date(balance.year, balance.month, 1),
+            'total': balance.lessons,
+            'attended': balance.attended,
+            'paid': balance.paid,
+            'carried': balance.carried_over,
+            'amount_due': balance.amount_due,
+        }
+        for balance in student_balances(student, class_obj)
+    ]
+
+
+def student_debt(summary, today=None):
+    """
+    Оплата по помесячной сводке: (сводка текущего месяца, к оплате за текущий месяц,
+    задолженность за прошедшие месяцы). Будущие месяцы не учитываются.
+    """
+    current = month_start(today or timezone.localdate())
+    current_summary = {'total': 0, 'attended': 0, 'paid': 0, 'carried': 0, 'amount_due': 0}
+    previous_debt = 0
+    for row in summary:
+        if row['month'] == current:
+            current_summary = row
+        elif row['month'] < current:
+            previous_debt += row['amount_due']
+    return current_summary, current_summary['amount_due'], previous_debt
+
+
+# Итог переноса: неоплаченных занятий, перенесено (при dry_run — будет перенесено),
+# пропущено как уже существующие, месяц назначения (год, месяц)
+CarryOverResult = namedtuple('CarryOverResult', ['unpaid', 'carried', 'skipped', 'year', 'month'])
+
+
+def shift_to_month(value, year, month):
+    """Та же дата в другом месяце; 29–31 числа, которых там нет, — последний день месяца"""
+    return date(year, month, min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def carry_over_unpaid(class_obj, monthly_schedule, dry_run=False):
+    """
+    Переносит неоплаченные посещенные занятия месячного расписания на следующий месяц
+    одной транзакцией: неоплаченные записи читаются одним запросом, переносимые
+    создаются одним bulk_create. Записи, которые уже есть в следующем месяце
+    (тот же ученик и дата, в том числе после повторного переноса), пропускаются
+    по уникальному ограничению. При dry_run только считает, ничего не записывая.
+    """
+    target = next_month(date(monthly_schedule.year, monthly_schedule.month, 1))
+    unpaid = list(Attendance.objects.filter(
+        monthly_schedule=monthly_schedule,
+        is_present=True,
+        is_paid=False,
+    ).values_list('student_id', 'date'))
+    # Несколько дат в конце месяца могут сойтись в одну (31 и 30 → 28 февраля)
+    keys = {(student_id, shift_to_month(lesson_date, target.year, target.month)) for student_id, lesson_date in unpaid}
+
+    with transaction.atomic():
+        existing = set(Attendance.objects.filter(
+            class_group=class_obj,
+            date__gte=target,
+            date__lt=next_month(target),
+            student_id__in={student_id for student_id, _ in keys},
+        ).values_list('student_id', 'date')) if keys else set()
+        new_keys = sorted(keys - existing)
+        result = CarryOverResult(len(unpaid), len(new_keys), len(unpaid) - len(new_keys), target.year, target.month)
+        if dry_run or not new_keys:
+            return result
+
+        next_schedule, _ = MonthlySchedule.objects.get_or_create(
+            class_group=class_obj,
+            month=target.month,
+            year=target.year,
+        )
+        notes = f'Перенесено с {monthly_schedule}'
+        rows = [
+            Attendance(
+                student_id=student_id,
+                class_group=class_obj,
+                monthly_schedule=next_schedule,
+                date=lesson_date,
+                is_present=True,
+                is_paid=False,
+                payment_carried_over=True,
+                notes=notes,
+            )
+            for student_id, lesson_date in new_keys
+        ]
+        Attendance.objects.bulk_create(rows, ignore_conflicts=True)
+        attendance_written(rows)
+    return result
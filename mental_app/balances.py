@@ -0,0 +1,221 @@
+"""
+Помесячные балансы учеников (StudentMonthBalance).
+
+Баланс — итоги ученика в классе за месяц: занятий, посещено, оплачено,
+перенесено и сумма к оплате (неоплаченные занятия × стоимость занятия класса).
+Экраны оплаты читают готовую строку по индексу (ученик, класс, год, месяц)
+вместо пересчета из всех посещений.
+
+Балансы пересчитываются точечно — только для затронутых ключей
+(ученик, класс, месяц): сигналы Attendance копят ключи и пересчитывают их
+одним заходом после фиксации транзакции, а пакетные операции
+(bulk_create, bulk_update, update), которые сигналов не отправляют,
+вызывают refresh_balances сами. Изменение стоимости занятия обновляет суммы
+класса одним UPDATE. Пересборка и проверка — команда rebuild_month_balances.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncMonth
+from django.utils import timezone
+
+from .models import Attendance, Class, StudentMonthBalance
+from .versioned_cache import collect_on_commit
+
+COUNT_FIELDS = ('lessons', 'attended', 'paid', 'carried_over')
+
+
+def balance_key(attendance):
+    """Ключ баланса для записи посещения: (id ученика, id класса, год, месяц)"""
+    return attendance.student_id, attendance.class_group_id, attendance.date.year, attendance.date.month
+
+
+def amount_due(lessons, paid, lesson_fee):
+    """К оплате за месяц: все занятия (включая пропуски) минус оплаченные"""
+    lesson_fee = lesson_fee or Decimal('0')
+    if lesson_fee <= 0:
+        return Decimal('0.00')
+    return max(Decimal('0'), (lessons - paid) * lesson_fee).quantize(Decimal('0.01'))
+
+
+def compute_balances(attendances):
+    """
+    Итоги по месяцам для queryset посещений одним агрегирующим запросом:
+    {(ученик, класс, год, месяц): {'lessons', 'attended', 'paid', 'carried_over'}}.
+    """
+    rows = (
+        attendances
+        .annotate(month_start=TruncMonth('date'))
+        .values('student_id', 'class_group_id', 'month_start')
+        .annotate(
+            lessons=Count('id'),
+            attended=Count('id', filter=Q(is_present=True)),
+            paid=Count('id', filter=Q(is_paid=True)),
+            carried_over=Count('id', filter=Q(payment_carried_over=True)),
+        )
+        .order_by()
+    )
+    return {
+        (row['student_id'], row['class_group_id'], row['month_start'].year, row['month_start'].month):
+            {field: row[field] for field in COUNT_FIELDS}
+        for row in rows
+    }
+
+
+def _balance_objects(totals, fees):
+    return [
+        StudentMonthBalance(
+            student_id=student_id,
+            class_group_id=class_id,
+            year=year,
+            month=month,
+            amount_due=amount_due(values['lessons'], values['paid'], fees.get(class_id)),
+            **values,
+        )
+        for (student_id, class_id, year, month), values in totals.items()
+    ]
+
+
+def _keys_filter(keys):
+    """Q-условие на строки баланса с ключами keys"""
+    condition = Q()
+    for student_id, class_id, year, month in keys:
+        condition |= Q(student_id=student_id, class_group_id=class_id, year=year, month=month)
+    return condition
+
+
+def refresh_balances(keys):
+    """
+    Пересчитывает балансы для ключей (ученик, класс, год, месяц) из Attendance:
+    один агрегирующий запрос, одна вставка/обновление и одно удаление опустевших месяцев.
+    """
+    keys = set(keys)
+    if not keys:
+        return 0
+    months = [date(year, month, 1) for _, _, year, month in keys]
+    last = max(months)
+    totals = compute_balances(Attendance.objects.filter(
+        student_id__in={key[0] for key in keys},
+        class_group_id__in={key[1] for key in keys},
+        date__gte=min(months),
+        date__lt=date(last.year + last.month // 12, last.month % 12 + 1, 1),
+    ))
+    # Агрегат захватывает и соседние ключи — берем только запрошенные
+    totals = {key: values for key, values in totals.items() if key in keys}
+    fees = dict(Class.objects.filter(id__in={key[1] for key in keys}).values_list('id', 'lesson_fee'))
+
+    with transaction.atomic():
+        StudentMonthBalance.objects.bulk_create(
+            _balance_objects(totals, fees),
+            update_conflicts=True,
+            unique_fields=['student', 'class_group', 'year', 'month'],
+            update_fields=[*COUNT_FIELDS, 'amount_due', 'updated_at'],
+        )
+        empty = keys - set(totals)
+        if empty:
+            StudentMonthBalance.objects.filter(_keys_filter(empty)).delete()
+    return len(totals)
+
+
+def refresh_class_fee(class_obj):
+    """Стоимость занятия класса изменилась — суммы к оплате пересчитываются одним UPDATE"""
+    fee = class_obj.lesson_fee or Decimal('0')
+    balances = StudentMonthBalance.objects.filter(class_group=class_obj)
+    if fee <= 0:
+        return balances.update(amount_due=0)
+    return balances.update(amount_due=ExpressionWrapper(
+        Greatest(F('lessons') - F('paid'), Value(0)) * Value(fee),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    ))
+
+
+def rebuild_balances():
+    """Пересобирает все балансы с нуля. Возвращает количество строк"""
+    totals = compute_balances(Attendance.objects.all())
+    fees = dict(Class.objects.values_list('id', 'lesson_fee'))
+    with transaction.atomic():
+        StudentMonthBalance.objects.all().delete()
+        StudentMonthBalance.objects.bulk_create(_balance_objects(totals, fees), batch_size=500)
+    return len(totals)
+
+
+def verify_balances():
+    """
+    Сравнивает таблицу балансов с пересчетом из Attendance.
+    Возвращает список расхождений (ключ, ожидалось, в таблице).
+    """
+    expected = {}
+    fees = dict(Class.objects.values_list('id', 'lesson_fee'))
+    for key, values in compute_balances(Attendance.objects.all()).items():
+        expected[key] = {**values, 'amount_due': amount_due(values['lessons'], values['paid'], fees.get(key[1]))}
+    stored = {
+        (row['student_id'], row['class_group_id'], row['year'], row['month']):
+            {field: row[field] for field in (*COUNT_FIELDS, 'amount_due')}
+        for row in StudentMonthBalance.objects.values(
+            'student_id', 'class_group_id', 'year', 'month', *COUNT_FIELDS, 'amount_due'
+        )
+    }
+    return [
+        (key, expected.get(key), stored.get(key))
+        for key in sorted(set(expected) | set(stored))
+        if expected.get(key) != stored.get(key)
+    ]
+
+
+def student_balances(student, class_obj):
+    """Балансы ученика в классе по месяцам (по возрастанию) — по индексу, без агрегации"""
+    return list(StudentMonthBalance.objects.filter(student=student, class_group=class_obj).order_by('year', 'month'))
+
+
+def mark_balances_dirty(keys):
+    """
+    Запоминает ключи для пересчета одним заходом после фиксации текущей транзакции
+    (пересчет идет из Attendance, поэтому лишний пересчет после отката безвреден).
+    """
+    collect_on_commit('balances', keys, refresh_balances)
+
+
+# Сортировки отчета о задолженностях: параметр sort → поля order_by
+REPORT_SORTS = {
+    'name': ('student__surname', 'student__name'),
+    'class': ('class_group__name', 'student__surname', 'student__name'),
+    'lessons': ('-lessons', 'student__surname'),
+    'paid': ('-paid', 'student__surname'),
+    'debt': ('-debt', 'student__surname'),
+}
+
+
+def debt_report_rows(teacher_profile, class_id=None, search='', debtors_only=False, sort='debt', today=None):
+    """
+    Задолженности учеников по классам учителя (или одного класса) одним
+    сгруппированным запросом по таблице балансов: для каждой пары ученик–класс
+    занятия, посещения, оплаченные занятия и долг за прошедшие и текущий месяц.
+    Возвращает queryset словарей.
+    """
+    today = today or timezone.localdate()
+    # Будущие месяцы, как и на странице ученика, в долг не входят
+    until_now = Q(year__lt=today.year) | Q(year=today.year, month__lte=today.month)
+    balances = StudentMonthBalance.objects.filter(until_now, class_group__teacher=teacher_profile)
+    if class_id is not None:
+        balances = balances.filter(class_group_id=class_id)
+    if search:
+        # SQLite сравнивает без учета регистра только латиницу — ищем и с заглавной буквы
+        condition = Q()
+        for variant in {search, search.lower(), search.capitalize()}:
+            condition |= Q(student__surname__icontains=variant) | Q(student__name__icontains=variant)
+        balances = balances.filter(condition)
+
+    report = balances.values(
+        'student_id', 'student__surname', 'student__name',
+        'class_group_id', 'class_group__name', 'class_group__lesson_fee',
+    ).annotate(
+        lessons=Sum('lessons'),
+        attended=Sum('attended'),
+        paid=Sum('paid'),
+        debt=Sum('amount_due'),
+    )
+    if debtors_only:
+        report = report.filter(debt__gt=0)
+    return report.order_by(*REPORT_SORTS.get(sort, REPORT_SORTS['debt']))
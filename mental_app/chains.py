@@ -0,0 +1,188 @@
+"""
+Цепочки примеров для игры "Братья".
+
+Цепочки лежат в текстовых файлах в корне проекта: заголовок, разделитель
+и строка вида "+3+5+2-3..." (64 примера × 8 чисел). Файлы читаются и
+разбираются в компактные массивы целых чисел (модуль array) один раз
+на процесс, при следующих запросах проверяется только время изменения
+файла — файл перечитывается, лишь если его заменили.
+Новый набор цепочек добавляется одной строкой в CHAIN_FILES.
+
+Для формул и разрядностей без файла (а также для "Друзей" и "Друг+брата")
+примеры берутся из пула, сгенерированного по правилам формулы (formula_chains).
+Пулы заранее собираются командой build_formula_pools в файл POOLS_FILE и
+читаются так же, как файлы цепочек; если пула в файле нет, он генерируется
+в процессе (около секунды для двузначных) и запоминается.
+"""
+import logging
+import re
+import threading
+from array import array
+from functools import lru_cache
+
+from django.conf import settings
+
+from .formula_chains import EXAMPLE_SIZE, formula_supported, generate_pool
+
+logger = logging.getLogger(__name__)
+
+# (брат, разрядность чисел) → имя файла; разрядность 1 — однозначные, 2 — двузначные
+CHAIN_FILES = {
+    (1, 1): 'цепочка_примеров_брат1.txt',
+    (1, 2): 'цепочка_примеров_брат1_двузначные.txt',
+    (2, 1): 'цепочка_примеров_брат2.txt',
+    (2, 2): 'цепочка_примеров_брат2_двузначные.txt',
+    (3, 1): 'цепочка_примеров_брат3.txt',
+    (3, 2): 'цепочка_примеров_брат3_двузначные.txt',
+    (4, 1): 'цепочка_примеров_брат4.txt',
+    (4, 2): 'цепочка_примеров_брат4_двузначные.txt',
+}
+
+# Пулы примеров по формулам: строка "формула номер разрядность: +3+5-2..."
+POOLS_FILE = 'пулы_примеров_формул.txt'
+
+_NUMBER_PATTERN = re.compile(r'[+-]\d+')
+
+# (брат, разрядность) → (mtime файла, массив чисел)
+_cache = {}
+_lock = threading.Lock()
+
+
+def parse_chain_file(path):
+    """Числа из первой строки файла, начинающейся с + или -, в виде массива array('h')"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and (line.startswith('+') or line.startswith('-')):
+                return array('h', (int(number) for number in _NUMBER_PATTERN.findall(line)))
+    return array('h')
+
+
+def parse_pools_file(path):
+    """Пулы из файла: {(формула, номер, разрядность): массив array('h')}"""
+    pools = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            key, _, numbers = line.partition(':')
+            parts = key.split()
+            if len(parts) == 3 and numbers:
+                formula, number, digits = parts
+                pools[(formula, int(number), int(digits))] = array(
+                    'h', (int(value) for value in _NUMBER_PATTERN.findall(numbers))
+                )
+    return pools
+
+
+def format_pool_line(key, examples):
+    """Строка файла пулов для (формула, номер, разрядность) и списка примеров"""
+    formula, number, digits = key
+    numbers = ''.join(f'{value:+d}' for example in examples for value in example)
+    return f'{formula} {number} {digits}: {numbers}'
+
+
+def _load(key, filename, parse, empty):
+    """
+    Возвращает (mtime файла, разобранное содержимое), перечитывая файл,
+    только если он изменился. Если файла нет, mtime равно None, а содержимое — empty.
+    """
+    path = settings.BASE_DIR / filename
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        _cache.pop(key, None)
+        return None, empty
+
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached
+
+    with _lock:
+        cached = _cache.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, parse(path))
+            _cache[key] = cached
+    return cached
+
+
+def _load_chain(key):
+    """(mtime файла, массив чисел) для ключа из CHAIN_FILES"""
+    return _load(key, CHAIN_FILES[key], parse_chain_file, array('h'))
+
+
+def _load_pools():
+    """(mtime файла пулов, пулы)"""
+    return _load('pools', POOLS_FILE, parse_pools_file, {})
+
+
+@lru_cache(maxsize=None)
+def _generated_pool(formula, number, digits):
+    logger.warning('Пула %s %s %s нет в %s, генерируем — соберите файл командой build_formula_pools',
+                   formula, number, digits, POOLS_FILE)
+    return array('h', (value for example in generate_pool(formula, number, digits) for value in example))
+
+
+def formula_pool(formula, number, digits):
+    """Пул примеров формулы: (версия для ETag, массив чисел по EXAMPLE_SIZE на пример)"""
+    mtime, pools = _load_pools()
+    pool = pools.get((formula, number, digits))
+    if pool is not None:
+        return f'pool{mtime}', pool
+    return 'generated', _generated_pool(formula, number, digits)
+
+
+def get_chain(brother, digits):
+    """Цепочка чисел для брата и разрядности (пустой массив, если цепочки нет)"""
+    if (brother, digits) not in CHAIN_FILES:
+        return array('h')
+    return _load_chain((brother, digits))[1]
+
+
+def chain_version(brother, digits):
+    """Версия цепочки для ETag: время изменения файла или None, если цепочки нет"""
+    if (brother, digits) not in CHAIN_FILES:
+        return None
+    return _load_chain((brother, digits))[0]
+
+
+def example_count(chain):
+    """Количество примеров в цепочке (последний может быть короче EXAMPLE_SIZE)"""
+    return (len(chain) + EXAMPLE_SIZE - 1) // EXAMPLE_SIZE
+
+
+def chain_examples(chain, start, count):
+    """
+    Примеры с номерами start..start+count-1 (списки по EXAMPLE_SIZE чисел),
+    по кругу: после последнего примера цепочки идет первый
+    """
+    total = example_count(chain)
+    if not total:
+        return []
+    examples = []
+    for offset in range(count):
+        index = (start + offset) % total
+        examples.append(chain[index * EXAMPLE_SIZE:(index + 1) * EXAMPLE_SIZE].tolist())
+    return examples
+
+
+def get_examples(formula, number, digits, start, count):
+    """
+    Примеры для формулы ('brothers', 'friends', 'friend_brother') с номером number:
+    из файла цепочки, если он есть, иначе из сгенерированного пула.
+    start и примеры после конца цепочки берутся по кругу. Возвращает (start, всего примеров, примеры, версия для ETag)
+    или None, если примеров для параметров нет.
+    """
+    if formula == 'brothers':
+        chain = get_chain(number, digits)
+        total = example_count(chain)
+        if total:
+            start %= total
+            return start, total, chain_examples(chain, start, count), f'file{chain_version(number, digits)}'
+
+    if not formula_supported(formula, number, digits):
+        return None
+    version, pool = formula_pool(formula, number, digits)
+    total = example_count(pool)
+    if not total:
+        return None
+    start %= total
+    return start, total, chain_examples(pool, start, count), version
@@ -0,0 +1,104 @@
+"""
+Статистика панели учителя: классы, ученики, посещаемость за текущий месяц,
+неоплаченные занятия и ближайшие занятия по каждому классу.
+
+Считается двумя агрегирующими запросами (классы с количеством учеников и
+посещения, сгруппированные по классам) и кешируется под ключом с версией
+учителя и текущей датой (versioned_cache). Сигналы Attendance, Students и Class,
+а также пакетные операции с посещениями сдвигают версию после фиксации
+транзакции — повторный вход на панель берет статистику из кеша, а после
+любого изменения она пересчитывается в каждом процессе.
+"""
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from . import versioned_cache
+from .models import Attendance, Class
+
+TEACHER_STATS_TIMEOUT = 60 * 60 * 24
+
+
+def teacher_stats_version_key(teacher_id):
+    return f'teacher_stats_version_{teacher_id}'
+
+
+def mark_teacher_stats_dirty(teacher_ids=(), class_ids=()):
+    """
+    Сбрасывает статистику учителей после фиксации текущей транзакции.
+    Классы переводятся в учителей одним запросом при сбросе; удаленный класс
+    так уже не найти, поэтому его сигнал передает учителя напрямую.
+    """
+    versioned_cache.collect_on_commit(
+        'teacher_stats',
+        [('teacher', teacher_id) for teacher_id in teacher_ids]
+        + [('class', class_id) for class_id in class_ids if class_id is not None],
+        _bump_teacher_stats,
+    )
+
+
+def _bump_teacher_stats(items):
+    teachers = {item_id for kind, item_id in items if kind == 'teacher'}
+    classes = {item_id for kind, item_id in items if kind == 'class'}
+    if classes:
+        teachers.update(Class.objects.filter(id__in=classes).values_list('teacher_id', flat=True))
+    for teacher_id in teachers:
+        versioned_cache.bump(teacher_stats_version_key(teacher_id))
+
+
+def compute_teacher_stats(teacher_profile, today):
+    """Статистика учителя на дату today — два агрегирующих запроса"""
+    month_start = today.replace(day=1)
+    classes = list(
+        Class.objects.filter(teacher=teacher_profile)
+        .annotate(students_total=Count('students'))
+        .order_by('name')
+        .values('id', 'name', 'time', 'days', 'students_total')
+    )
+    this_month = Q(date__gte=month_start, date__lte=today)
+    attendance = {
+        row.pop('class_group_id'): row
+        for row in Attendance.objects.filter(class_group__teacher=teacher_profile)
+        .values('class_group_id')
+        .annotate(
+            month_records=Count('id', filter=this_month),
+            month_present=Count('id', filter=this_month & Q(is_present=True)),
+            # Как в балансах: к оплате все прошедшие занятия, включая пропуски
+            unpaid=Count('id', filter=Q(date__lte=today, is_paid=False)),
+            upcoming=Count('date', filter=Q(date__gt=today), distinct=True),
+            next_lesson=Min('date', filter=Q(date__gte=today)),
+        )
+        .order_by()
+    }
+
+    empty = {'month_records': 0, 'month_present': 0, 'unpaid': 0, 'upcoming': 0, 'next_lesson': None}
+    for class_stats in classes:
+        class_stats.update(attendance.get(class_stats['id'], empty))
+        class_stats['attendance_rate'] = _rate(class_stats['month_present'], class_stats['month_records'])
+
+    month_records = sum(class_stats['month_records'] for class_stats in classes)
+    month_present = sum(class_stats['month_present'] for class_stats in classes)
+    return {
+        'date': today,
+        'classes': classes,
+        'classes_count': len(classes),
+        'students_count': sum(class_stats['students_total'] for class_stats in classes),
+        'attendance_rate': _rate(month_present, month_records),
+        'unpaid': sum(class_stats['unpaid'] for class_stats in classes),
+        'upcoming': sum(class_stats['upcoming'] for class_stats in classes),
+    }
+
+
+def _rate(present, records):
+    """Процент посещаемости или None, если занятий не было"""
+    return round(present * 100 / records) if records else None
+
+
+def teacher_stats(teacher_profile, today=None):
+    """Статистика учителя из кеша, при промахе — compute_teacher_stats"""
+    today = today or timezone.localdate()
+    return versioned_cache.get_or_build(
+        teacher_stats_version_key(teacher_profile.id),
+        f'teacher_stats_{teacher_profile.id}_{today.isoformat()}',
+        lambda: compute_teacher_stats(teacher_profile, today),
+        TEACHER_STATS_TIMEOUT,
+    )
@@ -0,0 +1,255 @@
+"""
+Генератор цепочек примеров по формулам абакуса: "Братья", "Друзья", "Друг+брат".
+
+Пример устроен как в файлах цепочек: EXAMPLE_SIZE - 1 чисел-шагов и
+последнее число, которое обнуляет промежуточную сумму (оно может быть
+многозначным, например -10 или -37). Сумма начинается с 0 и может выходить
+за разрядность чисел — на абакусе для нее есть еще один разряд
+(в файлах однозначных примеров сумма доходит до 10–39, двузначных — до 99+).
+
+Каждый шаг раскладывается по разрядам абакуса (от старшего к младшему),
+и каждое действие с разрядом относится к одному из способов:
+
+- direct — косточки добавляются или убираются напрямую;
+- brother — через пятерку: +k = +5 - (5 - k), -k = -5 + (5 - k);
+- friend — через десяток: +k = +10 - (10 - k), -k = -10 + (10 - k);
+- friend_brother — через десяток, когда дополнение само требует брата:
+  +k = +10 - 5 + (k - 5), -k = -10 + 5 - (k - 5).
+
+Для формулы (например, "брат 4") в шагах генерируемого примера разрешены
+прямые действия, ранее изученные способы и только выбранная формула, а сама
+формула используется хотя бы один раз; обнуляющее число этим правилам не
+подчиняется. Состояние — промежуточная сумма, поэтому таблица переходов
+и таблица "формулу еще можно использовать" строятся один раз на формулу
+(как таблица абакуса в generators.py), а пример собирается случайным
+блужданием без тупиков.
+
+Файлы цепочек перенесены с фотографий и правилам формул следуют не везде
+(в однозначном "брат 1" есть шаги через десяток, часть примеров не
+возвращается к нулю), поэтому для них проверяется только то, что
+выполняется во всех файлах (example_is_valid), а правила формулы —
+для сгенерированных примеров (example_follows_formula).
+"""
+import random
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+
+# Чисел в одном примере: 7 шагов и обнуляющее число
+EXAMPLE_SIZE = 8
+
+# Формула → (способ, допустимые номера формулы, ранее изученные способы)
+FORMULAS = {
+    'brothers': ('brother', range(1, 5), ()),
+    'friends': ('friend', range(1, 10), ('brother',)),
+    'friend_brother': ('friend_brother', range(6, 10), ('brother', 'friend')),
+}
+
+# Разрядность чисел, для которой строятся таблицы (как в файлах цепочек)
+SUPPORTED_DIGITS = (1, 2)
+
+# Во сколько раз чаще выбирается шаг с изучаемой формулой
+TARGET_WEIGHT = 3
+
+# Размер пула заранее сгенерированных примеров для каждой формулы и разрядности
+POOL_SIZE = 256
+
+
+def column_step(digit, value):
+    """
+    Действие value (от -9 до 9) с разрядом, на котором стоит digit.
+    Возвращает (способ, новая цифра разряда, перенос в старший разряд: -1, 0 или 1).
+    """
+    five, units = divmod(digit, 5)
+    k = abs(value)
+    if value > 0:
+        if digit + k <= 9:
+            if k < 5 and units + k > 4:
+                return 'brother', digit + k, 0
+            return 'direct', digit + k, 0
+        # +k = +10 - (10 - k): убираем дополнение, если оно требует брата — друг+брат
+        rest = 10 - k
+        method = 'friend_brother' if rest < 5 and five and units < rest else 'friend'
+        return method, digit + k - 10, 1
+    if digit >= k:
+        if k < 5 and units < k:
+            return 'brother', digit - k, 0
+        return 'direct', digit - k, 0
+    # -k = -10 + (10 - k): добавляем дополнение, если оно требует брата — друг+брат
+    rest = 10 - k
+    method = 'friend_brother' if rest < 5 and units + rest > 4 else 'friend'
+    return method, digit - k + 10, -1
+
+
+# Все действия с одним разрядом: COLUMN_STEPS[цифра][value + 9]
+COLUMN_STEPS = tuple(
+    tuple(column_step(digit, value) if value else None for value in range(-9, 10))
+    for digit in range(10)
+)
+
+
+def number_steps(total, number, columns):
+    """
+    Действия с разрядами при прибавлении number к total на абакусе из columns разрядов:
+    список (способ, номер формулы) или None, если результат не помещается на абакус.
+    Разряды обрабатываются от старшего к младшему, перенос — в старший разряд.
+    """
+    digits = [total // 10 ** column % 10 for column in range(columns)]
+    sign = 1 if number > 0 else -1
+    steps = []
+    for start in reversed(range(columns)):
+        column, value = start, sign * (abs(number) // 10 ** start % 10)
+        # Перенос в старший разряд — отдельное действие +1 или -1 с этим разрядом
+        while value:
+            if column >= columns:
+                return None
+            method, digits[column], carry = COLUMN_STEPS[digits[column]][value + 9]
+            steps.append((method, abs(value)))
+            column, value = column + 1, carry
+    return steps
+
+
+def _columns(digits):
+    # Еще один разряд — под сумму больше разрядности чисел и под перенос
+    return digits + 1
+
+
+def _numbers(digits):
+    """Все числа нужной разрядности со знаком"""
+    values = range(10 ** (digits - 1), 10 ** digits)
+    return [sign * value for value in values for sign in (1, -1)]
+
+
+@lru_cache(maxsize=None)
+def transition_table(formula, k, digits):
+    """
+    Таблица переходов: для каждой промежуточной суммы кортеж
+    (число, следующая сумма, используется ли формула) по всем допустимым числам.
+    """
+    method, _, allowed_methods = FORMULAS[formula]
+    columns = _columns(digits)
+    numbers = _numbers(digits)
+    table = []
+    for total in range(10 ** columns):
+        transitions = []
+        for number in numbers:
+            steps = number_steps(total, number, columns)
+            if steps is None:
+                continue
+            is_target = False
+            for step_method, step_value in steps:
+                if step_method == method and step_value == k:
+                    is_target = True
+                elif step_method != 'direct' and step_method not in allowed_methods:
+                    break
+            else:
+                transitions.append((number, total + number, is_target))
+        table.append(tuple(transitions))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def finish_table(formula, k, digits, steps=EXAMPLE_SIZE - 1):
+    """
+    Таблица достижимости: finish[r][used] — множество сумм, из которых за r шагов
+    можно закончить пример (used — формула уже использована). После последнего
+    шага годится любая ненулевая сумма (ее обнулит последнее число), но только
+    если формула была использована.
+    """
+    table = transition_table(formula, k, digits)
+    finish = [(frozenset(), frozenset(range(1, len(table))))]
+    for _ in range(steps):
+        previous = finish[-1]
+        finish.append(tuple(
+            frozenset(
+                total for total, transitions in enumerate(table)
+                if any(next_total in previous[used or is_target] for _, next_total, is_target in transitions)
+            )
+            for used in (False, True)
+        ))
+    return tuple(finish)
+
+
+def generate_examples(formula, k, digits, count, rng=random, length=EXAMPLE_SIZE):
+    """
+    Генерирует count примеров по формуле (например, 'brothers', 4 — "брат 4").
+    Каждый пример — length - 1 шагов по правилам формулы (формула используется
+    хотя бы один раз) и число, обнуляющее сумму. Если для параметров примеров
+    не существует, возвращается пустой список.
+    """
+    steps = length - 1
+    table = transition_table(formula, k, digits)
+    finish = finish_table(formula, k, digits, steps)
+    if 0 not in finish[steps][False]:
+        return []
+
+    examples = []
+    for _ in range(count):
+        example = []
+        total, used = 0, False
+        for remaining in range(steps - 1, -1, -1):
+            reachable = finish[remaining]
+            candidates = [
+                transition for transition in table[total]
+                if transition[1] in reachable[used or transition[2]]
+            ]
+            cumulative = list(accumulate(TARGET_WEIGHT if is_target else 1 for _, _, is_target in candidates))
+            number, total, is_target = candidates[bisect_right(cumulative, rng.randrange(cumulative[-1]))]
+            used = used or is_target
+            example.append(number)
+        example.append(-total)
+        examples.append(example)
+    return examples
+
+
+def example_follows_formula(formula, k, digits, example):
+    """Проверяет сгенерированный пример по правилам формулы (так же, как генератор)"""
+    if len(example) != EXAMPLE_SIZE:
+        return False
+    table = transition_table(formula, k, digits)
+    total, used = 0, False
+    for number in example[:-1]:
+        for candidate, next_total, is_target in table[total]:
+            if candidate == number:
+                total, used = next_total, used or is_target
+                break
+        else:
+            return False
+    return used and total != 0 and example[-1] == -total
+
+
+def example_is_valid(digits, example):
+    """
+    Правило, которому следуют все примеры файлов цепочек: не больше EXAMPLE_SIZE
+    чисел, и каждое число и каждая промежуточная сумма помещаются на абакус
+    с разрядом сверх разрядности чисел (по модулю меньше 10 ** (digits + 1)).
+    """
+    limit = 10 ** _columns(digits)
+    return 0 < len(example) <= EXAMPLE_SIZE and all(
+        abs(number) < limit and abs(total) < limit
+        for number, total in zip(example, accumulate(example))
+    )
+
+
+def generate_pool(formula, k, digits):
+    """
+    Пул из POOL_SIZE примеров. Зерно зависит только от параметров, поэтому пул
+    одинаков при каждой сборке и номер примера можно передавать клиенту, как номер
+    примера в файле цепочки. Пулы собираются заранее командой build_formula_pools.
+    """
+    rng = random.Random(f'{formula}:{k}:{digits}')
+    return [list(example) for example in generate_examples(formula, k, digits, POOL_SIZE, rng)]
+
+
+def pool_keys():
+    """Все поддерживаемые (формула, номер, разрядность)"""
+    return [
+        (formula, k, digits)
+        for formula, (_, numbers, _) in FORMULAS.items()
+        for k in numbers
+        for digits in SUPPORTED_DIGITS
+    ]
+
+
+def formula_supported(formula, k, digits):
+    return formula in FORMULAS and k in FORMULAS[formula][1] and digits in SUPPORTED_DIGITS
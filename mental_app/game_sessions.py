@@ -0,0 +1,103 @@
+"""
+Игры с воспроизводимой генерацией примеров.
+
+Игра описывается тройкой (тип игры, настройки, зерно), и пример с номером k
+пересчитывается из нее по требованию. В сессии хранятся только настройки
+и пара небольших целых чисел (зерно и номер текущего примера), а не списки
+примеров, поэтому запись сессии не растет с длиной раунда, раунд можно
+повторить с тем же зерном, а результат — проверить по зерну.
+"""
+import random
+
+from .generators import (
+    multiplication_choose_problem, multiplication_to_20_problem,
+    multiplication_base_problem, tricks_problem,
+    simply_numbers, generate_flashcards_numbers
+)
+
+GAME_SESSION_KEY = 'seeded_game'
+SEED_LIMIT = 2 ** 31
+
+# Игры из отдельных примеров: пример k не зависит от остальных
+# и генерируется своим источником случайности (зерно, k)
+PROBLEM_GAMES = {
+    'multiplication_choose': lambda s, rng: multiplication_choose_problem(
+        s['first_range'], s['second_range'], rng
+    ),
+    'multiplication_to_20': lambda s, rng: multiplication_to_20_problem(
+        s['first_range'], s['second_multiplier'], rng
+    ),
+    'multiplication_base': lambda s, rng: multiplication_base_problem(s['selected_ranges'], rng),
+    'tricks': lambda s, rng: tricks_problem(s['number_type'], rng),
+}
+
+# Игры-последовательности: каждое число зависит от предыдущих (промежуточная сумма),
+# поэтому последовательность пересчитывается по зерну целиком — это микросекунды
+SEQUENCE_GAMES = {
+    'simply': lambda s, rng: simply_numbers(s['range_key'], s['max_digit'], s['num_examples'], rng),
+    'flashcards': lambda s, rng: generate_flashcards_numbers(
+        s['difficult_level'], s['max_digit'], s['quantity'], rng
+    ),
+}
+
+
+def new_seed():
+    """Случайное зерно для новой игры"""
+    return random.randrange(SEED_LIMIT)
+
+
+def parse_seed(value):
+    """Зерно из запроса (например, чтобы учитель повторил раунд) или None"""
+    try:
+        seed = int(value)
+    except (TypeError, ValueError):
+        return None
+    return seed if 0 <= seed < SEED_LIMIT else None
+
+
+def new_game(game_type, settings, seed=None):
+    """Описание игры: тип, настройки, зерно и номер текущего примера"""
+    return {
+        'type': game_type,
+        'settings': settings,
+        'seed': new_seed() if seed is None else seed,
+        'index': 0,
+    }
+
+
+def start_game(session, game_type, settings, seed=None):
+    """Начинает новую игру и сохраняет ее описание в сессии"""
+    game = new_game(game_type, settings, seed)
+    session[GAME_SESSION_KEY] = game
+    return game
+
+
+def current_game(session, game_type):
+    """Текущая игра из сессии или None, если в сессии игра другого типа"""
+    game = session.get(GAME_SESSION_KEY)
+    if not game or game.get('type') != game_type:
+        return None
+    return game
+
+
+def advance_game(session, game):
+    """Переходит к следующему примеру: в сессии меняется только номер"""
+    game['index'] += 1
+    session[GAME_SESSION_KEY] = game
+
+
+def problem_at(game, index=None):
+    """
+    Пример с номером index (по умолчанию текущий) для игры из отдельных примеров.
+    Возвращает (first, second) или None, если настройки некорректны.
+    """
+    if index is None:
+        index = game['index']
+    make_problem = PROBLEM_GAMES[game['type']]
+    return make_problem(game['settings'], random.Random(f"{game['seed']}:{index}"))
+
+
+def game_sequence(game):
+    """Вся последовательность чисел для игры-последовательности"""
+    make_sequence = SEQUENCE_GAMES[game['type']]
+    return make_sequence(game['settings'], random.Random(game['seed']))
@@ -0,0 +1,163 @@
+"""
+Реестр игр: код, названия, иконка, адрес и описания для кабинета ученика
+и страницы настройки класса. Из него строятся GAME_CHOICES модели
+ClassGameAccess, список игр учителя и карточки игр в кабинете ученика.
+Генераторы примеров подключаются в game_sessions по тем же кодам игр.
+
+Здесь же — кеш включенных игр класса (versioned_cache). Список хранится под
+ключом с версией класса; сигналы ClassGameAccess сдвигают версию в общем кеше,
+и следующий запрос любого ученика класса в любом процессе перечитывает список
+из базы — один запрос на класс и процесс после изменения, а не на каждого
+ученика раз в 5 минут.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.urls import reverse
+
+from . import versioned_cache
+
+# code — код игры (как в ClassGameAccess.game);
+# label — название в настройках класса и в админке;
+# title, description — карточка в кабинете ученика (без описания игра в кабинете не показывается);
+# note — подпись на странице настройки игр класса;
+# url_name, with_mode — имя адреса и нужен ли ему номер режима (начинаем с режима 1);
+# class_access — доступ к игре включает учитель (иначе игра доступна всем)
+Game = namedtuple('Game', [
+    'code', 'label', 'title', 'description', 'note', 'icon', 'url_name', 'with_mode', 'class_access',
+])
+
+GAMES = (
+    Game('simply', 'Просто', 'Просто',
+         'Тренируйте сложение и вычитание чисел. Выберите сложность и количество примеров.',
+         '', 'fas fa-plus', 'simply', True, False),
+    Game('multiplication_choose', 'Умножение', 'Умножение',
+         'Изучайте таблицу умножения с разными диапазонами чисел.',
+         'Тренировка умножения с выбором сложности', 'fas fa-times', 'multiplication_choose', True, True),
+    Game('square', 'Квадраты', 'Квадрат',
+         'Тренируйте возведение чисел в квадрат и умножение.',
+         'Возведение чисел в квадрат', 'fas fa-square', 'square', True, True),
+    Game('tricks', 'Трюки', 'Хитрости',
+         'Изучайте специальные математические хитрости для быстрого счета.',
+         'Математические трюки и хитрости', 'fas fa-magic', 'tricks', True, True),
+    Game('flashcards', 'Флэшкарты', 'Флэшкарты',
+         'Тренируйте ментальную арифметику с помощью счетов (абакуса).',
+         'Флэшкарты со счетами (абакус)', 'fas fa-credit-card', 'flashcards', True, True),
+    Game('multiplication_base', 'Умножение от базы', 'Умножение от базы',
+         'Специальные техники умножения с использованием базовых чисел.',
+         'Умножение от базовых чисел', 'fas fa-sort-numeric-up', 'multiplication_base', True, True),
+    Game('multiplication_to_20', 'Умножение до 20', 'Умножение до 20',
+         'Специальная тренировка умножения чисел до 20.',
+         'Умножение чисел до 20', 'fas fa-calculator', 'multiplication_to_20', True, True),
+    Game('brothers', 'Братья', 'Братья', '', '', 'fas fa-users', 'brothers_game', False, True),
+    # У "Друзей" и "Друга+брата" пока нет своей страницы
+    Game('friends', 'Друзья', 'Друзья', '', '', 'fas fa-plus', None, False, True),
+    Game('friend_brother', 'Друг+брат', 'Друг+брат', '', '', 'fas fa-plus', None, False, True),
+    Game('multiplication_table', 'Таблица умножения', 'Таблица умножения', '', '',
+         'fas fa-table', 'multiplication_table', False, True),
+)
+
+GAMES_BY_CODE = {game.code: game for game in GAMES}
+
+# Игры, доступ к которым настраивает учитель (в порядке реестра)
+CLASS_GAMES = tuple(game for game in GAMES if game.class_access)
+
+# Игры, доступные без настройки класса
+OPEN_GAME_CODES = tuple(game.code for game in GAMES if not game.class_access)
+
+CLASS_GAMES_TIMEOUT = 60 * 60 * 24
+
+
+def game_choices():
+    """Варианты для поля ClassGameAccess.game"""
+    return [(game.code, game.label) for game in CLASS_GAMES]
+
+
+def teacher_game_codes():
+    """Учителю доступны все игры"""
+    return [game.code for game in GAMES]
+
+
+def dashboard_card(game):
+    """Карточка игры для кабинета ученика"""
+    url = reverse(game.url_name, args=[1]) if game.with_mode else reverse(game.url_name)
+    return {
+        'code': game.code,
+        'title': game.title,
+        'description': game.description,
+        'icon': game.icon,
+        'url': url,
+    }
+
+
+def class_games_version_key(class_id):
+    return f'class_games_version_{class_id}'
+
+
+def _class_cache(prefix, class_id, build):
+    """Значение, построенное build(), под ключом с текущей версией игр класса"""
+    return versioned_cache.get_or_build(
+        class_games_version_key(class_id), f'{prefix}_{class_id}', build, CLASS_GAMES_TIMEOUT
+    )
+
+
+def class_games_access(class_id):
+    """{код игры: включена ли} для всех настраиваемых игр класса — одним запросом"""
+    from .models import ClassGameAccess
+
+    access = dict.fromkeys((game.code for game in CLASS_GAMES), False)
+    access.update(ClassGameAccess.objects.filter(class_group_id=class_id).values_list('game', 'is_enabled'))
+    return access
+
+
+def save_class_games(class_id, states):
+    """
+    Сохраняет доступ к играм класса ({код игры: включена ли}) одним запросом
+    INSERT ... ON CONFLICT (class_group, game) DO UPDATE. Неизвестные коды
+    пропускаются. bulk_create не отправляет сигналы, поэтому кеш игр класса
+    сбрасывается здесь же, после фиксации транзакции.
+    """
+    from .models import ClassGameAccess
+
+    objs = [
+        ClassGameAccess(class_group_id=class_id, game=code, is_enabled=is_enabled)
+        for code, is_enabled in states.items()
+        if code in GAMES_BY_CODE and GAMES_BY_CODE[code].class_access
+    ]
+    if not objs:
+        return 0
+    with transaction.atomic():
+        ClassGameAccess.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=['class_group', 'game'],
+            update_fields=['is_enabled', 'updated_at'],
+        )
+        versioned_cache.bump_on_commit(class_games_version_key(class_id))
+    return len(objs)
+
+
+def enabled_class_games(class_id):
+    """Коды игр, включенных для класса, — из кеша, при промахе одним запросом"""
+    from .models import ClassGameAccess
+
+    return _class_cache('class_games', class_id, lambda: list(ClassGameAccess.objects.filter(
+        class_group_id=class_id,
+        is_enabled=True
+    ).values_list('game', flat=True)))
+
+
+def class_dashboard_games(class_id):
+    """
+    Карточки игр для кабинета ученика класса (class_id может быть None):
+    сначала общедоступные игры, затем включенные учителем, в порядке реестра.
+    """
+    def build():
+        enabled = set(enabled_class_games(class_id)) if class_id else set()
+        return [
+            dashboard_card(game) for game in GAMES
+            if game.description and (not game.class_access or game.code in enabled)
+        ]
+    if not class_id:
+        return build()
+    return _class_cache('class_dashboard', class_id, build)
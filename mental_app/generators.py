@@ -0,0 +1,362 @@
+"""
+Генераторы примеров для игр.
+
+Все функции принимают необязательный аргумент rng — источник случайности
+(модуль random или экземпляр random.Random), чтобы одни и те же генераторы
+можно было использовать и в представлениях, и при сборке пакетов примеров.
+"""
+import random
+from bisect import bisect_right
+from functools import lru_cache
+
+
+# Кешированные диапазоны чисел для повышения производительности
+def _get_ranges():
+    """Возвращает кешированный словарь диапазонов чисел"""
+    if not hasattr(_get_ranges, '_cache'):
+        _get_ranges._cache = {
+            '1-9': tuple(range(1, 10)),
+            '10-19': tuple(range(10, 19)),
+            '20-29': tuple(range(20, 29)),
+            '30-70': tuple(range(30, 70)),
+            '80-120': tuple(range(80, 120)),
+            '10-99': tuple(range(10, 100)),
+            '100-999': tuple(range(100, 1000)),
+            '1000-9999': tuple(range(1000, 10000)),
+            '10000-99999': tuple(range(10000, 100000)),
+            '10': tuple(range(1, 10)),
+            '50': tuple(range(1, 50)),
+            '100': tuple(range(1, 100)),
+            '200': tuple(range(1, 200)),
+            '1000': tuple(range(1, 1000)),
+            'random': tuple(range(1, 101)),
+            'both-lower': tuple(range(1, 51)),
+            'one-lower-one-higher': tuple(range(1, 101)),
+            'both-higher': tuple(range(50, 151)),
+            '2-9': tuple(range(2, 10)),
+            "1-10": tuple(range(1, 10)),
+            "10-100": tuple(range(10, 100)),
+            "100-1000": tuple(range(100, 1000)),
+            "1000-10000": tuple(range(1000, 10000)),
+        }
+    return _get_ranges._cache
+
+RANGES = _get_ranges()
+
+
+def random_sign(rng=random):
+    """Случайный знак числа: -1 или 1"""
+    return rng.choice((-1, 1))
+
+
+def combined_ranges(range_keys):
+    """Объединяет несколько диапазонов из RANGES в один список чисел"""
+    numbers = []
+    for key in range_keys:
+        numbers.extend(RANGES.get(key, ()))
+    return numbers
+
+
+# функция для определения двух множителей при выборе двухзначных чисел
+def generate_two_digit_pair(rng=random):
+    """Генерирует пару двузначных чисел с одинаковым десятком и суммой единиц 10."""
+    tens = rng.randint(1, 9)  # Выбираем десяток от 10 до 90
+    unit1 = rng.randint(1, 9)  # Выбираем первую единицу
+    unit2 = 10 - unit1  # Вторая единица должна дополнять до 10
+    first = tens * 10 + unit1
+    second = tens * 10 + unit2
+
+    # Случайно выбираем знак для чисел
+    return first * random_sign(rng), second * random_sign(rng)
+
+
+# функция для определения двух множителей при выборе трехзначных чисел
+def generate_three_digit_pair(rng=random):
+    """Генерирует пару трехзначных чисел с одинаковыми сотнями и десятками, сумма единиц 10."""
+    hundreds = rng.randint(1, 9)  # Выбираем сотню (100-900)
+    tens = rng.randint(0, 9)  # Выбираем десяток (00-90)
+    unit1 = rng.randint(1, 9)  # Выбираем первую единицу
+    unit2 = 10 - unit1  # Вторая единица дополняет до 10
+    first = hundreds * 100 + tens * 10 + unit1
+    second = hundreds * 100 + tens * 10 + unit2
+
+    # Случайно выбираем знак для чисел
+    return first * random_sign(rng), second * random_sign(rng)
+
+
+def multiplication_choose_problem(first_range, second_range, rng=random):
+    """Пример для игры "Умножение": по одному числу из каждого диапазона со случайным знаком"""
+    first_multipliers = RANGES.get(first_range)
+    second_multipliers = RANGES.get(second_range)
+    if not first_multipliers or not second_multipliers:
+        return None
+    first = rng.choice(first_multipliers) * random_sign(rng)
+    second = rng.choice(second_multipliers) * random_sign(rng)
+    return first, second
+
+
+def multiplication_to_20_problem(first_range, second_multiplier, rng=random):
+    """Пример для игры "Умножение до 20": второй множитель задан пользователем (1-20)"""
+    first_multipliers = RANGES.get(first_range)
+    if not first_multipliers or not second_multiplier or not (1 <= abs(second_multiplier) <= 20):
+        return None
+    first = rng.choice(first_multipliers) * random_sign(rng)
+    second = abs(second_multiplier) * random_sign(rng)
+    return first, second
+
+
+def multiplication_base_problem(selected_ranges, rng=random):
+    """Пример для игры "Умножение от базы": оба множителя из объединения выбранных диапазонов"""
+    multipliers = combined_ranges(selected_ranges)
+    if not multipliers:
+        return None
+    first = rng.choice(multipliers) * random_sign(rng)
+    second = rng.choice(multipliers) * random_sign(rng)
+    return first, second
+
+
+def tricks_problem(number_type, rng=random):
+    """Пример для игры "Хитрости": "2" — двузначные пары, "3" — трехзначные"""
+    if number_type == "2":
+        return generate_two_digit_pair(rng)
+    if number_type == "3":
+        return generate_three_digit_pair(rng)
+    return None
+
+
+# Количество разрядов чисел для диапазонов игры "Просто" (range_key из формы настроек)
+SIMPLY_DIGITS = {
+    1: 1,  # 1-10
+    2: 2,  # 10-100
+    3: 3,  # 100-1000
+    4: 4,  # 1000-10000
+}
+
+
+@lru_cache(maxsize=None)
+def digit_restricted_numbers(num_digits, max_digit):
+    """
+    Все числа из num_digits разрядов, каждая цифра которых от 1 до max_digit,
+    по возрастанию. Строится один раз на процесс для каждой пары параметров
+    (не больше 9**4 = 6561 чисел).
+    """
+    numbers = [0]
+    for _ in range(num_digits):
+        numbers = [number * 10 + digit for number in numbers for digit in range(1, max_digit + 1)]
+    return tuple(numbers)
+
+
+def simply_max_sum(num_digits, max_digit):
+    """Максимальная промежуточная сумма: число из одних max_digit (например, 444)"""
+    return int(str(max_digit) * num_digits)
+
+
+def generate_bounded_sequence(num_digits, max_digit, count, rng=random):
+    """
+    Генерирует count чисел со знаками для игры "Просто" за один проход.
+
+    Каждое число состоит из num_digits цифр от 1 до max_digit, промежуточная
+    сумма после каждого числа остается в пределах [0, max_sum], где max_sum —
+    число из одних max_digit.
+
+    Из суммы s продолжить можно числом v, если s + v <= max_sum или s - v >= 0,
+    то есть при v <= max(s, max_sum - s). Эта граница не меньше max_sum / 2,
+    а значит не меньше наименьшего числа 11...1 (при max_digit=1 сумма бывает
+    только 0 или max_sum). Поэтому множество допустимых сумм для любого числа
+    оставшихся позиций — весь отрезок [0, max_sum], тупиков нет, и на каждом
+    шаге достаточно выбрать число из префикса отсортированного списка
+    (bisect) и допустимый знак. Перебора и повторных попыток нет.
+    """
+    max_digit = max(1, min(int(max_digit), 9))
+    values = digit_restricted_numbers(num_digits, max_digit)
+    max_sum = values[-1]
+
+    numbers = []
+    current_sum = 0
+    for _ in range(count):
+        # Все числа не больше границы подходят хотя бы с одним знаком
+        limit = max(current_sum, max_sum - current_sum)
+        value = values[rng.randrange(bisect_right(values, limit))]
+
+        can_add = current_sum + value <= max_sum
+        can_subtract = value <= current_sum
+        if can_add and can_subtract:
+            sign = random_sign(rng)
+        else:
+            sign = 1 if can_add else -1
+
+        number = value * sign
+        numbers.append(number)
+        current_sum += number
+
+    return numbers
+
+
+# Количество разрядов чисел для уровней сложности флэшкарт
+FLASHCARDS_DIGITS = {
+    1: 1,  # числа от 0 до 9
+    2: 2,  # числа от 10 до 99
+    3: 3,  # числа от 100 до 999
+    4: 4,  # числа от 1000 до 9999
+}
+
+
+@lru_cache(maxsize=None)
+def flashcards_number_index(num_digits, max_digit):
+    """
+    Индекс всех чисел из num_digits разрядов, каждая цифра которых не больше
+    max_digit: старшая цифра от 1 (для однозначных — от 0), остальные от 0.
+    Строится один раз на процесс для каждой пары параметров, поэтому выбор
+    случайного числа — O(1) независимо от того, какая доля диапазона подходит
+    (например, при 4 разрядах и max_digit=1 подходит 8 чисел из 9000).
+    """
+    if num_digits == 1:
+        return tuple(range(0, max_digit + 1))
+    numbers = list(range(1, max_digit + 1))
+    for _ in range(num_digits - 1):
+        numbers = [number * 10 + digit for number in numbers for digit in range(0, max_digit + 1)]
+    return tuple(numbers)
+
+
+def generate_flashcards_numbers(difficult_level, max_digit, quantity, rng=random):
+    """
+    Генерирует quantity чисел для флэшкарт с равномерным распределением по всем
+    подходящим числам уровня (как прежний перебор с отбраковкой, но без него).
+    """
+    num_digits = FLASHCARDS_DIGITS.get(difficult_level, 1)
+    # Для многозначных чисел старшая цифра не может быть 0
+    min_digit = 0 if num_digits == 1 else 1
+    max_digit = max(min_digit, min(int(max_digit), 9))
+    index = flashcards_number_index(num_digits, max_digit)
+    return [rng.choice(index) for _ in range(quantity)]
+
+
+# Состояние абакуса для однозначных примеров: (есть ли пятерка, единицы 0-4,
+# промежуточная сумма 0-9) — всего 2 * 5 * 10 = 100 состояний, закодированных числом
+ABACUS_STATES = 2 * 5 * 10
+
+
+def _abacus_state(has_five, units, current_sum):
+    return (int(has_five) * 5 + units) * 10 + current_sum
+
+
+def _abacus_operation_weight(value, max_digit):
+    """Вес операции: выбранное число и пятерка встречаются чаще остальных"""
+    if value == max_digit:
+        if max_digit == 9:
+            return 6  # Для числа 9 нужен больший вес
+        if max_digit == 4:
+            return 5  # Для числа 4 тоже увеличиваем вес
+        return 4  # Стандартный вес
+    if value == 5 and max_digit >= 5:
+        return 2  # Число 5 тоже важно для абакуса
+    return 1
+
+
+def _abacus_operations(has_five, units, current_sum, max_digit):
+    """
+    Допустимые операции из состояния абакуса: список (вес, число, следующее состояние).
+    Пятерка добавляется или убирается целиком, единиц не больше 4 и не меньше 0,
+    числа 6-9 используются напрямую (состояние косточек не меняют),
+    промежуточная сумма всегда от 0 до 9.
+    """
+    operations = []
+
+    # Операции с пятеркой (если max_digit >= 5)
+    if max_digit >= 5:
+        operations.append((-5 if has_five else 5, not has_five, units))
+
+    # Операции с единицами (от 1 до 4 или меньше, если max_digit < 5)
+    for value in range(1, min(4, max_digit) + 1):
+        if units + value <= 4:
+            operations.append((value, has_five, units + value))
+        if units - value >= 0:
+            operations.append((-value, has_five, units - value))
+
+    # Выбранное число 6-9 как отдельная операция
+    if max_digit > 5:
+        operations.append((max_digit, has_five, units))
+        operations.append((-max_digit, has_five, units))
+
+    transitions = []
+    for number, next_five, next_units in operations:
+        new_sum = current_sum + number
+        if 0 <= new_sum <= 9:
+            weight = _abacus_operation_weight(abs(number), max_digit)
+            transitions.append((weight, number, _abacus_state(next_five, next_units, new_sum)))
+    return transitions
+
+
+@lru_cache(maxsize=None)
+def abacus_transition_table(max_digit):
+    """
+    Таблица переходов абакуса для max_digit: для каждого состояния кортеж
+    (накопленные веса, числа, следующие состояния). Строится один раз на процесс,
+    поэтому шаг генерации — один randrange и один bisect без выделения памяти.
+    Если из состояния нет допустимых операций, в таблице лежат операции
+    начального состояния (абакус сбрасывается).
+    """
+    reset = _abacus_operations(False, 0, 0, max_digit)
+    table = []
+    for has_five in (False, True):
+        for units in range(5):
+            for current_sum in range(10):
+                operations = _abacus_operations(has_five, units, current_sum, max_digit) or reset
+                cumulative = []
+                total = 0
+                for weight, _, _ in operations:
+                    total += weight
+                    cumulative.append(total)
+                table.append((
+                    tuple(cumulative),
+                    tuple(number for _, number, _ in operations),
+                    tuple(state for _, _, state in operations),
+                ))
+    return tuple(table)
+
+
+def generate_abacus_numbers(max_digit, num_examples, rng=random):
+    """
+    Генерирует числа согласно правилам абакуса для однозначных чисел.
+
+    Правила абакуса:
+    - Число 5 = одна косточка (пятерка)
+    - Числа 1-4 = соответствующее количество единичных косточек
+    - Числа 6-9 = одна косточка (пятерка) + единичные косточки (6=5+1, 7=5+2, 8=5+3, 9=5+4)
+
+    Правильные операции:
+    - ✅ +4+5-3+2-3+1-5 (используем 5 как отдельную единицу)
+    - ✅ +1+3+5-4+3-1-5 (правильное разложение)
+    - ❌ +5-4 (неправильно, так как 5 - это целая единица)
+    - ❌ 2+3 (неправильно, так как только 4 единичные косточки доступны)
+
+    Последовательность — случайное блуждание по abacus_transition_table(max_digit).
+    """
+    max_digit = max(1, min(int(max_digit), 9))
+    table = abacus_transition_table(max_digit)
+
+    numbers = []
+    state = _abacus_state(False, 0, 0)
+    for _ in range(num_examples):
+        cumulative, values, next_states = table[state]
+        choice = bisect_right(cumulative, rng.randrange(cumulative[-1]))
+        numbers.append(values[choice])
+        state = next_states[choice]
+
+    # Корректируем итоговую сумму, если она превышает max_digit
+    total_sum = sum(numbers)
+    if total_sum > max_digit:
+        numbers.append(max_digit - total_sum)
+
+    return numbers
+
+
+def simply_numbers(range_key, max_digit, count, rng=random):
+    """
+    Последовательность чисел для игры "Просто" по настройкам из формы:
+    для однозначных чисел с max_digit от 5 до 9 — по правилам абакуса,
+    иначе — числа из цифр от 1 до max_digit с суммой в пределах [0, max_sum].
+    """
+    if range_key == 1 and max_digit >= 5:
+        return generate_abacus_numbers(max_digit, count, rng)
+    return generate_bounded_sequence(SIMPLY_DIGITS.get(range_key, 2), max_digit, count, rng)
@@ -0,0 +1,94 @@
+"""
+Замер скорости генераторов примеров.
+
+Запуск: python manage.py bench_generators [--repeat N]
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from mental_app.formula_chains import (
+    FORMULAS, SUPPORTED_DIGITS, transition_table, finish_table, generate_examples
+)
+from mental_app.generators import (
+    generate_bounded_sequence, generate_abacus_numbers, generate_flashcards_numbers
+)
+
+
+def _measure(func, repeat):
+    """Возвращает (среднее, худшее) время вызова func в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sum(timings) / len(timings), max(timings)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время генерации примеров для игр'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Количество повторов каждого замера')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        rng = random.Random(options['seed'])
+
+        self.stdout.write('Просто (режим 3): range_key=4, max_digit=1 — худший случай для старого перебора')
+        for num_examples in (10, 100, 1000, 10000):
+            average, worst = _measure(
+                lambda: generate_bounded_sequence(4, 1, num_examples, rng), repeat
+            )
+            self.stdout.write(f'  {num_examples:>6} чисел: среднее {average:8.3f} мс, худшее {worst:8.3f} мс')
+
+        self.stdout.write('Просто (режим 3): все разряды и цифры, 1000 чисел')
+        for num_digits in (1, 2, 3, 4):
+            for max_digit in range(1, 10):
+                average, worst = _measure(
+                    lambda: generate_bounded_sequence(num_digits, max_digit, 1000, rng), repeat
+                )
+                self.stdout.write(
+                    f'  разрядов={num_digits} max_digit={max_digit}: '
+                    f'среднее {average:8.3f} мс, худшее {worst:8.3f} мс'
+                )
+
+        self.stdout.write('Просто (абакус): однозначные числа 5-9, время на одно число')
+        for max_digit in range(5, 10):
+            for num_examples in (100, 1000):
+                average, worst = _measure(
+                    lambda: generate_abacus_numbers(max_digit, num_examples, rng), repeat
+                )
+                self.stdout.write(
+                    f'  max_digit={max_digit} {num_examples:>5} чисел: среднее {average:8.3f} мс, '
+                    f'на число {average * 1000 / num_examples:6.2f} мкс'
+                )
+
+        self.stdout.write('Флэшкарты: все уровни сложности и максимальные цифры, 99 чисел')
+        for difficult_level in (1, 2, 3, 4):
+            for max_digit in range(0, 10):
+                average, worst = _measure(
+                    lambda: generate_flashcards_numbers(difficult_level, max_digit, 99, rng), repeat
+                )
+                self.stdout.write(
+                    f'  уровень={difficult_level} max_digit={max_digit}: '
+                    f'среднее {average:8.3f} мс, худшее {worst:8.3f} мс'
+                )
+
+        self.stdout.write('Цепочки по формулам: построение таблиц и генерация 1000 примеров')
+        for formula, (_, numbers, _) in FORMULAS.items():
+            for digits in SUPPORTED_DIGITS:
+                for number in numbers:
+                    started = time.perf_counter()
+                    transition_table(formula, number, digits)
+                    finish_table(formula, number, digits)
+                    build_ms = (time.perf_counter() - started) * 1000
+                    average, worst = _measure(
+                        lambda: generate_examples(formula, number, digits, 1000, rng), max(1, repeat // 10)
+                    )
+                    self.stdout.write(
+                        f'  {formula} {number} разрядов={digits}: таблицы {build_ms:8.1f} мс, '
+                        f'1000 примеров {average:8.3f} мс ({1000 / average * 1000:,.0f} примеров/с)'
+                    )
@@ -0,0 +1,27 @@
+"""
+Сборка файла пулов примеров по формулам (POOLS_FILE в корне проекта).
+
+Запуск: python manage.py build_formula_pools
+Пулы генерируются по тем же зернам, что и при сборке на лету, поэтому
+номера примеров у клиентов не меняются. Команду нужно запускать после
+изменения правил в formula_chains и коммитить получившийся файл.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mental_app.chains import POOLS_FILE, format_pool_line
+from mental_app.formula_chains import generate_pool, pool_keys
+
+
+class Command(BaseCommand):
+    help = 'Генерирует пулы примеров по формулам и записывает их в файл'
+
+    def handle(self, *args, **options):
+        path = settings.BASE_DIR / POOLS_FILE
+        lines = [format_pool_line(key, generate_pool(*key)) for key in pool_keys()]
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        # Подменяем файл целиком: процессы сайта видят либо старый, либо новый файл
+        tmp_path.replace(path)
+        self.stdout.write(self.style.SUCCESS(f'Записано пулов: {len(lines)} в {path}'))
@@ -0,0 +1,19 @@
+"""
+Сброс буфера результатов игр (GameResult) в базу.
+
+Запуск: python manage.py flush_game_results
+Обычно буфер сбрасывается сам (по размеру или по времени) при очередном ответе
+любого ученика; команда дописывает остаток всех процессов — по расписанию
+(например, раз в минуту из cron) или перед остановкой сервера.
+"""
+from django.core.management.base import BaseCommand
+
+from mental_app.results import flush_results
+
+
+class Command(BaseCommand):
+    help = 'Записывает накопленные в кеше результаты игр в базу'
+
+    def handle(self, *args, **options):
+        count = flush_results()
+        self.stdout.write(self.style.SUCCESS(f'Записано результатов: {count}'))
@@ -0,0 +1,37 @@
+"""
+Пересборка и проверка помесячных балансов учеников (StudentMonthBalance).
+
+Запуск: python manage.py rebuild_month_balances [--check]
+Без флага таблица пересобирается из Attendance и затем проверяется;
+с --check — только проверка (код возврата 1 при расхождениях).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from mental_app.balances import rebuild_balances, verify_balances
+
+# Сколько расхождений показывать подробно
+SHOW_MISMATCHES = 20
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает помесячные балансы учеников из посещений и проверяет их'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Только проверить, не пересобирая')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = rebuild_balances()
+            self.stdout.write(f'Пересобрано балансов: {count}')
+
+        mismatches = verify_balances()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Балансы совпадают с посещениями'))
+            return
+
+        for (student_id, class_id, year, month), expected, stored in mismatches[:SHOW_MISMATCHES]:
+            self.stdout.write(
+                f'ученик {student_id}, класс {class_id}, {month:02d}.{year}: '
+                f'ожидалось {expected}, в таблице {stored}'
+            )
+        raise CommandError(f'Расхождений: {len(mismatches)}')
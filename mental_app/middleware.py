@@ -0,0 +1,156 @@
+"""
+Определение того, кто делает запрос: ученик (вход через сессию), учитель
+(вход через Django) или гость.
+
+PrincipalMiddleware один раз на запрос собирает небольшой объект Principal
+и кладет его в request.principal; его используют декораторы игр и контекстный
+процессор. Класс ученика, хеш сессии и статус учителя кешируются под ключами
+с версией (versioned_cache): сигналы ученика, профиля учителя и пользователя
+сдвигают версию в общем кеше после фиксации транзакции, и смена пароля,
+отключение пользователя или перевод ученика видны всем процессам со следующего
+запроса. Решение "можно ли играть" на страницах игр не требует запросов к базе.
+
+Изменения в обход сигналов (QuerySet.update, правка базы вручную) версию
+не сдвигают — такие записи живут не дольше PRINCIPAL_CACHE_TIMEOUT.
+"""
+from functools import wraps
+
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from . import versioned_cache
+from .models import Students
+
+PRINCIPAL_CACHE_TIMEOUT = 60
+
+
+def student_version_key(student_id):
+    return f'principal_student_version_{student_id}'
+
+
+def user_version_key(user_id):
+    return f'principal_user_version_{user_id}'
+
+
+class Principal:
+    """Ученик и/или пользователь Django текущего запроса"""
+    __slots__ = ('student_id', 'class_id', 'user_id', 'teacher_profile_id', 'teacher_status')
+
+    def __init__(self, student_id=None, class_id=None, user_id=None, teacher_profile_id=None, teacher_status=None):
+        self.student_id = student_id
+        self.class_id = class_id
+        self.user_id = user_id
+        self.teacher_profile_id = teacher_profile_id
+        self.teacher_status = teacher_status
+
+    @property
+    def is_student(self):
+        return self.student_id is not None
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    @property
+    def is_teacher(self):
+        """Учитель с подтвержденным профилем"""
+        return self.teacher_status == 'approved'
+
+    @property
+    def can_play(self):
+        return self.is_student or self.is_teacher
+
+
+def _student_class_id(student_id):
+    """Класс ученика (или None) — из кеша, при промахе одним запросом"""
+    def build():
+        # Храним кортежем, чтобы отличать "нет класса" от промаха кеша
+        return (Students.objects.filter(id=student_id).values_list('student_class_id', flat=True).first(),)
+    return versioned_cache.get_or_build(
+        student_version_key(student_id), f'principal_student_{student_id}', build, PRINCIPAL_CACHE_TIMEOUT
+    )[0]
+
+
+def _user_info(user_id):
+    """
+    (хеш сессии пользователя, id профиля учителя, статус) или None,
+    если пользователя нет или он отключен — из кеша, при промахе одним запросом
+    """
+    def build():
+        user = User.objects.filter(pk=user_id, is_active=True).select_related('teacher_profile').first()
+        if user is None:
+            return (None,)
+        profile = getattr(user, 'teacher_profile', None)
+        return ((
+            user.get_session_auth_hash(),
+            profile.id if profile else None,
+            profile.status if profile else None,
+        ),)
+    return versioned_cache.get_or_build(
+        user_version_key(user_id), f'principal_user_{user_id}', build, PRINCIPAL_CACHE_TIMEOUT
+    )[0]
+
+
+def resolve_principal(request):
+    """Собирает Principal по данным сессии"""
+    session = request.session
+    principal = Principal()
+
+    student_id = session.get('student_id')
+    if student_id:
+        principal.student_id = student_id
+        principal.class_id = _student_class_id(student_id)
+
+    user_id = session.get(SESSION_KEY)
+    if user_id is not None:
+        info = _user_info(user_id)
+        # Сессия действительна, только если хеш совпадает (как в django.contrib.auth.get_user)
+        if info is not None and constant_time_compare(session.get(HASH_SESSION_KEY, ''), info[0]):
+            principal.user_id = user_id
+            principal.teacher_profile_id = info[1]
+            principal.teacher_status = info[2]
+
+    return principal
+
+
+def get_principal(request):
+    """Principal запроса (если middleware не подключен — вычисляется на месте)"""
+    principal = getattr(request, 'principal', None)
+    if principal is None:
+        principal = request.principal = resolve_principal(request)
+    return principal
+
+
+class PrincipalMiddleware:
+    """Кладет в request.principal ленивый Principal: вычисляется при первом обращении"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.principal = SimpleLazyObject(lambda: resolve_principal(request))
+        return self.get_response(request)
+
+
+def player_required(view_func):
+    """Доступ к игре только ученикам и подтвержденным учителям, остальных — на вход ученика"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not get_principal(request).can_play:
+            return redirect('student_login')
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def player_required_json(view_func):
+    """То же для JSON-запросов игр: без доступа — ответ 403"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not get_principal(request).can_play:
+            return JsonResponse({'success': False, 'error': 'Требуется авторизация'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
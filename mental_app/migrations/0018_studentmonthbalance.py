@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:52
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def fill_balances(apps, schema_editor):
+    """Заполняем балансы из существующих посещений (как balances.rebuild_balances)"""
+    Attendance = apps.get_model('mental_app', 'Attendance')
+    Class = apps.get_model('mental_app', 'Class')
+    StudentMonthBalance = apps.get_model('mental_app', 'StudentMonthBalance')
+
+    fees = dict(Class.objects.values_list('id', 'lesson_fee'))
+    rows = (
+        Attendance.objects
+        .annotate(month_start=TruncMonth('date'))
+        .values('student_id', 'class_group_id', 'month_start')
+        .annotate(
+            lessons=Count('id'),
+            attended=Count('id', filter=Q(is_present=True)),
+            paid=Count('id', filter=Q(is_paid=True)),
+            carried_over=Count('id', filter=Q(payment_carried_over=True)),
+        )
+        .order_by()
+    )
+    balances = []
+    for row in rows:
+        fee = fees.get(row['class_group_id']) or Decimal('0')
+        balances.append(StudentMonthBalance(
+            student_id=row['student_id'],
+            class_group_id=row['class_group_id'],
+            year=row['month_start'].year,
+            month=row['month_start'].month,
+            lessons=row['lessons'],
+            attended=row['attended'],
+            paid=row['paid'],
+            carried_over=row['carried_over'],
+            amount_due=max(Decimal('0'), (row['lessons'] - row['paid']) * fee) if fee > 0 else Decimal('0'),
+        ))
+    StudentMonthBalance.objects.bulk_create(balances, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mental_app', '0017_add_performance_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentMonthBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Месяц')),
+                ('lessons', models.PositiveIntegerField(default=0, verbose_name='Занятий')),
+                ('attended', models.PositiveIntegerField(default=0, verbose_name='Посещено')),
+                ('paid', models.PositiveIntegerField(default=0, verbose_name='Оплачено')),
+                ('carried_over', models.PositiveIntegerField(default=0, verbose_name='Перенесено')),
+                ('amount_due', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='К оплате')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('class_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_balances', to='mental_app.class', verbose_name='Класс')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_balances', to='mental_app.students', verbose_name='Ученик')),
+            ],
+            options={
+                'verbose_name': 'Баланс ученика за месяц',
+                'verbose_name_plural': 'Балансы учеников по месяцам',
+                'ordering': ['year', 'month'],
+                'unique_together': {('student', 'class_group', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
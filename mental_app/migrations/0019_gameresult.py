@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mental_app', '0018_studentmonthbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game', models.CharField(max_length=50, verbose_name='Игра')),
+                ('settings_hash', models.CharField(blank=True, max_length=40, verbose_name='Хеш настроек')),
+                ('problem_count', models.PositiveIntegerField(verbose_name='Примеров')),
+                ('correct_count', models.PositiveIntegerField(verbose_name='Верно')),
+                ('duration', models.DurationField(blank=True, null=True, verbose_name='Длительность')),
+                ('played_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время игры')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_results', to='mental_app.students', verbose_name='Ученик')),
+            ],
+            options={
+                'verbose_name': 'Результат игры',
+                'verbose_name_plural': 'Результаты игр',
+                'ordering': ['-played_at'],
+                'indexes': [models.Index(fields=['student', 'game', 'played_at'], name='mental_app__student_6e525c_idx')],
+            },
+        ),
+    ]
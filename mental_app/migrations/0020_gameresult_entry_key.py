@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mental_app', '0019_gameresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameresult',
+            name='entry_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Ключ записи буфера'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from .games import game_choices
 
 class TeacherProfile(models.Model):
     STATUS_CHOICES = [
@@ -36,6 +37,12 @@ class Class(models.Model):
     
     def __str__(self):
         return f'{self.name} - {self.time.strftime("%H:%M")} ({self.teacher.user.get_full_name()})'
+
+    def get_students_count(self):
+        """Количество учеников; берется из аннотации students_total, если queryset ее добавил"""
+        if hasattr(self, 'students_total'):
+            return self.students_total
+        return self.students.count()
     
     class Meta:
         verbose_name = 'Класс'
@@ -119,18 +126,8 @@ class PaymentSettings(models.Model):
 
 class ClassGameAccess(models.Model):
     """Доступность игр для класса"""
-    GAME_CHOICES = [
-        ('multiplication_choose', 'Умножение'),
-        ('square', 'Квадраты'),
-        ('tricks', 'Трюки'),
-        ('flashcards', 'Флэшкарты'),
-        ('multiplication_base', 'Умножение от базы'),
-        ('multiplication_to_20', 'Умножение до 20'),
-        ('brothers', 'Братья'),
-        ('friends', 'Друзья'),
-        ('friend_brother', 'Друг+брат'),
-        ('multiplication_table', 'Таблица умножения'),
-    ]
+    # Список игр ведется в реестре games.py
+    GAME_CHOICES = game_choices()
     
     class_group = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='game_access', verbose_name='Класс')
     game = models.CharField(max_length=50, choices=GAME_CHOICES, verbose_name='Игра')
@@ -165,7 +162,9 @@ class MonthlySchedule(models.Model):
         return f'{month_names[self.month-1]} {self.year} - {self.class_group.name}'
 
     def get_unique_lesson_dates_count(self):
-        """Возвращает количество уникальных дат занятий"""
+        """Возвращает количество уникальных дат занятий (из аннотации lesson_dates_total, если есть)"""
+        if hasattr(self, 'lesson_dates_total'):
+            return self.lesson_dates_total
         return self.attendances.values('date').distinct().count()
 
     def get_total_attendance_records(self):
@@ -216,3 +215,55 @@ class GameSettings(models.Model):
 
     def __str__(self):
         return f"Настройки {self.game_type} для {self.user.username}"
+
+
+class StudentMonthBalance(models.Model):
+    """
+    Итоги ученика за месяц: занятия, посещения, оплаты и сумма к оплате.
+    Пересчитывается из Attendance (см. balances.py) при изменении посещений
+    и стоимости занятия класса; пересобрать и проверить — rebuild_month_balances.
+    """
+    student = models.ForeignKey(Students, on_delete=models.CASCADE, related_name='month_balances', verbose_name='Ученик')
+    class_group = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='month_balances', verbose_name='Класс')
+    year = models.PositiveSmallIntegerField(verbose_name='Год')
+    month = models.PositiveSmallIntegerField(verbose_name='Месяц')
+    lessons = models.PositiveIntegerField(default=0, verbose_name='Занятий')
+    attended = models.PositiveIntegerField(default=0, verbose_name='Посещено')
+    paid = models.PositiveIntegerField(default=0, verbose_name='Оплачено')
+    carried_over = models.PositiveIntegerField(default=0, verbose_name='Перенесено')
+    amount_due = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='К оплате')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    def __str__(self):
+        return f'{self.student} - {self.month:02d}.{self.year}'
+
+    class Meta:
+        verbose_name = 'Баланс ученика за месяц'
+        verbose_name_plural = 'Балансы учеников по месяцам'
+        unique_together = ['student', 'class_group', 'year', 'month']
+        ordering = ['year', 'month']
+
+
+class GameResult(models.Model):
+    """
+    Результат раунда игры ученика: сколько примеров решено и сколько верно.
+    Записывается пакетно через буфер в общем кеше (см. results.py); entry_key —
+    ключ записи буфера, по нему повторный сброс той же записи пропускается.
+    """
+    student = models.ForeignKey(Students, on_delete=models.CASCADE, related_name='game_results', verbose_name='Ученик')
+    game = models.CharField(max_length=50, verbose_name='Игра')
+    settings_hash = models.CharField(max_length=40, blank=True, verbose_name='Хеш настроек')
+    problem_count = models.PositiveIntegerField(verbose_name='Примеров')
+    correct_count = models.PositiveIntegerField(verbose_name='Верно')
+    duration = models.DurationField(null=True, blank=True, verbose_name='Длительность')
+    played_at = models.DateTimeField(default=timezone.now, verbose_name='Время игры')
+    entry_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False, verbose_name='Ключ записи буфера')
+
+    def __str__(self):
+        return f'{self.student} - {self.game}: {self.correct_count}/{self.problem_count}'
+
+    class Meta:
+        verbose_name = 'Результат игры'
+        verbose_name_plural = 'Результаты игр'
+        ordering = ['-played_at']
+        indexes = [models.Index(fields=['student', 'game', 'played_at'])]
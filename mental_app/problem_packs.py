@@ -0,0 +1,91 @@
+"""
+Пакеты примеров для игр на умножение.
+
+Вместо цикла POST → redirect → GET на каждый пример клиент получает сразу
+пакет из N примеров с ответами, проходит раунд в браузере и отправляет
+результаты одним запросом в конце. В сессии хранится только описание пакета
+(игра, настройки, зерно, размер), примеры пересчитываются по зерну при проверке,
+поэтому за раунд происходит одна небольшая запись сессии при выдаче пакета
+и одна при проверке.
+"""
+from .game_sessions import new_game, parse_seed, problem_at
+
+PACK_SESSION_KEY = 'problem_pack'
+DEFAULT_PACK_SIZE = 20
+MAX_PACK_SIZE = 100
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Для каждой игры — чтение настроек из формы выбора (те же имена полей, что и в режиме 1),
+# пример по этим настройкам строит game_sessions.problem_at
+PACK_GAMES = {
+    'multiplication_choose': lambda data: {
+        'first_range': data.get('first-multiplier'),
+        'second_range': data.get('second-multiplier'),
+    },
+    'multiplication_to_20': lambda data: {
+        'first_range': data.get('first-multiplier'),
+        'second_multiplier': _parse_int(data.get('second-multiplier')),
+    },
+    'multiplication_base': lambda data: {'selected_ranges': data.getlist('multiplier-range')},
+    'tricks': lambda data: {'number_type': data.get('number-type')},
+}
+
+
+def pack_size(value):
+    """Размер пакета из запроса, ограниченный MAX_PACK_SIZE"""
+    count = _parse_int(value) or DEFAULT_PACK_SIZE
+    return max(1, min(count, MAX_PACK_SIZE))
+
+
+def build_pack(game, data):
+    """
+    Собирает описание пакета примеров для игры по данным формы выбора.
+    Необязательное поле seed позволяет повторить уже сыгранный раунд.
+    Возвращает словарь {'type', 'settings', 'seed', 'index', 'count'} или None,
+    если игра неизвестна или настройки некорректны.
+    """
+    if game not in PACK_GAMES:
+        return None
+
+    pack = new_game(game, PACK_GAMES[game](data), parse_seed(data.get('seed')))
+    # Все примеры строятся по одним настройкам: если первый не получился, не получится ни один
+    if problem_at(pack, 0) is None:
+        return None
+    pack['count'] = pack_size(data.get('count'))
+    return pack
+
+
+def pack_problems(pack):
+    """Примеры пакета, пересчитанные по зерну"""
+    return [list(problem_at(pack, index)) for index in range(pack['count'])]
+
+
+def pack_payload(pack):
+    """Данные пакета для клиента: примеры, ключи ответов и зерно для повтора раунда"""
+    problems = pack_problems(pack)
+    return {
+        'game': pack['type'],
+        'seed': pack['seed'],
+        'problems': problems,
+        'answers': [first * second for first, second in problems],
+    }
+
+
+def check_answers(pack, answers):
+    """
+    Проверяет ответы раунда против пакета из сессии.
+    Возвращает (количество верных ответов, список bool по каждому примеру).
+    Лишние ответы игнорируются, недостающие считаются неверными.
+    """
+    results = []
+    for index, (first, second) in enumerate(pack_problems(pack)):
+        answer = _parse_int(answers[index]) if index < len(answers) else None
+        results.append(answer is not None and answer == first * second)
+    return sum(results), results
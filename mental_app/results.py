@@ -0,0 +1,199 @@
+"""
+Результаты игр учеников (GameResult) с отложенной записью.
+
+Ответ ученика не пишется в базу сразу: запись кладется в буфер в общем для
+всех процессов кеше (alias 'shared', versioned_cache), а в базу буфер
+сбрасывается одним bulk_create, когда процесс накопил FLUSH_SIZE записей или
+прошло FLUSH_INTERVAL секунд с прошлого сброса. Во время урока, когда весь
+класс отвечает одновременно, это один INSERT на пачку ответов вместо INSERT
+(и записи на диск в SQLite) на каждый ответ.
+
+Файловый кеш не умеет атомарных incr и add, поэтому буфер устроен без них:
+
+- у каждого процесса свой токен и своя нумерация ячеек — процессы не пишут
+  в одни и те же ключи; номер последней записанной ячейки процесс хранит
+  под своим ключом, токены процессов — в общем реестре;
+- сбросить буфер может любой процесс и команда flush_game_results
+  (по расписанию или перед остановкой) — результаты простаивающего или
+  перезапущенного процесса не теряются;
+- у каждой записи есть уникальный entry_key, и bulk_create пропускает уже
+  записанные, поэтому два одновременных сброса не создают дублей.
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .middleware import get_principal
+from .models import GameResult, Students
+from .versioned_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = 50
+FLUSH_INTERVAL = 60
+BUFFER_TIMEOUT = 60 * 60 * 24 * 7
+# Процесс без новых записей дольше этого убирается из реестра после сброса
+PROCESS_IDLE_TIMEOUT = 60 * 60 * 24
+
+PROCESSES_KEY = 'game_results_processes'  # {токен процесса: время регистрации}
+FLUSHED_AT_KEY = 'game_results_flushed_at'
+
+# Токен этого процесса: pid и время запуска (pid может достаться другому процессу)
+_token = f'{os.getpid()}_{time.time_ns()}'
+_numbers = itertools.count(1)
+_lock = threading.Lock()
+_state = {'token_pid': os.getpid()}
+
+
+def _seq_key(token):
+    return f'game_results_seq_{token}'          # (номер последней записанной ячейки, время)
+
+
+def _flushed_key(token):
+    return f'game_results_flushed_{token}'      # номер последней сброшенной ячейки
+
+
+def _slot_key(token, number):
+    return f'game_results_{token}_{number}'
+
+
+def settings_hash(settings):
+    """Хеш настроек игры: одинаковые настройки — одинаковый хеш, независимо от порядка ключей"""
+    if not settings:
+        return ''
+    data = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def _process_token():
+    """Токен процесса; после fork (предзагрузка приложения в Passenger) — новый"""
+    global _token, _numbers
+    if _state['token_pid'] != os.getpid():
+        _token = f'{os.getpid()}_{time.time_ns()}'
+        _numbers = itertools.count(1)
+        _state['token_pid'] = os.getpid()
+    return _token
+
+
+def _register(shared, token):
+    """
+    Добавляет токен в реестр процессов. Реестр обновляется чтением и записью
+    (без атомарности), поэтому после записи проверяем, что токен не затерт
+    одновременной регистрацией другого процесса.
+    """
+    for _ in range(5):
+        processes = shared.get(PROCESSES_KEY) or {}
+        if token in processes:
+            return
+        processes[token] = time.time()
+        shared.set(PROCESSES_KEY, processes, None)
+    logger.warning('Не удалось зарегистрировать процесс %s в буфере результатов игр', token)
+
+
+def buffer_result(student_id, game, settings, problem_count, correct_count, duration=None):
+    """Кладет результат в буфер и при необходимости сбрасывает буфер в базу"""
+    shared = shared_cache()
+    with _lock:
+        token = _process_token()
+        number = next(_numbers)
+        entry = {
+            'entry_key': f'{token}_{number}',
+            'student_id': student_id,
+            'game': game,
+            'settings_hash': settings_hash(settings),
+            'problem_count': problem_count,
+            'correct_count': correct_count,
+            'duration': duration,
+            'played_at': timezone.now(),
+        }
+        # Сначала ячейка, потом номер: ячейки до номера всегда записаны
+        shared.set(_slot_key(token, number), entry, BUFFER_TIMEOUT)
+        shared.set(_seq_key(token), (number, time.time()), BUFFER_TIMEOUT)
+        # Токен могли затереть или убрать из реестра — проверяем при каждой записи
+        _register(shared, token)
+        pending = number - (shared.get(_flushed_key(token)) or 0)
+
+    flushed_at = shared.get(FLUSHED_AT_KEY)
+    if flushed_at is None:
+        shared.add(FLUSHED_AT_KEY, time.time(), None)
+    elif pending >= FLUSH_SIZE or time.time() - flushed_at >= FLUSH_INTERVAL:
+        try:
+            flush_results()
+        except DatabaseError:
+            # Буфер остается в кеше и запишется при следующем сбросе
+            logger.exception('Не удалось сбросить буфер результатов игр')
+
+
+def record_game_result(request, game, settings, problem_count, correct_count, started=None):
+    """
+    Результат игры текущего ученика (у учителей результаты не сохраняются).
+    started — time.time() начала раунда, если известно.
+    """
+    student_id = get_principal(request).student_id
+    if student_id is None or not problem_count:
+        return
+    duration = timedelta(seconds=max(0, time.time() - started)) if started else None
+    buffer_result(student_id, game, settings, problem_count, correct_count, duration)
+
+
+def flush_results():
+    """
+    Сбрасывает накопленные результаты всех процессов в базу одним bulk_create.
+    Возвращает количество записей, взятых из буфера.
+    """
+    shared = shared_cache()
+    shared.set(FLUSHED_AT_KEY, time.time(), None)
+    processes = shared.get(PROCESSES_KEY) or {}
+
+    ranges = {}
+    for token in processes:
+        last, updated_at = shared.get(_seq_key(token)) or (0, 0)
+        flushed = shared.get(_flushed_key(token)) or 0
+        ranges[token] = (flushed, last, updated_at)
+
+    keys = [
+        _slot_key(token, number)
+        for token, (flushed, last, _) in ranges.items()
+        for number in range(flushed + 1, last + 1)
+    ]
+    # Пустая ячейка до номера процесса — уже сброшена параллельно или вытеснена
+    entries = list(shared.get_many(keys).values())
+
+    # Ученика могли удалить, пока его результат ждал в буфере
+    existing = set(Students.objects.filter(
+        id__in={entry['student_id'] for entry in entries}
+    ).values_list('id', flat=True))
+    with transaction.atomic():
+        GameResult.objects.bulk_create(
+            [GameResult(**entry) for entry in entries if entry['student_id'] in existing],
+            ignore_conflicts=True,
+        )
+
+    for token, (flushed, last, updated_at) in ranges.items():
+        shared.set(_flushed_key(token), last, BUFFER_TIMEOUT)
+    shared.delete_many(keys)
+    _forget_idle_processes(shared, ranges)
+    return len(entries)
+
+
+def _forget_idle_processes(shared, ranges):
+    """Убирает из реестра сброшенные процессы, которые давно ничего не записывали"""
+    idle = {
+        token for token, (_, _, updated_at) in ranges.items()
+        if time.time() - updated_at >= PROCESS_IDLE_TIMEOUT
+    }
+    if not idle:
+        return
+    processes = shared.get(PROCESSES_KEY) or {}
+    for token in idle:
+        processes.pop(token, None)
+        shared.delete_many([_seq_key(token), _flushed_key(token)])
+    shared.set(PROCESSES_KEY, processes, None)
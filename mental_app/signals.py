@@ -0,0 +1,102 @@
+"""
+Сигналы приложения: сброс кешей при изменении данных.
+Подключаются в MentalAppConfig.ready().
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .balances import balance_key, mark_balances_dirty, refresh_class_fee
+from .dashboard import mark_teacher_stats_dirty
+from .games import class_games_version_key
+from .middleware import student_version_key, user_version_key
+from .models import Attendance, Class, ClassGameAccess, Students, TeacherProfile
+from .versioned_cache import bump_on_commit
+
+
+@receiver([post_save, post_delete], sender=Students)
+def forget_student_principal(sender, instance, **kwargs):
+    """Ученика перевели в другой класс или удалили"""
+    bump_on_commit(student_version_key(instance.id))
+
+
+@receiver([post_save, post_delete], sender=TeacherProfile)
+def forget_teacher_principal(sender, instance, **kwargs):
+    """Изменился статус учителя (например, подтвержден в админке)"""
+    bump_on_commit(user_version_key(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_user_principal(sender, instance, **kwargs):
+    """Сменился пароль или пользователь отключен"""
+    bump_on_commit(user_version_key(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=ClassGameAccess)
+def forget_class_games(sender, instance, **kwargs):
+    """Учитель включил или выключил игру — кеш игр класса устаревает после фиксации транзакции"""
+    bump_on_commit(class_games_version_key(instance.class_group_id))
+
+
+@receiver([post_save, post_delete], sender=Attendance)
+def refresh_attendance_balance(sender, instance, **kwargs):
+    """Баланс ученика за месяц пересчитывается после фиксации транзакции"""
+    mark_balances_dirty([balance_key(instance)])
+
+
+@receiver(pre_save, sender=Attendance)
+def refresh_previous_attendance_balance(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Запись перенесли на другой месяц, другому ученику или классу — прежний баланс тоже пересчитывается"""
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {'student', 'class_group', 'date'} & set(update_fields):
+        return
+    previous = Attendance.objects.filter(pk=instance.pk).values_list('student_id', 'class_group_id', 'date').first()
+    if previous is not None:
+        student_id, class_id, lesson_date = previous
+        mark_balances_dirty([(student_id, class_id, lesson_date.year, lesson_date.month)])
+
+
+@receiver(pre_save, sender=Class)
+def remember_lesson_fee(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Запоминаем прежнюю стоимость занятия, чтобы после сохранения сравнить"""
+    instance._lesson_fee_changed = False
+    if raw or instance.pk is None or (update_fields is not None and 'lesson_fee' not in update_fields):
+        return
+    previous_fee = Class.objects.filter(pk=instance.pk).values_list('lesson_fee', flat=True).first()
+    instance._lesson_fee_changed = previous_fee != instance.lesson_fee
+
+
+@receiver(post_save, sender=Class)
+def refresh_lesson_fee_balances(sender, instance, created, **kwargs):
+    """Изменилась стоимость занятия — пересчитываем суммы к оплате класса"""
+    if not created and getattr(instance, '_lesson_fee_changed', False):
+        refresh_class_fee(instance)
+
+
+@receiver([post_save, post_delete], sender=Attendance)
+def forget_attendance_teacher_stats(sender, instance, **kwargs):
+    """Посещения класса изменились — статистика учителя устаревает"""
+    mark_teacher_stats_dirty(class_ids=[instance.class_group_id])
+
+
+@receiver([post_save, post_delete], sender=Students)
+def forget_student_teacher_stats(sender, instance, **kwargs):
+    """Ученик добавлен, переведен или удален — статистика учителя устаревает"""
+    mark_teacher_stats_dirty(class_ids=[instance.student_class_id])
+
+
+@receiver(pre_save, sender=Students)
+def forget_previous_class_teacher_stats(sender, instance, raw=False, **kwargs):
+    """Ученика переводят в другой класс — статистика учителя прежнего класса тоже устаревает"""
+    if raw or instance.pk is None:
+        return
+    previous_class_id = Students.objects.filter(pk=instance.pk).values_list('student_class_id', flat=True).first()
+    if previous_class_id != instance.student_class_id:
+        mark_teacher_stats_dirty(class_ids=[previous_class_id])
+
+
+@receiver([post_save, post_delete], sender=Class)
+def forget_teacher_stats(sender, instance, **kwargs):
+    """Класс создан, изменен или удален — учитель известен сразу (удаленный класс уже не найти)"""
+    mark_teacher_stats_dirty(teacher_ids=[instance.teacher_id])
@@ -1,5 +1,7 @@
 from django import template
 
+from mental_app.abacus import encode_numbers
+
 register = template.Library()
 
 @register.filter
@@ -11,3 +13,14 @@ def get_item(dictionary, key):
     if dictionary is None:
         return None
     return dictionary.get(key)
+
+
+@register.filter
+def abacus_columns(numbers):
+    """
+    Template filter to encode a list of numbers into abacus columns (see mental_app.abacus).
+    Usage: {% for columns in numbers|abacus_columns %}{% for column in columns %}
+    """
+    if not numbers:
+        return []
+    return encode_numbers(numbers)
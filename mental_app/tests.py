@@ -1,3 +1,1180 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import random
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .abacus import encode_number, encode_numbers
+from .attendance import apply_attendance_changes, carry_over_unpaid, create_attendance_rows
+from .balances import debt_report_rows, rebuild_balances, verify_balances
+from .templatetags.custom_filters import abacus_columns
+from . import chains
+from .chains import CHAIN_FILES, chain_examples, example_count, get_chain, formula_pool
+from .formula_chains import (
+    EXAMPLE_SIZE, POOL_SIZE, example_follows_formula, example_is_valid, generate_examples, generate_pool, pool_keys,
+)
+from .context_processors import available_games
+from .dashboard import teacher_stats
+from .generators import (
+    abacus_transition_table, digit_restricted_numbers, flashcards_number_index, generate_abacus_numbers,
+    generate_bounded_sequence, generate_flashcards_numbers, simply_max_sum,
+)
+from .game_sessions import GAME_SESSION_KEY, game_sequence, new_game, parse_seed, problem_at
+from .games import CLASS_GAMES, GAMES_BY_CODE, dashboard_card, enabled_class_games
+from .middleware import resolve_principal
+from .models import (
+    Attendance, Class, ClassGameAccess, GameResult, MonthlySchedule, StudentMonthBalance, Students, TeacherProfile,
+)
+from .results import PROCESSES_KEY, _flushed_key, flush_results, record_game_result
+from .versioned_cache import shared_cache
+from .views import simply_game_total
+
+
+class ConfigureClassGamesTests(TestCase):
+    """Страница настройки игр класса: чтение и сохранение одним запросом к ClassGameAccess"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн, Ср', academic_year='2025-2026'
+        )
+        self.url = reverse('configure_class_games', args=[self.class_obj.id])
+        self.client.login(username='teacher', password='password')
+
+    def access_queries(self, queries):
+        return [query['sql'] for query in queries if 'mental_app_classgameaccess' in query['sql']]
+
+    def post_games(self, states):
+        return self.client.post(self.url, {
+            'games': list(states),
+            'enabled': ['true' if enabled else 'false' for enabled in states.values()],
+        })
+
+    def test_get_reads_access_with_one_query(self):
+        ClassGameAccess.objects.create(class_group=self.class_obj, game='square', is_enabled=True)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.access_queries(queries)), 1)
+        current_access = response.context['current_access']
+        self.assertEqual(set(current_access), {game.code for game in CLASS_GAMES})
+        self.assertTrue(current_access['square'])
+        self.assertFalse(current_access['tricks'])
+
+    def test_post_upserts_all_games_with_one_query(self):
+        ClassGameAccess.objects.create(class_group=self.class_obj, game='square', is_enabled=True)
+        states = {game.code: game.code == 'tricks' for game in CLASS_GAMES}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_games(states)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(self.access_queries(queries)), 1)
+        saved = dict(ClassGameAccess.objects.filter(class_group=self.class_obj).values_list('game', 'is_enabled'))
+        self.assertEqual(saved, states)
+
+    def test_post_resets_class_games_cache(self):
+        self.assertEqual(enabled_class_games(self.class_obj.id), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_games({'square': True, 'unknown_game': True})
+        self.assertEqual(enabled_class_games(self.class_obj.id), ['square'])
+
+
+class FormulaChainsTests(SimpleTestCase):
+    """Примеры по формулам: файлы цепочек, генератор и собранные пулы"""
+
+    def test_every_chain_file_example_is_valid(self):
+        for brother, digits in CHAIN_FILES:
+            chain = get_chain(brother, digits)
+            for index, example in enumerate(chain_examples(chain, 0, example_count(chain))):
+                with self.subTest(brother=brother, digits=digits, example=index):
+                    self.assertTrue(example_is_valid(digits, example), example)
+
+    def test_pools_follow_formula(self):
+        for key in pool_keys():
+            _, pool = formula_pool(*key)
+            digits = key[2]
+            examples = chain_examples(pool, 0, example_count(pool))
+            with self.subTest(key=key):
+                self.assertTrue(examples)
+                for example in examples:
+                    self.assertTrue(example_follows_formula(*key, example), example)
+                    self.assertTrue(example_is_valid(digits, example), example)
+                    self.assertEqual(sum(example), 0)
+
+    def test_pools_file_matches_generator(self):
+        # Файл пулов должен быть пересобран после изменения правил генератора
+        for key in [('brothers', 4, 1), ('friends', 7, 1), ('friend_brother', 6, 1)]:
+            version, pool = formula_pool(*key)
+            with self.subTest(key=key):
+                self.assertNotEqual(version, 'generated')
+                self.assertEqual(chain_examples(pool, 0, example_count(pool)), generate_pool(*key))
+
+    def test_generator_is_seeded(self):
+        for key in [('brothers', 2, 2), ('friends', 3, 1), ('friend_brother', 9, 2)]:
+            examples = generate_examples(*key, 20, random.Random(3))
+            with self.subTest(key=key):
+                self.assertEqual(examples, generate_examples(*key, 20, random.Random(3)))
+                self.assertEqual(len(examples), 20)
+                for example in examples:
+                    self.assertEqual(len(example), EXAMPLE_SIZE)
+                    self.assertTrue(example_follows_formula(*key, example), example)
+                    self.assertTrue(example_is_valid(key[2], example), example)
+                self.assertEqual(len(generate_pool(*key)), POOL_SIZE)
+
+
+class TeacherStatsTests(TestCase):
+    """Кеш статистики панели учителя сбрасывается у всех затронутых учителей"""
+
+    def setUp(self):
+        cache.clear()
+        self.classes = []
+        for name in ('first', 'second'):
+            user = User.objects.create_user(name, f'{name}@example.com', 'password')
+            profile = TeacherProfile.objects.create(user=user, status='approved')
+            self.classes.append(Class.objects.create(
+                name=name, teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026'
+            ))
+        self.student = Students.objects.create(name='Аня', surname='Петрова', age=9, student_class=self.classes[0])
+
+    def students_count(self, class_obj):
+        return teacher_stats(class_obj.teacher)['students_count']
+
+    def test_student_move_resets_both_teachers(self):
+        self.assertEqual([self.students_count(class_obj) for class_obj in self.classes], [1, 0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.student_class = self.classes[1]
+            self.student.save()
+        self.assertEqual([self.students_count(class_obj) for class_obj in self.classes], [0, 1])
+
+
+class PrincipalCacheTests(TestCase):
+    """Кешированный Principal сбрасывается сигналами после фиксации транзакции"""
+
+    def setUp(self):
+        # Сигналы сбрасывают кеш после фиксации, а TestCase ее не делает — id пользователей повторяются
+        cache.clear()
+        self.user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        TeacherProfile.objects.create(user=self.user, status='approved')
+        self.client.login(username='teacher', password='password')
+
+    def principal(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        return resolve_principal(request)
+
+    def test_password_change_ends_session(self):
+        self.assertTrue(self.principal().is_teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('changed')
+            self.user.save()
+        principal = self.principal()
+        self.assertFalse(principal.is_authenticated)
+        self.assertFalse(principal.can_play)
+
+
+@override_settings(CACHES={
+    **settings.CACHES,
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'game-results-tests'},
+})
+class GameResultTests(TestCase):
+    """Результаты игр копятся в общем кеше и пишутся в базу пачками"""
+
+    def setUp(self):
+        shared_cache().clear()
+        self.student = Students.objects.create(name='Аня', surname='Петрова', age=9)
+
+    def request(self):
+        request = RequestFactory().post('/')
+        request.session = self.client.session
+        request.session['student_id'] = self.student.id
+        return request
+
+    def inserts(self, context):
+        return [query['sql'] for query in context.captured_queries if query['sql'].startswith('INSERT')]
+
+    def record(self, correct=1):
+        record_game_result(self.request(), 'square', {'selected_ranges': [1]}, 1, correct)
+
+    def test_results_are_buffered_and_flushed_in_one_insert(self):
+        request = self.request()
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(3):
+                record_game_result(request, 'square', {'selected_ranges': [1]}, 1, 1)
+        self.assertEqual(self.inserts(context), [])
+        self.assertFalse(GameResult.objects.exists())
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(flush_results(), 3)
+        self.assertEqual(len(self.inserts(context)), 1)
+        self.assertEqual(GameResult.objects.filter(student=self.student, game='square').count(), 3)
+
+    def test_repeated_flush_does_not_duplicate(self):
+        self.record()
+        self.record(correct=0)
+        # Второй сброс, который прочитал буфер до того, как первый его очистил
+        with mock.patch.object(shared_cache(), 'delete_many'):
+            flush_results()
+        for token in shared_cache().get(PROCESSES_KEY):
+            shared_cache().delete(_flushed_key(token))
+        flush_results()
+        self.assertEqual(GameResult.objects.count(), 2)
+
+    def test_buffer_flushes_itself_when_full(self):
+        with mock.patch('mental_app.results.FLUSH_SIZE', 2):
+            self.record()
+            self.record()
+            self.record()
+        self.assertEqual(GameResult.objects.count(), 2)
+
+    def test_database_error_keeps_buffer(self):
+        with mock.patch('mental_app.results.FLUSH_SIZE', 1):
+            self.record()
+            with mock.patch.object(GameResult.objects, 'bulk_create', side_effect=DatabaseError('database is locked')):
+                with self.assertLogs('mental_app.results', 'ERROR'):
+                    self.record()
+        self.assertFalse(GameResult.objects.exists())
+        flush_results()
+        self.assertEqual(GameResult.objects.count(), 2)
+
+
+class AttendanceGridQueriesTests(TestCase):
+    """Табели посещений читаются фиксированным числом запросов, сколько бы ни было учеников и дат"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн, Ср', academic_year='2025-2026'
+        )
+        self.schedule = MonthlySchedule.objects.create(class_group=self.class_obj, month=9, year=2025)
+        self.client.login(username='teacher', password='password')
+
+    def add_grid(self, students, days):
+        """Добавляет учеников; у всех учеников класса — занятия в первые days дней сентября 2025"""
+        Students.objects.bulk_create([
+            Students(name=f'Ученик {index}', surname='Тестов', age=9, student_class=self.class_obj)
+            for index in range(students)
+        ])
+        Attendance.objects.bulk_create([
+            Attendance(
+                student=student, class_group=self.class_obj, monthly_schedule=self.schedule,
+                date=datetime.date(2025, 9, day)
+            )
+            for student in Students.objects.filter(student_class=self.class_obj)
+            for day in range(1, days + 1)
+        ], ignore_conflicts=True)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_constant_queries(self, url, expected):
+        self.add_grid(students=2, days=2)
+        # Первый запрос кеширует данные пользователя для middleware
+        self.client.get(url)
+        self.assertEqual(self.count_queries(url), expected)
+        self.add_grid(students=10, days=8)
+        self.assertEqual(self.count_queries(url), expected)
+
+    def test_attendance_list_queries(self):
+        url = reverse('attendance_list', args=[self.class_obj.id]) + '?month=2025-09'
+        self.assert_constant_queries(url, 7)
+
+    def test_monthly_schedule_edit_queries(self):
+        url = reverse('monthly_schedule_edit', args=[self.class_obj.id, self.schedule.id])
+        self.assert_constant_queries(url, 9)
+
+
+class CreateAttendanceRowsTests(TestCase):
+    """create_attendance_rows считает только действительно созданные записи"""
+
+    def setUp(self):
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026'
+        )
+        self.students = Students.objects.bulk_create([
+            Students(name=f'Ученик {index}', surname='Тестов', age=9, student_class=self.class_obj)
+            for index in range(3)
+        ])
+        self.date = datetime.date(2025, 9, 1)
+
+    def test_rows_created_concurrently_are_not_counted(self):
+        bulk_create = Attendance.objects.bulk_create
+
+        def concurrent_bulk_create(rows, **kwargs):
+            # Параллельный запрос успел создать запись первого ученика
+            Attendance.objects.create(student=self.students[0], class_group=self.class_obj, date=self.date)
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(Attendance.objects, 'bulk_create', side_effect=concurrent_bulk_create):
+            created = create_attendance_rows(self.class_obj, [self.date])
+        self.assertEqual(created, 2)
+        self.assertEqual(Attendance.objects.filter(class_group=self.class_obj).count(), 3)
+
+    def test_batch_changes_count_only_inserted_rows(self):
+        bulk_create = Attendance.objects.bulk_create
+
+        def concurrent_bulk_create(rows, **kwargs):
+            Attendance.objects.create(student=self.students[0], class_group=self.class_obj, date=self.date)
+            return bulk_create(rows, **kwargs)
+
+        student_classes = {student.id: self.class_obj.id for student in self.students}
+        changes = {(student.id, self.date, 'is_present'): True for student in self.students}
+        with mock.patch.object(Attendance.objects, 'bulk_create', side_effect=concurrent_bulk_create):
+            self.assertEqual(apply_attendance_changes(student_classes, changes), (0, 2))
+
+
+class AttendanceBatchUpdateTests(TestCase):
+    """Пакетное обновление табеля: проверка тела запроса и доступа, изменения одной транзакцией"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026'
+        )
+        self.students = Students.objects.bulk_create([
+            Students(name=f'Ученик {index}', surname='Тестов', age=9, student_class=self.class_obj)
+            for index in range(2)
+        ])
+        other_user = User.objects.create_user('other', 'other@example.com', 'password')
+        other_class = Class.objects.create(
+            name='Б', teacher=TeacherProfile.objects.create(user=other_user, status='approved'),
+            time=datetime.time(12), days='Вт', academic_year='2025-2026',
+        )
+        self.other_student = Students.objects.create(name='Чужой', surname='Тестов', age=9, student_class=other_class)
+        self.client.login(username='teacher', password='password')
+
+    def post(self, body):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        return self.client.post(reverse('attendance_update_batch'), body, content_type='application/json').json()
+
+    def change(self, student, field='attendance', value=True, day='2025-09-01'):
+        return {'student_id': student.id, 'date': day, 'field': field, 'value': value}
+
+    def test_invalid_body(self):
+        for body in ['{not json', [], {'changes': {}}, {'changes': []}, {'changes': [1]}]:
+            with self.subTest(body=body):
+                self.assertFalse(self.post(body)['success'])
+
+    def test_invalid_change(self):
+        for change in [
+            self.change(self.students[0], field='grade'),
+            self.change(self.students[0], value='true'),
+            self.change(self.students[0], day='01.09.2025'),
+            {'field': 'payment', 'value': True, 'date': '2025-09-01'},
+        ]:
+            with self.subTest(change=change):
+                self.assertFalse(self.post({'changes': [change]})['success'])
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_other_teacher_student_rejected(self):
+        data = self.post({'changes': [self.change(self.students[0]), self.change(self.other_student)]})
+        self.assertEqual(data, {'success': False, 'error': 'Нет доступа к этому классу'})
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_changes_applied(self):
+        Attendance.objects.create(
+            student=self.students[0], class_group=self.class_obj, date=datetime.date(2025, 9, 1)
+        )
+        data = self.post({'changes': [
+            self.change(self.students[0]),
+            self.change(self.students[0], field='payment'),
+            self.change(self.students[1], field='payment'),
+            self.change(self.students[1], field='payment', value=False),
+        ]})
+        self.assertEqual(data, {'success': True, 'updated': 1, 'created': 1})
+        rows = {
+            attendance.student_id: (attendance.is_present, attendance.is_paid)
+            for attendance in Attendance.objects.filter(class_group=self.class_obj)
+        }
+        # Повторное изменение одной клетки — остается последнее
+        self.assertEqual(rows, {self.students[0].id: (True, True), self.students[1].id: (False, False)})
+
+
+class BrothersChainTests(TestCase):
+    """Части цепочки для игры "Братья" берутся по кругу"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        TeacherProfile.objects.create(user=user, status='approved')
+        self.client.login(username='teacher', password='password')
+
+    def fetch(self, **params):
+        return self.client.get(reverse('brothers_chain'), {'brother': 1, 'digits': 1, **params}).json()
+
+    def test_examples_wrap_around_chain_end(self):
+        chain = get_chain(1, 1)
+        total = example_count(chain)
+        data = self.fetch(start=total - 1, count=3)
+        self.assertEqual(data['total'], total)
+        self.assertEqual(data['start'], total - 1)
+        self.assertEqual(data['examples'], [
+            chain_examples(chain, total - 1, 1)[0], chain_examples(chain, 0, 1)[0], chain_examples(chain, 1, 1)[0],
+        ])
+        self.assertTrue(all(len(example) == EXAMPLE_SIZE for example in data['examples'][1:]))
+
+    def test_generated_pool_wraps_too(self):
+        data = self.fetch(formula='friends', brother=3, start=POOL_SIZE - 1, count=2)
+        self.assertEqual(len(data['examples']), 2)
+        self.assertEqual(data['examples'][1], self.fetch(formula='friends', brother=3, start=0)['examples'][0])
+
+    def test_start_past_end_wraps(self):
+        total = example_count(get_chain(1, 1))
+        data = self.fetch(start=total + 2, count=2)
+        self.assertEqual(data['start'], 2)
+        self.assertEqual(data['examples'], self.fetch(start=2, count=2)['examples'])
+
+    def test_repeated_request_not_modified(self):
+        url = reverse('brothers_chain')
+        params = {'brother': 2, 'digits': 2, 'start': 5, 'count': 4}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        cached = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        other = self.client.get(url, {**params, 'start': 6}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(other.status_code, 200)
+
+    def test_unknown_chain(self):
+        self.assertFalse(self.fetch(formula='friends', brother=12)['success'])
+        self.assertFalse(self.fetch(start='abc')['success'])
+
+
+class ProblemPackResultsTests(TestCase):
+    """Проверка раунда пакета примеров: корректный подсчет и 400 на некорректное тело"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        TeacherProfile.objects.create(user=user, status='approved')
+        self.client.login(username='teacher', password='password')
+        self.pack = self.client.post(reverse('tricks_pack'), {'number-type': '2', 'count': 3, 'seed': 7}).json()
+        self.url = reverse('tricks_results')
+
+    def post(self, body):
+        return self.client.post(self.url, body, content_type='application/json')
+
+    def test_answers_are_checked(self):
+        answers = [str(self.pack['answers'][0]), self.pack['answers'][1] + 1]
+        data = self.post(json.dumps({'answers': answers})).json()
+        self.assertEqual((data['total'], data['correct'], data['results']), (3, 1, [True, False, False]))
+
+    def test_malformed_bodies_are_rejected(self):
+        for body in [b'[1, 2]', b'42', b'\xff\xfe', b'{"answers": "12"}', b'{"answers": [{"a": 1}]}',
+                     b'{"answers": [1.5]}', b'{"answers": [Infinity]}', b'{"answers": [true]}']:
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+        # Раунд после отклоненных запросов не потерян
+        self.assertTrue(self.post(json.dumps({'answers': []})).json()['success'])
+
+
+class LessonFeeBalancesTests(TestCase):
+    """Суммы к оплате пересчитываются только при изменении стоимости занятия"""
+
+    def setUp(self):
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026', lesson_fee=500
+        )
+        student = Students.objects.create(name='Аня', surname='Петрова', age=9, student_class=self.class_obj)
+        self.balance = StudentMonthBalance.objects.create(
+            student=student, class_group=self.class_obj, year=2025, month=9, lessons=4, paid=1, amount_due=1500
+        )
+
+    def balance_updates(self, context):
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE') and 'mental_app_studentmonthbalance' in query['sql']
+        ]
+
+    def test_save_without_fee_change_skips_refresh(self):
+        self.class_obj.refresh_from_db()
+        self.class_obj.name = 'Б'
+        with CaptureQueriesContext(connection) as context:
+            self.class_obj.save()
+        self.assertEqual(self.balance_updates(context), [])
+
+    def test_fee_change_refreshes_amounts(self):
+        self.class_obj.lesson_fee = 600
+        self.class_obj.save()
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.amount_due, 1800)
+
+
+class StudentAttendanceListTests(TestCase):
+    """Страница посещений ученика: помесячная сводка из балансов, подробно — только один месяц"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026', lesson_fee=500
+        )
+        self.student = Students.objects.create(name='Аня', surname='Петрова', age=9, student_class=self.class_obj)
+        self.add_lessons(2025, 9, present=[True, True, False], paid=[True, False, False])
+        self.add_lessons(2025, 10, present=[True], paid=[True])
+        session = self.client.session
+        session['student_id'] = self.student.id
+        session.save()
+
+    def add_lessons(self, year, month, present, paid):
+        with self.captureOnCommitCallbacks(execute=True):
+            for day, (is_present, is_paid) in enumerate(zip(present, paid), start=1):
+                Attendance.objects.create(
+                    student=self.student, class_group=self.class_obj, date=datetime.date(year, month, day),
+                    is_present=is_present, is_paid=is_paid,
+                )
+
+    def fetch(self, month='2025-09'):
+        return self.client.get(reverse('student_attendance_list'), {'month': month})
+
+    def test_monthly_summary(self):
+        table = self.fetch().context['attendance_table']
+        self.assertEqual(list(table), ['2025-09', '2025-10'])
+        september = table['2025-09']
+        self.assertEqual(
+            (september['total_lessons'], september['attended_lessons'], september['paid_lessons']), (3, 2, 1)
+        )
+        self.assertEqual(september['month_payment'], 1000)
+        self.assertEqual([attendance.date.day for attendance in september['attendances']], [1, 2, 3])
+        # Записи остальных месяцев не загружаются
+        self.assertIsNone(table['2025-10']['attendances'])
+
+    def test_queries_do_not_grow_with_months(self):
+        self.fetch()  # Principal ученика кешируется первым запросом
+        with CaptureQueriesContext(connection) as few_months:
+            self.fetch()
+        for month in range(1, 13):
+            self.add_lessons(2024, month, present=[True, False], paid=[False, False])
+        with CaptureQueriesContext(connection) as many_months:
+            response = self.fetch()
+        self.assertEqual(len(response.context['attendance_table']), 14)
+        self.assertEqual(len(many_months), len(few_months))
+
+
+class MonthBalancesTests(TestCase):
+    """Таблица балансов совпадает с пересчетом из посещений после любых изменений"""
+
+    def setUp(self):
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026', lesson_fee=500
+        )
+        self.students = Students.objects.bulk_create([
+            Students(name=f'Ученик {index}', surname='Тестов', age=9, student_class=self.class_obj)
+            for index in range(2)
+        ])
+        self.date = datetime.date(2025, 9, 1)
+
+    def balance(self, student, month=9):
+        return StudentMonthBalance.objects.get(student=student, class_group=self.class_obj, year=2025, month=month)
+
+    def test_signals_keep_balances(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance = Attendance.objects.create(
+                student=self.students[0], class_group=self.class_obj, date=self.date, is_present=True
+            )
+            Attendance.objects.create(
+                student=self.students[0], class_group=self.class_obj, date=self.date.replace(day=8),
+                is_present=False, is_paid=True,
+            )
+        balance = self.balance(self.students[0])
+        self.assertEqual((balance.lessons, balance.attended, balance.paid, balance.amount_due), (2, 1, 1, 500))
+
+        # Перенос занятия в другой месяц пересчитывает оба месяца
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance.date = datetime.date(2025, 10, 6)
+            attendance.save()
+        self.assertEqual(self.balance(self.students[0]).lessons, 1)
+        self.assertEqual(self.balance(self.students[0], month=10).lessons, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance.delete()
+        self.assertFalse(StudentMonthBalance.objects.filter(month=10).exists())
+        self.assertEqual(verify_balances(), [])
+
+    def test_batch_changes_keep_balances(self):
+        student_classes = {student.id: self.class_obj.id for student in self.students}
+        with self.captureOnCommitCallbacks(execute=True):
+            create_attendance_rows(self.class_obj, [self.date, self.date.replace(day=8)])
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_attendance_changes(student_classes, {
+                (self.students[0].id, self.date, 'is_paid'): True,
+                (self.students[1].id, self.date.replace(day=15), 'is_present'): True,
+            })
+        self.assertEqual(self.balance(self.students[0]).amount_due, 500)
+        self.assertEqual(self.balance(self.students[1]).lessons, 3)
+        self.assertEqual(verify_balances(), [])
+
+    def test_rebuild_restores_table(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_attendance_rows(self.class_obj, [self.date])
+        StudentMonthBalance.objects.update(lessons=0, amount_due=0)
+        self.assertEqual(len(verify_balances()), 2)
+        self.assertEqual(rebuild_balances(), 2)
+        self.assertEqual(verify_balances(), [])
+
+
+class DebtReportTests(TestCase):
+    """Отчет о задолженностях: одна группировка по таблице балансов, фильтры и выгрузка в CSV"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        self.profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.classes = [
+            Class.objects.create(
+                name=name, teacher=self.profile, time=datetime.time(10), days='Пн',
+                academic_year='2025-2026', lesson_fee=500,
+            )
+            for name in ('А', 'Б')
+        ]
+        self.anna = self.add_student('Аня', 'Петрова', self.classes[0], [(2025, 9, 4, 1), (2025, 10, 4, 2)])
+        self.boris = self.add_student('Борис', 'Иванов', self.classes[1], [(2025, 9, 4, 4)])
+        # Будущий месяц в долг не входит
+        self.add_balance(self.boris, self.classes[1], 2999, 1, 4, 0)
+
+        other_user = User.objects.create_user('other', 'other@example.com', 'password')
+        self.other_class = Class.objects.create(
+            name='В', teacher=TeacherProfile.objects.create(user=other_user, status='approved'),
+            time=datetime.time(12), days='Вт', academic_year='2025-2026', lesson_fee=500,
+        )
+        self.add_student('Чужой', 'Сидоров', self.other_class, [(2025, 9, 4, 0)])
+        self.client.login(username='teacher', password='password')
+
+    def add_balance(self, student, class_obj, year, month, lessons, paid):
+        StudentMonthBalance.objects.create(
+            student=student, class_group=class_obj, year=year, month=month,
+            lessons=lessons, attended=lessons, paid=paid, amount_due=(lessons - paid) * 500,
+        )
+
+    def add_student(self, name, surname, class_obj, months):
+        student = Students.objects.create(name=name, surname=surname, age=9, student_class=class_obj)
+        for year, month, lessons, paid in months:
+            self.add_balance(student, class_obj, year, month, lessons, paid)
+        return student
+
+    def test_rows_grouped_per_student(self):
+        rows = list(debt_report_rows(self.profile, today=datetime.date(2025, 11, 1)))
+        self.assertEqual(
+            [(row['student_id'], row['lessons'], row['paid'], row['debt']) for row in rows],
+            [(self.anna.id, 8, 3, 2500), (self.boris.id, 4, 4, 0)],
+        )
+
+    def test_filters_and_sort(self):
+        today = datetime.date(2025, 11, 1)
+        self.assertEqual(
+            [row['student_id'] for row in debt_report_rows(self.profile, sort='name', today=today)],
+            [self.boris.id, self.anna.id],
+        )
+        self.assertEqual(
+            [row['student_id'] for row in debt_report_rows(self.profile, debtors_only=True, today=today)],
+            [self.anna.id],
+        )
+        self.assertEqual(
+            [row['student_id'] for row in debt_report_rows(self.profile, search='иван', today=today)],
+            [self.boris.id],
+        )
+        self.assertEqual(
+            [row['student_id'] for row in debt_report_rows(self.profile, class_id=self.classes[1].id, today=today)],
+            [self.boris.id],
+        )
+
+    def test_report_page(self):
+        response = self.client.get(reverse('debt_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_debt'], 2500)
+        self.assertEqual(response.context['debtors_count'], 1)
+        other = self.client.get(reverse('class_debt_report', args=[self.other_class.id]))
+        self.assertEqual(other.status_code, 403)
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('class_debt_report', args=[self.classes[0].id]), {'format': 'csv'})
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="debts_class_{self.classes[0].id}.csv"')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertTrue(lines[0].startswith('\ufeff'))
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[1].split(';')[:2], ['Петрова', 'Аня'])
+        self.assertEqual([Decimal(value) for value in lines[1].split(';')[4:]], [8, 8, 3, 2500])
+
+
+class CarryOverTests(TestCase):
+    """Перенос неоплаченных занятий: одной транзакцией, без дублей, с предпросмотром"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026'
+        )
+        self.students = Students.objects.bulk_create([
+            Students(name=f'Ученик {index}', surname='Тестов', age=9, student_class=self.class_obj)
+            for index in range(2)
+        ])
+        self.schedule = MonthlySchedule.objects.create(class_group=self.class_obj, month=1, year=2026)
+        # 30 и 31 января сходятся в 28 февраля; оплаченное и пропущенное не переносятся
+        for student in self.students:
+            for day, is_present, is_paid in [(5, True, False), (30, True, False), (31, True, False),
+                                             (12, True, True), (19, False, False)]:
+                Attendance.objects.create(
+                    student=student, class_group=self.class_obj, monthly_schedule=self.schedule,
+                    date=datetime.date(2026, 1, day), is_present=is_present, is_paid=is_paid,
+                )
+        # У второго ученика 5 февраля уже есть занятие
+        Attendance.objects.create(student=self.students[1], class_group=self.class_obj, date=datetime.date(2026, 2, 5))
+        self.client.login(username='teacher', password='password')
+
+    def february(self):
+        return set(Attendance.objects.filter(date__month=2).values_list('student_id', 'date', 'payment_carried_over'))
+
+    def test_dry_run_writes_nothing(self):
+        before = self.february()
+        with CaptureQueriesContext(connection) as queries:
+            result = carry_over_unpaid(self.class_obj, self.schedule, dry_run=True)
+        self.assertEqual(result, (6, 3, 3, 2026, 2))
+        self.assertEqual(self.february(), before)
+        self.assertFalse(MonthlySchedule.objects.filter(month=2).exists())
+        self.assertFalse([query for query in queries if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))])
+
+    def test_carry_over_moves_unpaid_lessons(self):
+        result = carry_over_unpaid(self.class_obj, self.schedule)
+        self.assertEqual(result, (6, 3, 3, 2026, 2))
+        carried = {(student_id, day) for student_id, day, flag in self.february() if flag}
+        self.assertEqual(carried, {
+            (self.students[0].id, datetime.date(2026, 2, 5)),
+            (self.students[0].id, datetime.date(2026, 2, 28)),
+            (self.students[1].id, datetime.date(2026, 2, 28)),
+        })
+        next_schedule = MonthlySchedule.objects.get(class_group=self.class_obj, month=2, year=2026)
+        self.assertEqual(next_schedule.attendances.count(), 3)
+        # Повторный перенос ничего не создает
+        self.assertEqual(carry_over_unpaid(self.class_obj, self.schedule).carried, 0)
+
+    def test_preview_and_post(self):
+        url = reverse('carry_over_payments', args=[self.class_obj.id, self.schedule.id])
+        preview = self.client.get(url).context['preview']
+        self.assertEqual(preview.carried, 3)
+        self.assertFalse(Attendance.objects.filter(payment_carried_over=True).exists())
+        response = self.client.post(url)
+        self.assertRedirects(response, reverse('monthly_schedule_list', args=[self.class_obj.id]))
+        self.assertEqual(Attendance.objects.filter(payment_carried_over=True).count(), 3)
+
+
+class AnnotatedCountsTests(TestCase):
+    """Списки классов и расписаний: количества из аннотаций, число запросов не зависит от числа строк"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        self.profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = self.add_class('А', students=2)
+        self.client.login(username='teacher', password='password')
+
+    def add_class(self, name, students):
+        class_obj = Class.objects.create(
+            name=name, teacher=self.profile, time=datetime.time(10), days='Пн', academic_year='2025-2026'
+        )
+        Students.objects.bulk_create([
+            Students(name=f'Ученик {index}', surname=name, age=9, student_class=class_obj) for index in range(students)
+        ])
+        return class_obj
+
+    def add_schedule(self, month, days):
+        schedule = MonthlySchedule.objects.create(class_group=self.class_obj, month=month, year=2025)
+        create_attendance_rows(self.class_obj, [datetime.date(2025, month, day) for day in days], schedule)
+        return schedule
+
+    def count_queries(self, url):
+        self.client.get(url)  # Principal учителя кешируется первым запросом
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_class_list(self):
+        url = reverse('class_list')
+        few, _ = self.count_queries(url)
+        for name in ('Б', 'В', 'Г'):
+            self.add_class(name, students=3)
+        many, response = self.count_queries(url)
+        self.assertEqual(many, few)
+        self.assertEqual(
+            {class_obj.name: class_obj.get_students_count() for class_obj in response.context['classes']},
+            {'А': 2, 'Б': 3, 'В': 3, 'Г': 3},
+        )
+
+    def test_monthly_schedule_list(self):
+        url = reverse('monthly_schedule_list', args=[self.class_obj.id])
+        self.add_schedule(9, [1, 8])
+        few, _ = self.count_queries(url)
+        for month in (10, 11, 12):
+            self.add_schedule(month, [1, 8, 15])
+        many, response = self.count_queries(url)
+        self.assertEqual(many, few)
+        schedules = response.context['monthly_schedules']
+        self.assertEqual([schedule.get_unique_lesson_dates_count() for schedule in schedules], [3, 3, 3, 2])
+        # Без аннотации — тот же результат отдельным запросом
+        self.assertEqual(
+            [MonthlySchedule.objects.get(pk=schedule.pk).get_unique_lesson_dates_count() for schedule in schedules],
+            [3, 3, 3, 2],
+        )
+
+
+class SimplySequenceTests(SimpleTestCase):
+    """Режим 3 игры "Просто": последовательность без перебора, в пределах суммы"""
+
+    def test_same_seed_same_sequence(self):
+        first = generate_bounded_sequence(3, 4, 200, random.Random(42))
+        self.assertEqual(first, generate_bounded_sequence(3, 4, 200, random.Random(42)))
+        self.assertNotEqual(first, generate_bounded_sequence(3, 4, 200, random.Random(43)))
+
+    def test_numbers_and_sums_respect_settings(self):
+        rng = random.Random(0)
+        for num_digits in (1, 2, 3, 4):
+            for max_digit in range(1, 10):
+                allowed = set(digit_restricted_numbers(num_digits, max_digit))
+                max_sum = simply_max_sum(num_digits, max_digit)
+                numbers = generate_bounded_sequence(num_digits, max_digit, 100, rng)
+                with self.subTest(num_digits=num_digits, max_digit=max_digit):
+                    self.assertEqual(len(numbers), 100)
+                    self.assertTrue(all(abs(number) in allowed for number in numbers))
+                    total = 0
+                    for number in numbers:
+                        total += number
+                        self.assertTrue(0 <= total <= max_sum)
+
+
+class FlashcardsNumbersTests(SimpleTestCase):
+    """Числа флэшкарт выбираются из индекса подходящих чисел уровня"""
+
+    def test_same_seed_same_numbers(self):
+        first = generate_flashcards_numbers(3, 4, 99, random.Random(5))
+        self.assertEqual(first, generate_flashcards_numbers(3, 4, 99, random.Random(5)))
+
+    def test_numbers_match_level_and_max_digit(self):
+        rng = random.Random(0)
+        for level in (1, 2, 3, 4):
+            for max_digit in range(0 if level == 1 else 1, 10):
+                numbers = generate_flashcards_numbers(level, max_digit, 200, rng)
+                with self.subTest(level=level, max_digit=max_digit):
+                    for number in numbers:
+                        self.assertEqual(len(str(number)), level)
+                        self.assertTrue(all(int(digit) <= max_digit for digit in str(number)))
+
+    def test_index_has_every_matching_number(self):
+        # Равномерность: в индексе каждое подходящее число ровно один раз
+        for level, max_digit in [(1, 0), (2, 3), (4, 1)]:
+            expected = [
+                number for number in range(10 ** (level - 1) if level > 1 else 0, 10 ** level)
+                if all(int(digit) <= max_digit for digit in str(number))
+            ]
+            self.assertEqual(list(flashcards_number_index(level, max_digit)), expected)
+
+
+class AbacusColumnsTests(SimpleTestCase):
+    """Колонки абакуса для флэшкарт из общей таблицы"""
+
+    def expected_column(self, digit):
+        upper = (1, 0) if digit < 5 else (0, 1)
+        lower = tuple(0 if index == digit % 5 else 1 for index in range(5))
+        return upper, lower
+
+    def test_columns_follow_beads(self):
+        for number in (0, 7, 1905, -36, 99999):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    encode_number(number),
+                    tuple(self.expected_column(int(digit)) for digit in str(abs(number))),
+                )
+
+    def test_batch_and_filter_match_single_numbers(self):
+        numbers = [3, 0, 58, -401]
+        self.assertEqual(encode_numbers(numbers), [encode_number(number) for number in numbers])
+        self.assertEqual(abacus_columns(numbers), encode_numbers(numbers))
+        self.assertEqual(abacus_columns([]), [])
+        # Колонки одной цифры — один и тот же объект из таблицы
+        self.assertIs(encode_number(5)[0], encode_number(55)[1])
+
+
+class SimplyPlaybackTests(TestCase):
+    """Игра "Просто": вся последовательность отдается одним ответом, на сервер приходит только ответ"""
+
+    def start(self):
+        self.client.post(reverse('simply', kwargs={'mode': 1}), {
+            'range': '1', 'examples': '7', 'speed': '0.5', 'max_digit': '9',
+        })
+        return self.client.get(reverse('simply', kwargs={'mode': 3}))
+
+    def test_mode_3_returns_whole_sequence(self):
+        response = self.start()
+        numbers = response.context['game_numbers']
+        self.assertEqual(len(numbers), 7)
+        self.assertEqual(response.context['total_count'], 7)
+        self.assertEqual(response.context['speed'], 0.5)
+        self.assertContains(response, 'id="game-numbers"')
+
+    def test_mode_5_repeats_same_sequence(self):
+        numbers = self.start().context['game_numbers']
+        response = self.client.get(reverse('simply', kwargs={'mode': 5}))
+        self.assertEqual(response.context['game_numbers'], numbers)
+
+    def test_one_answer_post_checks_result(self):
+        numbers = self.start().context['game_numbers']
+        response = self.client.post(reverse('simply', kwargs={'mode': 6}), {'user_answer': str(sum(numbers))})
+        self.assertRedirects(response, reverse('simply', kwargs={'mode': 4}))
+        response = self.client.get(reverse('simply', kwargs={'mode': 4}))
+        self.assertTrue(response.context['is_correct'])
+        self.assertEqual(response.context['game_numbers'], numbers)
+
+    def test_old_step_mode_redirects_to_settings(self):
+        self.start()
+        response = self.client.get(reverse('simply', kwargs={'mode': 7}))
+        self.assertRedirects(response, reverse('simply', kwargs={'mode': 1}))
+
+
+class AbacusNumbersTests(SimpleTestCase):
+    """Однозначные примеры по правилам абакуса из таблицы переходов"""
+
+    def test_same_seed_same_numbers(self):
+        first = generate_abacus_numbers(7, 50, random.Random(11))
+        self.assertEqual(first, generate_abacus_numbers(7, 50, random.Random(11)))
+
+    def test_numbers_follow_beads(self):
+        rng = random.Random(0)
+        for max_digit in range(1, 10):
+            allowed = set(range(1, min(4, max_digit) + 1))
+            if max_digit >= 5:
+                allowed |= {5, max_digit}
+            for _ in range(50):
+                numbers = generate_abacus_numbers(max_digit, 30, rng)
+                with self.subTest(max_digit=max_digit, numbers=numbers):
+                    has_five, units, total = False, 0, 0
+                    for number in numbers[:30]:
+                        value = abs(number)
+                        self.assertIn(value, allowed)
+                        if value == 5:
+                            # Пятерка добавляется и убирается целиком
+                            self.assertEqual(number < 0, has_five)
+                            has_five = not has_five
+                        elif value < 5:
+                            # Единиц на спице от 0 до 4
+                            units += number
+                            self.assertTrue(0 <= units <= 4)
+                        total += number
+                        self.assertTrue(0 <= total <= 9)
+                    # Поправка в конце приводит сумму к пределу max_digit
+                    self.assertLessEqual(sum(numbers), max_digit)
+                    self.assertLessEqual(len(numbers), 31)
+
+    def test_every_state_has_operations(self):
+        for max_digit in range(1, 10):
+            table = abacus_transition_table(max_digit)
+            with self.subTest(max_digit=max_digit):
+                self.assertIs(table, abacus_transition_table(max_digit))
+                for cumulative, values, next_states in table:
+                    self.assertTrue(cumulative)
+                    self.assertEqual(len(cumulative), len(values))
+                    self.assertEqual(len(values), len(next_states))
+                    self.assertEqual(list(cumulative), sorted(cumulative))
+
+
+class SeededGameTests(TestCase):
+    """Игра описывается настройками и зерном, примеры пересчитываются по номеру"""
+
+    def test_problem_depends_only_on_seed_and_index(self):
+        settings_data = {'number_type': '2'}
+        game = new_game('tricks', settings_data, seed=42)
+        problems = [problem_at(game, index) for index in range(20)]
+        self.assertEqual(problems, [problem_at(new_game('tricks', settings_data, seed=42), index) for index in range(20)])
+        game['index'] = 5
+        self.assertEqual(problem_at(game), problems[5])
+        self.assertNotEqual(problems, [problem_at(new_game('tricks', settings_data, seed=43), index) for index in range(20)])
+
+    def test_parse_seed(self):
+        self.assertEqual(parse_seed('17'), 17)
+        self.assertIsNone(parse_seed('-1'))
+        self.assertIsNone(parse_seed(str(2 ** 31)))
+        self.assertIsNone(parse_seed('abc'))
+        self.assertIsNone(parse_seed(None))
+
+    def test_session_keeps_only_settings_and_seed(self):
+        self.client.post(reverse('simply', kwargs={'mode': 1}), {
+            'range': '2', 'examples': '15', 'speed': '1', 'max_digit': '9',
+        })
+        numbers = self.client.get(reverse('simply', kwargs={'mode': 3})).context['game_numbers']
+        game = self.client.session[GAME_SESSION_KEY]
+        self.assertEqual(set(game), {'type', 'settings', 'seed', 'index'})
+        self.assertNotIn('game_numbers', self.client.session)
+        self.assertEqual(game_sequence(game), numbers)
+
+    def test_simply_total_rebuilt_from_seed(self):
+        self.client.post(reverse('simply', kwargs={'mode': 1}), {
+            'range': '2', 'examples': '10', 'speed': '1', 'max_digit': '9',
+        })
+        self.client.get(reverse('simply', kwargs={'mode': 3}))
+        # Подменяем зерно: ответ проверяется по последовательности нового зерна
+        session = self.client.session
+        game = session[GAME_SESSION_KEY]
+        game['seed'] = 12345
+        session[GAME_SESSION_KEY] = game
+        session.save()
+        expected = simply_game_total(game, game_sequence(game))
+
+        self.client.post(reverse('simply', kwargs={'mode': 6}), {'user_answer': str(expected)})
+        response = self.client.get(reverse('simply', kwargs={'mode': 4}))
+        self.assertTrue(response.context['is_correct'])
+        self.assertEqual(response.context['correct_answer'], expected)
+        self.assertEqual(response.context['game_numbers'], game_sequence(game))
+
+
+class ChainFilesCacheTests(SimpleTestCase):
+    """Файл цепочки разбирается один раз и перечитывается только после изменения"""
+
+    key = (9, 1)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'цепочка_тест.txt'
+        self.write('+1+2+3-1')
+        base_dir = override_settings(BASE_DIR=Path(directory.name))
+        base_dir.enable()
+        self.addCleanup(base_dir.disable)
+        for patcher in [mock.patch.dict(CHAIN_FILES, {self.key: self.path.name}), mock.patch.dict(chains._cache)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, line, mtime_ns=None):
+        self.path.write_text(f'Брат 9 — тестовая цепочка:\n{"=" * 20}\n\n{line}\n', encoding='utf-8')
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_file_parsed_once(self):
+        with mock.patch.object(chains, 'parse_chain_file', wraps=chains.parse_chain_file) as parse:
+            self.assertEqual(get_chain(*self.key).tolist(), [1, 2, 3, -1])
+            get_chain(*self.key)
+            get_chain(*self.key)
+        self.assertEqual(parse.call_count, 1)
+
+    def test_file_reread_after_change(self):
+        get_chain(*self.key)
+        version = chains.chain_version(*self.key)
+        self.write('+4-4', mtime_ns=version + 10 ** 9)
+        self.assertEqual(get_chain(*self.key).tolist(), [4, -4])
+        self.assertEqual(chains.chain_version(*self.key), version + 10 ** 9)
+
+    def test_missing_file_gives_empty_chain(self):
+        self.path.unlink()
+        self.assertEqual(len(get_chain(*self.key)), 0)
+        self.assertIsNone(chains.chain_version(*self.key))
+
+
+class ClassGamesCacheTests(TestCase):
+    """Игры класса кешируются на класс и сбрасываются сигналами ClassGameAccess после фиксации"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026'
+        )
+        self.students = [
+            Students.objects.create(name=name, surname='Петрова', age=9, student_class=self.class_obj)
+            for name in ('Аня', 'Маша')
+        ]
+
+    def student_games(self, student):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        request.session['student_id'] = student.id
+        return json.loads(available_games(request)['available_games_list'])
+
+    def test_one_query_per_class(self):
+        ClassGameAccess.objects.create(class_group=self.class_obj, game='square', is_enabled=True)
+        self.assertEqual(set(self.student_games(self.students[0])), {'square', 'simply'})
+        with CaptureQueriesContext(connection) as queries:
+            games = self.student_games(self.students[1])
+        self.assertEqual(set(games), {'square', 'simply'})
+        self.assertFalse([query for query in queries if 'mental_app_classgameaccess' in query['sql']])
+
+    def test_change_visible_after_commit(self):
+        self.assertEqual(enabled_class_games(self.class_obj.id), [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            access = ClassGameAccess.objects.create(class_group=self.class_obj, game='tricks', is_enabled=True)
+            # До фиксации версия не сдвинута — читается прежний список
+            self.assertEqual(enabled_class_games(self.class_obj.id), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(enabled_class_games(self.class_obj.id), ['tricks'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            access.delete()
+        self.assertEqual(enabled_class_games(self.class_obj.id), [])
+
+
+class StudentDashboardTests(TestCase):
+    """Карточки игр кабинета ученика строятся по реестру игр и кешируются на класс"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        profile = TeacherProfile.objects.create(user=user, status='approved')
+        self.class_obj = Class.objects.create(
+            name='А', teacher=profile, time=datetime.time(10), days='Пн', academic_year='2025-2026'
+        )
+        student = Students.objects.create(name='Аня', surname='Петрова', age=9, student_class=self.class_obj)
+        session = self.client.session
+        session['student_id'] = student.id
+        session.save()
+
+    def cards(self):
+        response = self.client.get(reverse('student_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response.context['available_games']
+
+    def test_cards_follow_registry(self):
+        for code in ('tricks', 'square', 'brothers'):
+            ClassGameAccess.objects.create(class_group=self.class_obj, game=code, is_enabled=True)
+        ClassGameAccess.objects.create(class_group=self.class_obj, game='flashcards', is_enabled=False)
+        # Сначала общедоступные игры, затем включенные в порядке реестра; без описания карточки нет
+        self.assertEqual(self.cards(), [dashboard_card(GAMES_BY_CODE[code]) for code in ('simply', 'square', 'tricks')])
+
+    def test_cards_cached_per_class(self):
+        ClassGameAccess.objects.create(class_group=self.class_obj, game='square', is_enabled=True)
+        cards = self.cards()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.cards(), cards)
+        self.assertFalse([query for query in queries if 'mental_app_classgameaccess' in query['sql']])
+
+    def test_model_choices_come_from_registry(self):
+        self.assertEqual(
+            ClassGameAccess._meta.get_field('game').choices,
+            [(game.code, game.label) for game in CLASS_GAMES],
+        )
@@ -0,0 +1,81 @@
+"""
+Кеш под ключами с версией.
+
+Значения (списки игр, статистика) хранятся в кеше процесса (default,
+LocMemCache) под ключом с номером версии, а сами версии — в общем для всех
+процессов кеше (alias 'shared', файловый кеш). Изменение данных в любом
+процессе сдвигает версию, и следующий запрос в каждом процессе строит значение
+заново; старые версии просто истекают. Чтение версии — одно чтение маленького
+файла, без запросов к базе.
+
+Здесь же — накопление изменений транзакции (collect_on_commit): сигналы
+копят ключи, а пересчет или сброс идет одним заходом после фиксации.
+"""
+import threading
+import time
+
+from django.core.cache import cache, caches
+from django.db import transaction
+
+SHARED_CACHE = 'shared'
+
+
+def shared_cache():
+    return caches[SHARED_CACHE]
+
+
+def version(key):
+    """Текущая версия по ключу key"""
+    shared = shared_cache()
+    current = shared.get(key)
+    if current is None:
+        # Начинаем со времени, чтобы после потери ключа не вернуться к старой версии
+        shared.add(key, time.time_ns(), None)
+        current = shared.get(key)
+    return current
+
+
+def bump(key):
+    """Сдвигает версию: значения под прежней версией больше не читаются ни в одном процессе"""
+    shared_cache().set(key, time.time_ns(), None)
+
+
+def bump_on_commit(key):
+    """bump после фиксации текущей транзакции (сразу, если транзакции нет)"""
+    transaction.on_commit(lambda: bump(key))
+
+
+def get_or_build(version_key, key, build, timeout):
+    """Значение build() из кеша процесса под ключом key с текущей версией version_key"""
+    cache_key = f'{key}_v{version(version_key)}'
+    value = cache.get(cache_key)
+    if value is None:
+        value = build()
+        cache.set(cache_key, value, timeout)
+    return value
+
+
+# Изменения текущей транзакции по именам (по потокам)
+_pending = threading.local()
+
+
+def collect_on_commit(name, items, flush):
+    """
+    Копит items под именем name и вызывает flush(накопленное) после фиксации
+    текущей транзакции. Первый из отложенных вызовов обрабатывает все накопленное,
+    остальные ничего не делают; накопленное до отката обработается со следующей
+    фиксацией, поэтому flush должен быть безвреден при лишнем вызове.
+    """
+    pending = getattr(_pending, name, None)
+    if pending is None:
+        pending = set()
+        setattr(_pending, name, pending)
+    pending.update(items)
+    transaction.on_commit(lambda: _flush_pending(name, flush))
+
+
+def _flush_pending(name, flush):
+    items = getattr(_pending, name, None)
+    setattr(_pending, name, None)
+    if items:
+        flush(items)
@@ -1,20 +1,42 @@
+import csv
+import json
 import random
 import time
 import logging
 from datetime import datetime
-from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponseServerError
+from django.db.models import Count
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponseServerError, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from functools import wraps
 from .models import (
     Students, Class, TeacherProfile, StudentAccount, 
-    Homework, PaymentSettings, ClassGameAccess, 
+    Homework, PaymentSettings, 
     Attendance, GameSettings, MonthlySchedule
 )
+from .generators import combined_ranges, SIMPLY_DIGITS, simply_max_sum
+from .games import CLASS_GAMES, class_dashboard_games, class_games_access, save_class_games
+from .game_sessions import (
+    GAME_SESSION_KEY, new_game, start_game, current_game, advance_game,
+    problem_at, game_sequence
+)
+from .chains import get_examples
+from .middleware import player_required, player_required_json
+from .attendance import (
+    create_attendance_rows, load_attendance_grid, save_attendance_rows,
+    parse_attendance_changes, teacher_student_classes, apply_attendance_changes,
+    attendance_months, pick_month, parse_month, next_month, attendance_grid, grid_rows, grid_payload,
+    student_monthly_summary, student_debt, carry_over_unpaid
+)
+from .balances import REPORT_SORTS, debt_report_rows
+from .dashboard import teacher_stats
+from .results import record_game_result
+from .problem_packs import PACK_SESSION_KEY, build_pack, pack_payload, check_answers
 from .forms import StudentForm, TeacherRegistrationForm, TeacherLoginForm, ClassForm, TeacherProfileUpdateForm, StudentAccountForm, StudentLoginForm, HomeworkForm, AttendanceForm, AttendanceDateForm, PaymentSettingsForm, MonthlyScheduleForm, MonthlyAttendanceForm
 
 # Логгер для ошибок
@@ -33,39 +55,6 @@ def handle_errors(view_func):
             return HttpResponseServerError(render(request, '500.html'))
     return wrapper
 
-# Кешированные диапазоны чисел для повышения производительности
-def _get_ranges():
-    """Возвращает кешированный словарь диапазонов чисел"""
-    if not hasattr(_get_ranges, '_cache'):
-        _get_ranges._cache = {
-            '1-9': tuple(range(1, 10)),
-            '10-19': tuple(range(10, 19)),
-            '20-29': tuple(range(20, 29)),
-            '30-70': tuple(range(30, 70)),
-            '80-120': tuple(range(80, 120)),
-            '10-99': tuple(range(10, 100)),
-            '100-999': tuple(range(100, 1000)),
-            '1000-9999': tuple(range(1000, 10000)),
-            '10000-99999': tuple(range(10000, 100000)),
-            '10': tuple(range(1, 10)),
-            '50': tuple(range(1, 50)),
-            '100': tuple(range(1, 100)),
-            '200': tuple(range(1, 200)),
-            '1000': tuple(range(1, 1000)),
-            'random': tuple(range(1, 101)),
-            'both-lower': tuple(range(1, 51)),
-            'one-lower-one-higher': tuple(range(1, 101)),
-            'both-higher': tuple(range(50, 151)),
-            '2-9': tuple(range(2, 10)),
-            "1-10": tuple(range(1, 10)),
-            "10-100": tuple(range(10, 100)),
-            "100-1000": tuple(range(100, 1000)),
-            "1000-10000": tuple(range(1000, 10000)),
-        }
-    return _get_ranges._cache
-
-RANGES = _get_ranges()
-
 
 # Обработчик главной страницы
 @handle_errors
@@ -77,56 +66,38 @@ def index(request):
 
 
 # Обработчик выбора и проверки умножения
+@player_required
 def multiplication_choose(request, mode):
-    # Проверяем авторизацию ученика или учителя
-    if not request.session.get('student_id') and not (hasattr(request.user, 'teacher_profile') and request.user.teacher_profile.status == 'approved'):
-        return redirect('student_login')
-    
     if mode == 1:  # Этап выбора чисел
         if request.method == 'GET':  # Если запрос GET
             return render(request, 'multiplication_choose.html', {"mode": 1})  # Отображаем форму выбора чисел
 
         if request.method == 'POST':  # Если запрос POST
             # Получаем выбранные диапазоны чисел из формы
-            first_multiplier_range = request.POST.get('first-multiplier')
-            second_multiplier_range = request.POST.get('second-multiplier')
-
-            # Получаем списки чисел из словаря RANGES
-            first_multipliers = RANGES.get(first_multiplier_range, [])
-            second_multipliers = RANGES.get(second_multiplier_range, [])
+            game = new_game('multiplication_choose', {
+                'first_range': request.POST.get('first-multiplier'),
+                'second_range': request.POST.get('second-multiplier'),
+            })
 
-            # Если хотя бы один список пустой, перенаправляем пользователя обратно
-            if not first_multipliers or not second_multipliers:
+            # Если хотя бы один диапазон не найден, перенаправляем пользователя обратно
+            if problem_at(game) is None:
                 return redirect('multiplication_choose', mode=1)
 
-            # Сохраняем диапазоны и случайные числа в сессии
-            request.session['first_multiplier_range'] = first_multiplier_range
-            request.session['second_multiplier_range'] = second_multiplier_range
-            
-            first = random.choice(first_multipliers)  # Случайное число из первого списка
-            second = random.choice(second_multipliers)  # Случайное число из второго списка
-            
-            # Случайно выбираем знак для чисел
-            first_sign = random.choice([-1, 1])
-            second_sign = random.choice([-1, 1])
-            
-            first *= first_sign
-            second *= second_sign
-            
-            request.session['first'] = first
-            request.session['second'] = second
+            # Сохраняем в сессии только настройки и зерно: примеры пересчитываются по номеру
+            request.session[GAME_SESSION_KEY] = game
 
             # Переход на следующий этап (отображение примера)
             return redirect('multiplication_choose', mode=2)
 
     elif mode == 2:  # Этап отображения примера
-        first = request.session.get('first')  # Получаем первое число из сессии
-        second = request.session.get('second')  # Получаем второе число из сессии
+        game = current_game(request.session, 'multiplication_choose')
 
-        # Если чисел нет в сессии, возвращаем пользователя на этап выбора
-        if first is None or second is None:
+        # Если игры нет в сессии, возвращаем пользователя на этап выбора
+        if game is None:
             return redirect('multiplication_choose', mode=1)
 
+        first, second = problem_at(game)  # Текущий пример по зерну и номеру
+
         # Отображаем шаблон с примером для умножения
         return render(request, 'multiplication_choose.html', {
             'first': first,
@@ -136,38 +107,25 @@ def multiplication_choose(request, mode):
         })
 
     elif mode == 3:  # Этап проверки ответа
-        first = request.session.get('first')  # Получаем первое число
-        second = request.session.get('second')  # Получаем второе число
-        first_multiplier_range = request.session.get('first_multiplier_range')  # Получаем диапазон первого числа
-        second_multiplier_range = request.session.get('second_multiplier_range')  # Получаем диапазон второго числа
+        game = current_game(request.session, 'multiplication_choose')
+        if game is None:
+            return redirect('multiplication_choose', mode=1)
+
+        first, second = problem_at(game)  # Текущий пример по зерну и номеру
 
         if request.method == 'POST':  # Если запрос POST
             user_answer = request.POST.get('user-answer')  # Получаем ответ пользователя
             correct_answer = first * second  # Вычисляем правильный ответ
 
-            if user_answer and user_answer.isdigit() and int(user_answer) == correct_answer:
+            is_correct = bool(user_answer and user_answer.isdigit() and int(user_answer) == correct_answer)
+            record_game_result(request, game['type'], game['settings'], 1, int(is_correct))
+
+            if is_correct:
                 result_message = "Верно! Молодец!"  # Сообщение о правильном ответе
                 result_color = "green"  # Цвет сообщения
 
-                # Генерируем новый пример
-                first_multipliers = RANGES.get(first_multiplier_range,
-                                               [])  # Получаем список чисел для первого множителя
-                second_multipliers = RANGES.get(second_multiplier_range,
-                                                [])  # Получаем список чисел для второго множителя
-
-                if first_multipliers and second_multipliers:
-                    new_first = random.choice(first_multipliers)  # Случайное число для нового примера
-                    new_second = random.choice(second_multipliers)  # Случайное число для нового примера
-                    
-                    # Случайно выбираем знак для новых чисел
-                    first_sign = random.choice([-1, 1])
-                    second_sign = random.choice([-1, 1])
-                    
-                    new_first *= first_sign
-                    new_second *= second_sign
-                    
-                    request.session['first'] = new_first
-                    request.session['second'] = new_second
+                # Переходим к следующему примеру (в сессии меняется только номер)
+                advance_game(request.session, game)
             else:
                 result_message = "Неверно! Попробуйте снова."  # Сообщение о неверном ответе
                 result_color = "red"  # Цвет сообщения
@@ -188,11 +146,8 @@ def multiplication_choose(request, mode):
 
 
 # Обработчик выбора и проверки умножения до 20
+@player_required
 def multiplication_to_20(request, mode):
-    # Проверяем авторизацию ученика или учителя
-    if not request.session.get('student_id') and not (hasattr(request.user, 'teacher_profile') and request.user.teacher_profile.status == 'approved'):
-        return redirect('student_login')
-    
     if mode == 1:  # Этап выбора чисел
         if request.method == 'GET':  # Если запрос GET
             return render(request, 'multiplication_to_20.html', {"mode": 1})  # Отображаем форму выбора чисел
@@ -202,47 +157,36 @@ def multiplication_to_20(request, mode):
             first_multiplier_range = request.POST.get('first-multiplier')  # Диапазон первого множителя
             second_multiplier_value = request.POST.get('second-multiplier')  # Значение второго множителя (не диапазон)
 
-            # Получаем список чисел для первого множителя из словаря RANGES
-            first_multipliers = RANGES.get(first_multiplier_range, [])
-
             # Для второго множителя просто сохраняем значение, так как оно не из списка
             try:
                 second_multiplier = int(second_multiplier_value)  # Преобразуем значение второго множителя в число
-            except ValueError:
+            except (TypeError, ValueError):
                 second_multiplier = None  # Если значение не число, сохраняем как None
 
-            # Если хотя бы одно число пустое или второй множитель вне диапазона 1-20, перенаправляем обратно
-            if not first_multipliers or second_multiplier is None or not (1 <= second_multiplier <= 20):
+            game = new_game('multiplication_to_20', {
+                'first_range': first_multiplier_range,
+                'second_multiplier': second_multiplier,
+            })
+
+            # Если диапазон не найден или второй множитель вне диапазона 1-20, перенаправляем обратно
+            if problem_at(game) is None or not (1 <= second_multiplier <= 20):
                 return redirect('multiplication_to_20', mode=1)
 
-            # Сохраняем диапазоны и случайные числа в сессии
-            request.session['first_multiplier_range'] = first_multiplier_range  # Диапазон первого множителя
-            request.session['second_multiplier'] = second_multiplier  # Указанный второй множитель
-            
-            first = random.choice(first_multipliers)  # Случайное число из первого диапазона
-            
-            # Случайно выбираем знак для первого числа
-            first_sign = random.choice([-1, 1])
-            first *= first_sign
-            
-            # Случайно выбираем знак для второго числа
-            second_sign = random.choice([-1, 1])
-            second = second_multiplier * second_sign
-            
-            request.session['first'] = first
-            request.session['second'] = second
+            # Сохраняем в сессии только настройки и зерно: примеры пересчитываются по номеру
+            request.session[GAME_SESSION_KEY] = game
 
             # Переход на следующий этап (отображение примера)
             return redirect('multiplication_to_20', mode=2)
 
     elif mode == 2:  # Этап отображения примера
-        first = request.session.get('first')  # Получаем первое число из сессии
-        second = request.session.get('second')  # Получаем второе число из сессии
+        game = current_game(request.session, 'multiplication_to_20')
 
-        # Если чисел нет в сессии, возвращаем пользователя на этап выбора
-        if first is None or second is None:
+        # Если игры нет в сессии, возвращаем пользователя на этап выбора
+        if game is None:
             return redirect('multiplication_to_20', mode=1)
 
+        first, second = problem_at(game)  # Текущий пример по зерну и номеру
+
         # Отображаем шаблон с примером для умножения
         return render(request, 'multiplication_to_20.html', {
             'first': first,
@@ -252,37 +196,26 @@ def multiplication_to_20(request, mode):
         })
 
     elif mode == 3:  # Этап проверки ответа
-        first = request.session.get('first')  # Получаем первое число
-        second = request.session.get('second')  # Получаем второе число
-        first_multiplier_range = request.session.get('first_multiplier_range')  # Получаем диапазон первого числа
-        second_multiplier = request.session.get('second_multiplier')  # Получаем второй множитель
+        game = current_game(request.session, 'multiplication_to_20')
+        if game is None:
+            return redirect('multiplication_to_20', mode=1)
+
+        first, second = problem_at(game)  # Текущий пример по зерну и номеру
 
         if request.method == 'POST':  # Если запрос POST
             user_answer = request.POST.get('user-answer')  # Получаем ответ пользователя
             correct_answer = first * second  # Вычисляем правильный ответ
 
             # Проверка правильности ответа
-            if user_answer and user_answer.isdigit() and int(user_answer) == correct_answer:
+            is_correct = bool(user_answer and user_answer.isdigit() and int(user_answer) == correct_answer)
+            record_game_result(request, game['type'], game['settings'], 1, int(is_correct))
+
+            if is_correct:
                 result_message = "Верно! Молодец!"  # Сообщение о правильном ответе
                 result_color = "green"  # Цвет сообщения
 
-                # Генерируем новый пример
-                first_multipliers = RANGES.get(first_multiplier_range,
-                                               [])  # Получаем список чисел для первого множителя
-
-                if first_multipliers:
-                    new_first = random.choice(first_multipliers)  # Случайное число для нового примера
-                    
-                    # Случайно выбираем знак для нового первого числа
-                    first_sign = random.choice([-1, 1])
-                    new_first *= first_sign
-                    
-                    # Случайно выбираем знак для второго числа
-                    second_sign = random.choice([-1, 1])
-                    new_second = second * second_sign
-                    
-                    request.session['first'] = new_first
-                    request.session['second'] = new_second
+                # Переходим к следующему примеру (в сессии меняется только номер)
+                advance_game(request.session, game)
             else:
                 result_message = "Неверно! Попробуйте снова."  # Сообщение о неверном ответе
                 result_color = "red"  # Цвет сообщения
@@ -301,11 +234,8 @@ def multiplication_to_20(request, mode):
 
 
 # Обработчик выбора и проверки возведения в квадрат
+@player_required
 def square(request, mode):
-    # Проверяем авторизацию ученика или учителя
-    if not request.session.get('student_id') and not (hasattr(request.user, 'teacher_profile') and request.user.teacher_profile.status == 'approved'):
-        return redirect('student_login')
-    
     if mode == 1:
         if request.method == 'GET':
             return render(request, 'square.html', {"mode": 1})
@@ -317,9 +247,7 @@ def square(request, mode):
                 return redirect('square', mode=1)
 
             # Генерируем список возможных чисел из выбранных диапазонов
-            possible_numbers = []
-            for r in selected_ranges:
-                possible_numbers.extend(RANGES.get(r, []))
+            possible_numbers = combined_ranges(selected_ranges)
 
             if not possible_numbers:
                 return redirect('square', mode=1)
@@ -378,6 +306,8 @@ def square(request, mode):
                 is_correct = False
                 result_message = "Неверно! Попробуйте снова."
 
+            record_game_result(request, 'square', {'selected_ranges': request.session.get('selected_ranges')}, 1, int(is_correct))
+
             # Сохраняем результат и переходим к показу результатов
             request.session['is_correct'] = is_correct
             request.session['user_answer'] = user_answer
@@ -404,11 +334,8 @@ def square(request, mode):
 
 
 # Обработчик выбора и проверки умножение от базы
+@player_required
 def multiplication_base(request, mode):
-    # Проверяем авторизацию ученика или учителя
-    if not request.session.get('student_id') and not (hasattr(request.user, 'teacher_profile') and request.user.teacher_profile.status == 'approved'):
-        return redirect('student_login')
-    
     if mode == 1:
         if request.method == 'GET':
             return render(request, 'multiplication_base.html', {"mode": 1})
@@ -416,36 +343,21 @@ def multiplication_base(request, mode):
         if request.method == 'POST':
             selected_ranges = request.POST.getlist('multiplier-range')
 
-            first_multipliers = []
-            for r in selected_ranges:
-                first_multipliers.extend(RANGES.get(r, []))
-
-            if not first_multipliers:
+            game = new_game('multiplication_base', {'selected_ranges': selected_ranges})
+            if problem_at(game) is None:
                 return redirect('multiplication_base', mode=1)
 
-            first = random.choice(first_multipliers)
-            second = random.choice(first_multipliers)
-            
-            # Случайно выбираем знак для чисел
-            first_sign = random.choice([-1, 1])
-            second_sign = random.choice([-1, 1])
-            
-            first *= first_sign
-            second *= second_sign
-
-            request.session['first'] = first
-            request.session['second'] = second
-            request.session['selected_ranges'] = selected_ranges
+            request.session[GAME_SESSION_KEY] = game
 
             return redirect('multiplication_base', mode=2)
 
     elif mode == 2:
-        first = request.session.get('first')
-        second = request.session.get('second')
-
-        if first is None or second is None:
+        game = current_game(request.session, 'multiplication_base')
+        if game is None:
             return redirect('multiplication_base', mode=1)
 
+        first, second = problem_at(game)
+
         return render(request, 'multiplication_base.html', {
             'first': first,
             'second': second,
@@ -454,35 +366,24 @@ def multiplication_base(request, mode):
         })
 
     elif mode == 3:
-        first = request.session.get('first')
-        second = request.session.get('second')
-        selected_ranges = request.session.get('selected_ranges', [])
+        game = current_game(request.session, 'multiplication_base')
+        if game is None:
+            return redirect('multiplication_base', mode=1)
+
+        first, second = problem_at(game)
 
         if request.method == 'POST':
             user_answer = request.POST.get('user-answer')
             correct_answer = first * second
 
-            if user_answer and user_answer.isdigit() and int(user_answer) == correct_answer:
+            is_correct = bool(user_answer and user_answer.isdigit() and int(user_answer) == correct_answer)
+            record_game_result(request, game['type'], game['settings'], 1, int(is_correct))
+
+            if is_correct:
                 result_message = "Верно! Молодец!"
                 result_color = "green"
 
-                first_multipliers = []
-                for r in selected_ranges:
-                    first_multipliers.extend(RANGES.get(r, []))
-
-                if first_multipliers:
-                    new_first = random.choice(first_multipliers)  # Случайное число для нового примера
-                    new_second = random.choice(first_multipliers)  # Случайное число для нового примера
-                    
-                    # Случайно выбираем знак для новых чисел
-                    first_sign = random.choice([-1, 1])
-                    second_sign = random.choice([-1, 1])
-                    
-                    new_first *= first_sign
-                    new_second *= second_sign
-                    
-                    request.session['first'] = new_first
-                    request.session['second'] = new_second
+                advance_game(request.session, game)  # Следующий пример по тому же зерну
             else:
                 result_message = "Неверно! Попробуйте снова."
                 result_color = "red"
@@ -498,79 +399,32 @@ def multiplication_base(request, mode):
         return redirect('multiplication_base', mode=2)
 
 
-# функция для определения двух множителей при выборе двухзначных чисел
-def generate_two_digit_pair():
-    """Генерирует пару двузначных чисел с одинаковым десятком и суммой единиц 10."""
-    tens = random.randint(1, 9)  # Выбираем десяток от 10 до 90
-    unit1 = random.randint(1, 9)  # Выбираем первую единицу
-    unit2 = 10 - unit1  # Вторая единица должна дополнять до 10
-    first = tens * 10 + unit1
-    second = tens * 10 + unit2
-    
-    # Случайно выбираем знак для чисел
-    first_sign = random.choice([-1, 1])
-    second_sign = random.choice([-1, 1])
-    
-    first *= first_sign
-    second *= second_sign
-    
-    return first, second
-
-
-# функция для определения двух множителей при выборе трехзначных чисел
-def generate_three_digit_pair():
-    """Генерирует пару трехзначных чисел с одинаковыми сотнями и десятками, сумма единиц 10."""
-    hundreds = random.randint(1, 9)  # Выбираем сотню (100-900)
-    tens = random.randint(0, 9)  # Выбираем десяток (00-90)
-    unit1 = random.randint(1, 9)  # Выбираем первую единицу
-    unit2 = 10 - unit1  # Вторая единица дополняет до 10
-    first = hundreds * 100 + tens * 10 + unit1
-    second = hundreds * 100 + tens * 10 + unit2
-    
-    # Случайно выбираем знак для чисел
-    first_sign = random.choice([-1, 1])
-    second_sign = random.choice([-1, 1])
-    
-    first *= first_sign
-    second *= second_sign
-    
-    return first, second
-
-
 # Обработчик выбора и проверки хитрости
+@player_required
 def tricks(request, mode):
-    # Проверяем авторизацию ученика или учителя
-    if not request.session.get('student_id') and not (hasattr(request.user, 'teacher_profile') and request.user.teacher_profile.status == 'approved'):
-        return redirect('student_login')
-    
     if mode == 1:
         if request.method == 'GET':
             return render(request, 'tricks.html', {"mode": 1})
 
         if request.method == 'POST':
-            number_type = request.POST.get('number-type')  # Двузначные или трехзначные
+            number_type = request.POST.get('number-type')  # Двузначные ("2") или трехзначные ("3")
 
-            if number_type == "2":  # Обрабатываем "2" как двузначные
-                first, second = generate_two_digit_pair()
-            elif number_type == "3":  # Обрабатываем "3" как трехзначные
-                first, second = generate_three_digit_pair()
-            else:
+            game = new_game('tricks', {'number_type': number_type})
+            if problem_at(game) is None:
                 return redirect('tricks', mode=1)  # В случае ошибки вернемся к выбору типа чисел
 
-            # Сохраняем данные в сессии
-            request.session['first'] = first
-            request.session['second'] = second
-            request.session['number_type'] = number_type
+            # Сохраняем в сессии только тип чисел и зерно
+            request.session[GAME_SESSION_KEY] = game
 
             return redirect('tricks', mode=2)  # Переход к режиму 2
 
     elif mode == 2:
-        # Получаем данные из сессии
-        first = request.session.get('first')
-        second = request.session.get('second')
+        # Получаем игру из сессии
+        game = current_game(request.session, 'tricks')
+        if game is None:
+            return redirect('tricks', mode=1)  # Если игры нет в сессии, возвращаем на выбор чисел
 
-        if first is None or second is None:
-            return redirect('tricks', mode=1)  # Если данных нет в сессии, возвращаем на выбор чисел
+        first, second = problem_at(game)
 
         return render(request, 'tricks.html', {
             'first': first,
@@ -580,30 +434,26 @@ def tricks(request, mode):
         })
 
     elif mode == 3:
-        first = request.session.get('first')
-        second = request.session.get('second')
-        number_type = request.session.get('number_type')
+        game = current_game(request.session, 'tricks')
+        if game is None:
+            return redirect('tricks', mode=1)  # Если игры нет в сессии, возвращаем на выбор чисел
 
-        if first is None or second is None:
-            return redirect('tricks', mode=1)  # Если данных нет в сессии, возвращаем на выбор чисел
+        first, second = problem_at(game)
 
         if request.method == 'POST':
             user_answer = request.POST.get('user-answer')
             correct_answer = first * second
 
-            if user_answer and user_answer.isdigit() and int(user_answer) == correct_answer:
+            is_correct = bool(user_answer and user_answer.isdigit() and int(user_answer) == correct_answer)
+            record_game_result(request, game['type'], game['settings'], 1, int(is_correct))
+
+            if is_correct:
                 result_message = "Верно! Молодец!"
                 result_color = "green"
 
-                # Генерируем новую пару
-                if number_type == "2":
-                    first, second = generate_two_digit_pair()
-                elif number_type == "3":
-                    first, second = generate_three_digit_pair()
-
-                # Сохраняем новую пару в сессии
-                request.session['first'] = first
-                request.session['second'] = second
+                # Переходим к следующей паре (в сессии меняется только номер)
+                advance_game(request.session, game)
+                first, second = problem_at(game)
             else:
                 result_message = "Неверно! Попробуйте снова."
                 result_color = "red"
@@ -621,6 +471,59 @@ def tricks(request, mode):
         return redirect('tricks', mode=2)  # Если не было отправлено ответа, возвращаем на режим 2
 
 
+# Пакеты примеров: раунд игры проходит на клиенте, сервер получает два запроса за раунд
+@player_required_json
+def problem_pack(request, game):
+    """Выдает пакет примеров с ответами для игры (JSON)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Только POST запросы'})
+
+    pack = build_pack(game, request.POST)
+    if pack is None:
+        return JsonResponse({'success': False, 'error': 'Неверные настройки игры'})
+
+    # Сохраняем пакет в сессии один раз на весь раунд; время начала — для длительности раунда
+    pack['started'] = time.time()
+    request.session[PACK_SESSION_KEY] = pack
+
+    return JsonResponse({'success': True, **pack_payload(pack)})
+
+
+@player_required_json
+def problem_pack_results(request, game):
+    """Принимает ответы всего раунда одним запросом и возвращает итог (JSON)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Только POST запросы'})
+
+    try:
+        data = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'error': 'Неверный формат JSON'}, status=400)
+
+    answers = data.get('answers') if isinstance(data, dict) else None
+    if not isinstance(answers, list):
+        return JsonResponse({'success': False, 'error': 'Не переданы ответы'}, status=400)
+    # Ответ — строка из поля ввода, число или null (пропущенный пример)
+    if any(answer is not None and (isinstance(answer, bool) or not isinstance(answer, (str, int)))
+           for answer in answers):
+        return JsonResponse({'success': False, 'error': 'Неверный формат ответов'}, status=400)
+
+    pack = request.session.get(PACK_SESSION_KEY)
+    if not pack or pack.get('type') != game:
+        return JsonResponse({'success': False, 'error': 'Раунд не найден. Начните заново.'})
+
+    correct_count, results = check_answers(pack, answers)
+    del request.session[PACK_SESSION_KEY]
+    record_game_result(request, game, pack['settings'], len(results), correct_count, pack.get('started'))
+
+    return JsonResponse({
+        'success': True,
+        'total': len(results),
+        'correct': correct_count,
+        'results': results,
+    })
+
+
 # Новые представления для учителей
 
 def teacher_register(request):
@@ -680,14 +583,10 @@ def teacher_dashboard(request):
         if teacher_profile.status != 'approved':
             return redirect('teacher_login')
         
-        # Оптимизированные запросы с select_related
-        classes = Class.objects.filter(teacher=teacher_profile).select_related('teacher__user')
-        total_students = Students.objects.filter(student_class__teacher=teacher_profile).count()
-        
+        # Статистика из кеша; пересчитывается после изменения посещений, учеников или классов
         context = {
             'teacher_profile': teacher_profile,
-            'classes': classes,
-            'total_students': total_students,
+            'stats': teacher_stats(teacher_profile),
         }
         return render(request, 'teacher_dashboard.html', context)
     except TeacherProfile.DoesNotExist:
@@ -700,12 +599,87 @@ def class_list(request):
         if teacher_profile.status != 'approved':
             return HttpResponseForbidden('Доступ запрещен')
         
-        # Оптимизированный запрос с select_related
-        classes = Class.objects.filter(teacher=teacher_profile).select_related('teacher__user')
+        # Оптимизированный запрос с select_related; количество учеников — аннотацией в том же запросе
+        classes = Class.objects.filter(teacher=teacher_profile).select_related('teacher__user').annotate(
+            students_total=Count('students')
+        )
         return render(request, 'class_list.html', {'classes': classes})
     except TeacherProfile.DoesNotExist:
         return HttpResponseForbidden('Доступ запрещен')
 
+class _Echo:
+    """Псевдо-файл для csv.writer: строка не копится в буфере, а сразу отдается в ответ"""
+    def write(self, value):
+        return value
+
+
+DEBT_REPORT_COLUMNS = ['Фамилия', 'Имя', 'Класс', 'Стоимость занятия', 'Занятий', 'Посещено', 'Оплачено', 'Долг']
+
+
+def _debt_report_csv(rows, filename):
+    """Потоковая выгрузка отчета о задолженностях в CSV (с BOM для Excel)"""
+    writer = csv.writer(_Echo(), delimiter=';')
+
+    def lines():
+        yield '\ufeff' + writer.writerow(DEBT_REPORT_COLUMNS)
+        for row in rows.iterator():
+            yield writer.writerow([
+                row['student__surname'], row['student__name'], row['class_group__name'],
+                row['class_group__lesson_fee'], row['lessons'], row['attended'], row['paid'], row['debt'],
+            ])
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def debt_report(request, class_id=None):
+    """Задолженности учеников по всем классам учителя или по одному классу"""
+    try:
+        teacher_profile = request.user.teacher_profile
+        if teacher_profile.status != 'approved':
+            return HttpResponseForbidden('Доступ запрещен')
+    except TeacherProfile.DoesNotExist:
+        return HttpResponseForbidden('Доступ запрещен')
+    
+    classes = list(Class.objects.filter(teacher=teacher_profile).order_by('name').values('id', 'name'))
+    class_obj = None
+    if class_id is not None:
+        class_obj = next((item for item in classes if item['id'] == class_id), None)
+        if class_obj is None:
+            return HttpResponseForbidden("У вас нет доступа к этому классу")
+    
+    search = request.GET.get('q', '').strip()
+    debtors_only = request.GET.get('debtors') == '1'
+    sort = request.GET.get('sort', 'debt')
+    if sort not in REPORT_SORTS:
+        sort = 'debt'
+    rows = debt_report_rows(teacher_profile, class_id, search=search, debtors_only=debtors_only, sort=sort)
+    
+    if request.GET.get('format') == 'csv':
+        filename = f'debts_class_{class_id}.csv' if class_id else 'debts.csv'
+        return _debt_report_csv(rows, filename)
+    
+    rows = list(rows)
+    return render(request, 'debt_report.html', {
+        'classes': classes,
+        'class_obj': class_obj,
+        'rows': rows,
+        'total_debt': sum(row['debt'] for row in rows),
+        'debtors_count': sum(1 for row in rows if row['debt'] > 0),
+        'search': search,
+        'debtors_only': debtors_only,
+        'sort': sort,
+        'sorts': [
+            ('debt', 'По долгу'),
+            ('name', 'По фамилии'),
+            ('class', 'По классу'),
+            ('lessons', 'По занятиям'),
+            ('paid', 'По оплаченным'),
+        ],
+    })
+
 @login_required
 def class_create(request):
     try:
@@ -939,147 +913,12 @@ SIMPLY_RANGES = {
     "1000-10000": (1000, 10000),
 }
 
-def generate_abacus_numbers(max_digit, num_examples):
-    """
-    Генерирует числа согласно правилам абакуса для чисел от 5 до 9.
-    
-    Правила абакуса:
-    - Число 5 = одна косточка (пятерка)
-    - Числа 1-4 = соответствующее количество единичных косточек
-    - Числа 6-9 = одна косточка (пятерка) + единичные косточки (6=5+1, 7=5+2, 8=5+3, 9=5+4)
-    
-    Правильные операции:
-    - ✅ +4+5-3+2-3+1-5 (используем 5 как отдельную единицу)
-    - ✅ +1+3+5-4+3-1-5 (правильное разложение)
-    - ❌ +5-4 (неправильно, так как 5 - это целая единица)
-    - ❌ 2+3 (неправильно, так как только 4 единичные косточки доступны)
-    """
-    import random
-    
-    numbers = []
-    current_sum = 0
-    
-    # Состояние абакуса: [есть_ли_пятерка, количество_единиц]
-    abacus_state = [False, 0]  # [пятерка, единицы от 0 до 4]
-    
-    # Возможные операции согласно правилам абакуса
-    def get_valid_operations(current_state, max_intermediate_sum):
-        """Возвращает список допустимых операций для текущего состояния абакуса"""
-        operations = []
-        has_five, units = current_state
-        
-        # Операции с пятеркой (приоритет для числа 5, если max_digit >= 5)
-        if max_digit >= 5:
-            if not has_five:  # Если пятерки нет, можем добавить
-                operations.append(('+', 5))
-            else:  # Если пятерка есть, можем убрать
-                operations.append(('-', 5))
-        
-        # Операции с единицами (от 1 до 4)
-        max_units = min(4, max_digit) if max_digit < 5 else 4
-        for i in range(1, max_units + 1):  # 1, 2, 3, 4 (или меньше, если max_digit < 5)
-            # Добавление единиц
-            if units + i <= 4:  # Не больше 4 единиц
-                operations.append(('+', i))
-            
-            # Вычитание единиц
-            if units - i >= 0:  # Не меньше 0 единиц
-                operations.append(('-', i))
-        
-        # Добавляем операции с выбранным числом напрямую (упрощенная логика)
-        if max_digit > 5:
-            # Для чисел 6-9: добавляем их как отдельные операции
-            # Проверяем только базовые ограничения
-            operations.append(('+', max_digit))
-            operations.append(('-', max_digit))
-        
-        # Фильтруем операции, чтобы промежуточный результат был от 0 до 9
-        valid_operations = []
-        for sign, value in operations:
-            new_sum = current_sum + (value if sign == '+' else -value)
-            if 0 <= new_sum <= 9:  # Промежуточная сумма всегда от 0 до 9
-                valid_operations.append((sign, value))
-        
-        return valid_operations
-    
-    def get_weighted_operations(valid_ops, max_digit):
-        """Возвращает операции с весами для более частого использования выбранного числа"""
-        weighted_ops = []
-        for op in valid_ops:
-            sign, value = op
-            if value == max_digit:
-                # Выбранное число встречается чаще
-                # Разные веса для разных чисел
-                if max_digit == 9:
-                    weight = 6  # Для числа 9 нужен больший вес
-                elif max_digit == 4:
-                    weight = 5  # Для числа 4 тоже увеличиваем вес
-                else:
-                    weight = 4  # Стандартный вес
-                weighted_ops.extend([op] * weight)
-            elif value == 5 and max_digit >= 5:
-                # Число 5 тоже важно для абакуса (вес 2)
-                weighted_ops.extend([op] * 2)
-            else:
-                # Остальные числа (вес 1)
-                weighted_ops.append(op)
-        
-        return weighted_ops
-    
-    # Генерируем последовательность операций
-    for i in range(num_examples):
-        # Получаем допустимые операции
-        valid_ops = get_valid_operations(abacus_state, 9)  # Промежуточная сумма всегда до 9
-        
-        if not valid_ops:
-            # Если нет допустимых операций, сбрасываем состояние
-            abacus_state = [False, 0]
-            current_sum = 0
-            valid_ops = get_valid_operations(abacus_state, 9)  # Промежуточная сумма всегда до 9
-        
-        if valid_ops:
-            # Получаем взвешенные операции для более частого использования 5
-            weighted_ops = get_weighted_operations(valid_ops, max_digit)
-            
-            # Выбираем случайную операцию из взвешенного списка
-            sign, value = random.choice(weighted_ops)
-            
-            # Применяем операцию к состоянию абакуса
-            if value == 5:
-                if sign == '+':
-                    abacus_state[0] = True
-                else:
-                    abacus_state[0] = False
-            elif value > 5:  # Числа 6, 7, 8, 9 - упрощенная логика
-                # Для простоты не обновляем строго состояние абакуса
-                # Просто используем число напрямую
-                pass
-            else:  # Операция с единицами (1-4)
-                if sign == '+':
-                    abacus_state[1] += value
-                else:
-                    abacus_state[1] -= value
-            
-            # Добавляем число в последовательность
-            final_number = value if sign == '+' else -value
-            numbers.append(final_number)
-            current_sum += final_number
-        else:
-            # Если все еще нет операций, добавляем простое число
-            safe_value = min(1, max_digit)
-            numbers.append(safe_value)
-            current_sum += safe_value
-            abacus_state[1] = min(4, abacus_state[1] + safe_value)
-    
-    # Корректируем итоговую сумму, если она превышает max_digit
-    total_sum = sum(numbers)
-    if total_sum > max_digit:
-        # Добавляем корректирующее число, чтобы итоговая сумма не превышала max_digit
-        correction = max_digit - total_sum
-        if correction != 0:
-            numbers.append(correction)
-    
-    return numbers
+def simply_game_total(game, numbers):
+    """Правильный ответ игры "Просто": сумма чисел в пределах [0, max_sum]"""
+    settings = game['settings']
+    max_sum = simply_max_sum(SIMPLY_DIGITS.get(settings['range_key'], 2), settings['max_digit'])
+    return max(0, min(sum(numbers), max_sum))
+
 
 def simply(request, mode):
     # Игра "просто" доступна всем пользователям без авторизации
@@ -1092,7 +931,7 @@ def simply(request, mode):
             max_digit = request.POST.get('max_digit')
             
             # Очищаем только игровые данные из сессии, сохраняя аутентификацию
-            game_keys = ['range_key', 'num_examples', 'speed', 'max_digit', 'game_numbers', 'game_total', 'current_number_index', 'user_answer', 'is_correct', 'correct_answer', 'current_sign']
+            game_keys = ['range_key', 'num_examples', 'speed', 'max_digit', GAME_SESSION_KEY, 'user_answer']
             for key in game_keys:
                 if key in request.session:
                     del request.session[key]
@@ -1178,221 +1017,25 @@ def simply(request, mode):
     
     elif mode == 3:
         # Получаем настройки из сессии
-        range_key = request.session.get('range_key', 2)
-        num_examples = request.session.get('num_examples', 10)
         speed = request.session.get('speed', 1.0)
-        max_digit = request.session.get('max_digit', 9)
-        
-        # Определяем диапазон чисел и максимальную сумму
-        if range_key == 1:  # 1-10 (однозначные)
-            min_num, max_num = 1, 10
-            max_sum = max_digit  # Для однозначных: от 0 до max_digit
-        elif range_key == 2:  # 10-100 (двузначные)
-            min_num, max_num = 10, 100
-            # Для двузначных: максимальное число должно быть max_digit*11 (например, для 4: максимум 44)
-            actual_max_num = int(str(max_digit) + str(max_digit))  # 44 для max_digit=4
-            max_num = min(max_num, actual_max_num)  # Ограничиваем максимум
-            max_sum = actual_max_num  # Максимальная сумма равна максимальному числу
-        elif range_key == 3:  # 100-1000 (трехзначные)
-            min_num, max_num = 100, 1000
-            # Для трехзначных: максимальное число должно быть max_digit*111 (например, для 4: максимум 444)
-            actual_max_num = int(str(max_digit) + str(max_digit) + str(max_digit))
-            max_num = min(max_num, actual_max_num)
-            max_sum = actual_max_num
-        elif range_key == 4:  # 1000-10000 (четырехзначные)
-            min_num, max_num = 1000, 10000
-            # Для четырехзначных: максимальное число должно быть max_digit*1111 (например, для 4: максимум 4444)
-            actual_max_num = int(str(max_digit) + str(max_digit) + str(max_digit) + str(max_digit))
-            max_num = min(max_num, actual_max_num)
-            max_sum = actual_max_num
-        else:
-            min_num, max_num = 10, 100
-            actual_max_num = int(str(max_digit) + str(max_digit))
-            max_num = min(max_num, actual_max_num)
-            max_sum = actual_max_num
-        
-        # Проверяем, нужно ли использовать логику абакуса для чисел 5-9
-        if range_key == 1 and max_digit >= 5:  # Однозначные числа от 5 до 9
-            numbers = generate_abacus_numbers(max_digit, num_examples)
-        else:
-            # Используем старую логику для других случаев
-            numbers = []
-            available_digits = list(range(1, max_digit + 1))  # Цифры от 1 до max_digit
-            
-            # Определяем количество разрядов для чисел
-            if range_key == 1:  # 1-10
-                num_digits = 1
-            elif range_key == 2:  # 10-100
-                num_digits = 2
-            elif range_key == 3:  # 100-1000
-                num_digits = 3
-            elif range_key == 4:  # 1000-10000
-                num_digits = 4
-            else:
-                num_digits = 2
-            
-            # Генерируем целевую сумму в пределах от 0 до max_sum
-            target_sum = random.randint(0, max_sum)
-            
-            # Начинаем генерацию чисел с учетом целевой суммы
-            current_sum = 0
-            attempts = 0
-            max_attempts = 1000  # Ограничиваем количество попыток
-            
-            for i in range(num_examples):
-                attempts = 0
-                while attempts < max_attempts:
-                    attempts += 1
-                    
-                    # Генерируем число по разрядам с учетом ограничений max_digit
-                    # Согласно описанию настройки: "Числа будут состоять только из цифр от 1 до выбранного значения"
-                    number = 0
-                    valid_number = True
-                    
-                    for digit_pos in range(num_digits):
-                        # Для всех разрядов выбираем только цифры от 1 до max_digit
-                        # (цифра 0 не используется, чтобы соответствовать описанию настройки)
-                        available_first_digits = list(range(1, min(max_digit + 1, 10)))
-                        
-                        if not available_first_digits:
-                            valid_number = False
-                            break
-                            
-                        # Выбираем случайную цифру из доступных для этого разряда
-                        digit = random.choice(available_first_digits)
-                        # Добавляем цифру в соответствующий разряд
-                        number += digit * (10 ** (num_digits - 1 - digit_pos))
-                    
-                    if not valid_number:
-                        continue
-                    
-                    # Проверяем, что число попадает в нужный диапазон
-                    if not (min_num <= number <= max_num):
-                        continue
-                    
-                    # Определяем возможные знаки для числа
-                    remaining_numbers = num_examples - i - 1
-                    
-                    if i == num_examples - 1:  # Последнее число
-                        # Последнее число должно точно дать нужную сумму
-                        needed_value = target_sum - current_sum
-                        if abs(needed_value) == number:
-                            sign = 1 if needed_value > 0 else -1
-                            # Проверяем, что промежуточная сумма не уйдет в минус или не превысит max_sum
-                            temp_sum = current_sum + (number * sign)
-                            if 0 <= temp_sum <= max_sum:
-                                final_number = number * sign
-                                numbers.append(final_number)
-                                current_sum += final_number
-                                break
-                        continue
-                    else:
-                        # Для промежуточных чисел выбираем знак так, чтобы промежуточная сумма оставалась в пределах [0, max_sum]
-                        possible_signs = []
-                        
-                        # Проверяем положительный знак
-                        temp_sum_pos = current_sum + number
-                        if 0 <= temp_sum_pos <= max_sum:
-                            # Проверяем, что с оставшимися числами можно достичь целевой суммы
-                            remaining_range = remaining_numbers * max_num
-                            if temp_sum_pos - remaining_range <= target_sum <= temp_sum_pos + remaining_range:
-                                possible_signs.append(1)
-                        
-                        # Проверяем отрицательный знак
-                        temp_sum_neg = current_sum - number
-                        if 0 <= temp_sum_neg <= max_sum:
-                            # Проверяем, что с оставшимися числами можно достичь целевой суммы
-                            remaining_range = remaining_numbers * max_num
-                            if temp_sum_neg - remaining_range <= target_sum <= temp_sum_neg + remaining_range:
-                                possible_signs.append(-1)
-                        
-                        if possible_signs:
-                            sign = random.choice(possible_signs)
-                            final_number = number * sign
-                            numbers.append(final_number)
-                            current_sum += final_number
-                            break
-                
-                # Если не удалось найти подходящее число за разумное количество попыток
-                if attempts >= max_attempts:
-                    # Перезапускаем генерацию с новой целевой суммой
-                    numbers = []
-                    current_sum = 0
-                    target_sum = random.randint(0, max_sum)
-                    i = -1  # Начинаем заново
-                    continue
-            
-            # Если что-то пошло не так, используем простую генерацию
-            if len(numbers) != num_examples:
-                numbers = []
-                current_sum = 0
-                
-                for i in range(num_examples):
-                    # Генерируем простое число с учетом ограничений max_digit
-                    number = 0
-                    for digit_pos in range(num_digits):
-                        # Для всех разрядов выбираем только цифры от 1 до max_digit
-                        # (согласно описанию настройки: "Числа будут состоять только из цифр от 1 до выбранного значения")
-                        available_first_digits = list(range(1, min(max_digit + 1, 10)))
-                        
-                        if available_first_digits:
-                            digit = random.choice(available_first_digits)
-                        else:
-                            digit = 1  # Fallback значение (минимальная цифра)
-                            
-                        number += digit * (10 ** (num_digits - 1 - digit_pos))
-                    
-                    # Ограничиваем число диапазоном
-                    number = max(min_num, min(number, max_num))
-                    
-                    # Определяем знак так, чтобы промежуточная сумма оставалась в пределах [0, max_sum]
-                    possible_signs = []
-                    
-                    # Проверяем положительный знак
-                    if current_sum + number <= max_sum:
-                        possible_signs.append(1)
-                    
-                    # Проверяем отрицательный знак (только если промежуточная сумма не уйдет в минус)
-                    if current_sum - number >= 0:
-                        possible_signs.append(-1)
-                    
-                    # Если нет подходящих знаков, используем положительный
-                    if not possible_signs:
-                        sign = 1
-                        # Корректируем число, чтобы не превысить max_sum
-                        if current_sum + number > max_sum:
-                            number = max_sum - current_sum
-                            if number < min_num:
-                                number = min_num
-                    else:
-                        sign = random.choice(possible_signs)
-                    
-                    final_number = number * sign
-                    numbers.append(final_number)
-                    current_sum += final_number
-                    
-                    # Дополнительная проверка: если сумма все еще выходит за пределы, корректируем
-                    if current_sum < 0:
-                        current_sum = 0
-                    elif current_sum > max_sum:
-                        current_sum = max_sum
-        
-        # Вычисляем итоговую сумму
-        game_total = sum(numbers)
-        
-        # Убеждаемся, что сумма в допустимых пределах
-        if game_total < 0:
-            game_total = 0
-        elif game_total > max_sum:
-            game_total = max_sum
-        
-        # Сохраняем данные в сессию
-        request.session['game_numbers'] = numbers
-        request.session['game_total'] = game_total
-        request.session['current_number_index'] = 0
-        request.session['speed'] = speed
-        
-        return redirect('simply', mode=5)
+        
+        # Новая игра: в сессии только настройки и зерно, числа пересчитываются по зерну
+        # (для однозначных чисел от 5 до 9 — по правилам абакуса)
+        game = start_game(request.session, 'simply', {
+            'range_key': request.session.get('range_key', 2),
+            'num_examples': request.session.get('num_examples', 10),
+            'max_digit': request.session.get('max_digit', 9),
+        })
+        numbers = game_sequence(game)
+        
+        # Отдаем всю последовательность сразу: числа сменяются в браузере с заданной скоростью,
+        # а сервер получает только ответ в режиме 6
+        return render(request, 'simply.html', {
+            "mode": 5,
+            "game_numbers": numbers,
+            "total_count": len(numbers),
+            "speed": speed
+        })
     
     elif mode == 5:
         if request.method == 'POST':
@@ -1400,46 +1043,35 @@ def simply(request, mode):
             if next_mode == '6':
                 # Переходим к вводу ответа
                 return redirect('simply', mode=6)
-            elif next_mode == '7':
-                # Переходим к следующему числу
-                return redirect('simply', mode=7)
         
-        # Получаем данные из сессии
-        numbers = request.session.get('game_numbers', [])
-        current_index = request.session.get('current_number_index', 0)
-        speed = request.session.get('speed', 1.0)
-        
-        if not numbers:
+        # Повторный показ той же последовательности (например, после обновления страницы)
+        game = current_game(request.session, 'simply')
+        if game is None:
             return redirect('simply', mode=1)
         
-        if current_index >= len(numbers):
-            return redirect('simply', mode=6)
-        
-        current_number = numbers[current_index]
+        numbers = game_sequence(game)
+        speed = request.session.get('speed', 1.0)
         
-        context = {
+        return render(request, 'simply.html', {
             "mode": 5,
-            "current_number": current_number,
-            "current_index": current_index + 1,  # +1 для отображения (начиная с 1)
+            "game_numbers": numbers,
             "total_count": len(numbers),
             "speed": speed
-        }
-        
-        return render(request, 'simply.html', context)
+        })
     
     elif mode == 6:
         if request.method == 'POST':
             user_answer = request.POST.get('user_answer')
-            game_total = request.session.get('game_total', 0)
             
             try:
-                user_answer = int(user_answer)
-                is_correct = user_answer == game_total
+                # Сохраняем только ответ: правильный ответ пересчитывается по зерну игры
+                request.session['user_answer'] = int(user_answer)
                 
-                # Сохраняем результат
-                request.session['user_answer'] = user_answer
-                request.session['is_correct'] = is_correct
-                request.session['correct_answer'] = game_total
+                # Результат записываем здесь, а не в режиме 4: обновление страницы не повторит его
+                game = current_game(request.session, 'simply')
+                if game is not None:
+                    is_correct = int(user_answer) == simply_game_total(game, game_sequence(game))
+                    record_game_result(request, 'simply', game['settings'], 1, int(is_correct))
                 
                 return redirect('simply', mode=4)
                 
@@ -1448,26 +1080,16 @@ def simply(request, mode):
         else:
             return render(request, 'simply.html', {"mode": 6})
     
-    elif mode == 7:
-        # Увеличиваем индекс
-        current_index = request.session.get('current_number_index', 0)
-        new_index = current_index + 1
-        
-        request.session['current_number_index'] = new_index
-        
-        # Проверяем, показаны ли все числа
-        numbers = request.session.get('game_numbers', [])
-        if new_index >= len(numbers):
-            return redirect('simply', mode=6)
-        else:
-            return redirect('simply', mode=5)
-    
     elif mode == 4:
-        # Получаем результаты из сессии
+        # Получаем ответ из сессии и проверяем его по последовательности, пересчитанной по зерну
+        game = current_game(request.session, 'simply')
+        if game is None:
+            return redirect('simply', mode=1)
+        
         user_answer = request.session.get('user_answer', 0)
-        is_correct = request.session.get('is_correct', False)
-        correct_answer = request.session.get('correct_answer', 0)
-        game_numbers = request.session.get('game_numbers', [])
+        game_numbers = game_sequence(game)
+        correct_answer = simply_game_total(game, game_numbers)
+        is_correct = user_answer == correct_answer
         
         context = {
             "mode": 4,
@@ -1523,89 +1145,10 @@ def student_dashboard(request):
         return redirect('student_login')
     
     student_id = request.session['student_id']
-    student = get_object_or_404(Students, id=student_id)
-    
-    # Получаем доступные игры для класса ученика
-    available_games = []
-    if student.student_class:
-        # Получаем все игры, доступные для класса
-        class_games = ClassGameAccess.objects.filter(
-            class_group=student.student_class,
-            is_enabled=True
-        )
-        
-        # Добавляем отладочную информацию
-        print(f"DEBUG: Ученик {student.name} в классе {student.student_class.name}")
-        print(f"DEBUG: Найдено {class_games.count()} доступных игр")
-        
-        # Показываем все найденные игры
-        for game in class_games:
-            print(f"DEBUG: В БД найдена игра: {game.game} -> {game.is_enabled}")
-        
-        # Создаем список доступных игр
-        for game_access in class_games:
-            print(f"DEBUG: Игра {game_access.game} доступна")
-            if game_access.game == 'multiplication_choose':
-                available_games.append({
-                    'code': 'multiplication_choose',
-                    'title': 'Умножение',
-                    'description': 'Изучайте таблицу умножения с разными диапазонами чисел.',
-                    'icon': 'fas fa-times',
-                    'url': 'multiplication_choose'
-                })
-            elif game_access.game == 'multiplication_to_20':
-                available_games.append({
-                    'code': 'multiplication_to_20',
-                    'title': 'Умножение до 20',
-                    'description': 'Специальная тренировка умножения чисел до 20.',
-                    'icon': 'fas fa-calculator',
-                    'url': 'multiplication_to_20'
-                })
-            elif game_access.game == 'square':
-                available_games.append({
-                    'code': 'square',
-                    'title': 'Квадрат',
-                    'description': 'Тренируйте возведение чисел в квадрат и умножение.',
-                    'icon': 'fas fa-square',
-                    'url': 'square'
-                })
-            elif game_access.game == 'multiplication_base':
-                available_games.append({
-                    'code': 'multiplication_base',
-                    'title': 'Умножение от базы',
-                    'description': 'Специальные техники умножения с использованием базовых чисел.',
-                    'icon': 'fas fa-sort-numeric-up',
-                    'url': 'multiplication_base'
-                })
-            elif game_access.game == 'tricks':
-                available_games.append({
-                    'code': 'tricks',
-                    'title': 'Хитрости',
-                    'description': 'Изучайте специальные математические хитрости для быстрого счета.',
-                    'icon': 'fas fa-magic',
-                    'url': 'tricks'
-                })
-            elif game_access.game == 'flashcards':
-                available_games.append({
-                    'code': 'flashcards',
-                    'title': 'Флэшкарты',
-                    'description': 'Тренируйте ментальную арифметику с помощью счетов (абакуса).',
-                    'icon': 'fas fa-credit-card',
-                    'url': 'flashcards'
-                })
-            else:
-                print(f"DEBUG: Неизвестная игра: {game_access.game}")
+    student = get_object_or_404(Students.objects.select_related('student_class'), id=student_id)
     
-    print(f"DEBUG: Итого доступно игр: {len(available_games)}")
-    
-    # Игра "Просто" всегда доступна
-    available_games.insert(0, {
-        'code': 'simply',
-        'title': 'Просто',
-        'description': 'Тренируйте сложение и вычитание чисел. Выберите сложность и количество примеров.',
-        'icon': 'fas fa-plus',
-        'url': 'simply'
-    })
+    # Карточки игр класса строятся по реестру игр и кешируются на класс
+    available_games = class_dashboard_games(student.student_class_id)
     
     context = {
         'student': student,
@@ -1797,48 +1340,27 @@ def attendance_list(request, class_id):
     if not hasattr(request.user, 'teacher_profile') or request.user.teacher_profile != class_obj.teacher:
         return HttpResponseForbidden("У вас нет доступа к этому классу")
     
-    # Получаем всех учеников класса с оптимизацией
-    students = Students.objects.filter(student_class=class_obj).select_related('student_class').order_by('surname', 'name')
-    
-    # Получаем все даты занятий для этого класса
-    attendance_dates = Attendance.objects.filter(
-        class_group=class_obj
-    ).values_list('date', flat=True).distinct().order_by('date')
+    # Получаем всех учеников класса
+    students = list(Students.objects.filter(student_class=class_obj).order_by('surname', 'name'))
     
-    # ОПТИМИЗАЦИЯ: Получаем все записи посещений одним запросом
-    all_attendances = Attendance.objects.filter(
-        class_group=class_obj
-    ).select_related('student').values(
-        'student_id', 'date', 'is_present', 'is_paid'
-    )
+    # Табель показывается помесячно: загружается только выбранный месяц
+    months = attendance_months(class_obj)
+    month = pick_month(months, parse_month(request.GET.get('month')))
+    attendance_dates, matrix = attendance_grid(class_obj, students, month) if month else ([], bytearray())
     
-    # Создаем словарь для быстрого доступа к данным посещений
-    attendance_lookup = {}
-    for att in all_attendances:
-        key = (att['student_id'], att['date'])
-        attendance_lookup[key] = {
-            'is_present': att['is_present'],
-            'is_paid': att['is_paid']
-        }
-    
-    # Формируем данные без дополнительных запросов к БД
-    attendance_data = {}
-    for student in students:
-        student_attendances = {}
-        for date in attendance_dates:
-            key = (student.id, date)
-            if key in attendance_lookup:
-                student_attendances[date] = attendance_lookup[key]
-        
-        attendance_data[student.id] = {
-            'attendances': student_attendances
-        }
+    if request.GET.get('format') == 'json':
+        payload = grid_payload(students, attendance_dates, matrix)
+        payload['month'] = month.strftime('%Y-%m') if month else None
+        return JsonResponse({'success': True, **payload})
     
     context = {
         'class_obj': class_obj,
-        'students': students,
         'attendance_dates': attendance_dates,
-        'attendance_data': attendance_data,
+        'grid_rows': grid_rows(students, attendance_dates, matrix),
+        'month': month,
+        # Соседние месяцы с занятиями для навигации
+        'prev_month': next((m for m in reversed(months) if month and m < month), None),
+        'next_month': next((m for m in months if month and m > month), None),
     }
     
     return render(request, 'attendance_list.html', context)
@@ -1878,22 +1400,10 @@ def attendance_create(request, class_id):
                 messages.error(request, f'Занятие на {new_date.strftime("%d.%m.%Y")} уже существует')
                 return render(request, 'attendance_create.html', {'class_obj': class_obj})
             
-            # Получаем всех учеников класса
-            students = Students.objects.filter(student_class=class_obj)
-            
-            # Создаем записи посещения для всех учеников
-            attendance_records = []
-            for student in students:
-                attendance = Attendance.objects.create(
-                    student=student,
-                    class_group=class_obj,
-                    date=new_date,
-                    is_present=False,
-                    is_paid=False
-                )
-                attendance_records.append(attendance)
+            # Создаем записи посещения для всех учеников одним запросом
+            created_count = create_attendance_rows(class_obj, [new_date])
             
-            messages.success(request, f'Успешно создано занятие на {new_date.strftime("%d.%m.%Y")} для {len(attendance_records)} учеников')
+            messages.success(request, f'Успешно создано занятие на {new_date.strftime("%d.%m.%Y")} для {created_count} учеников')
             return redirect('attendance_list', class_id=class_id)
     
     return render(request, 'attendance_create.html', {'class_obj': class_obj})
@@ -1927,20 +1437,13 @@ def attendance_add_date(request, class_id):
             return JsonResponse({'success': False, 'error': 'Занятие на эту дату уже существует'})
         
         # Получаем всех учеников класса
-        students = Students.objects.filter(student_class=class_obj)
+        student_ids = list(Students.objects.filter(student_class=class_obj).values_list('id', flat=True))
         
-        if not students.exists():
+        if not student_ids:
             return JsonResponse({'success': False, 'error': 'В классе нет учеников'})
         
-        # Создаем записи посещения для всех учеников
-        for student in students:
-            Attendance.objects.create(
-                student=student,
-                class_group=class_obj,
-                date=new_date,
-                is_present=False,  # По умолчанию не присутствовал
-                is_paid=False
-            )
+        # Создаем записи посещения для всех учеников (по умолчанию не присутствовал)
+        create_attendance_rows(class_obj, [new_date], student_ids=student_ids)
         
         return JsonResponse({'success': True, 'message': f'Занятие на {new_date.strftime("%d.%m.%Y")} успешно добавлено'})
         
@@ -2082,7 +1585,7 @@ def attendance_delete(request, class_id, date):
 def payment_settings_edit(request, class_id):
     """Редактирование настроек оплаты для класса"""
     try:
-        class_obj = Class.objects.get(id=class_id)
+        class_obj = Class.objects.annotate(students_total=Count('students')).get(id=class_id)
         # Проверяем, что учитель имеет доступ к этому классу
         if class_obj.teacher != request.user.teacher_profile:
             return HttpResponseForbidden("У вас нет доступа к этому классу")
@@ -2133,122 +1636,45 @@ def student_attendance_list(request):
         # Получаем стоимость за занятие из класса
         lesson_fee = getattr(class_obj, 'lesson_fee', 0) or 0
         
-        # ОПТИМИЗАЦИЯ: получаем все посещения с select_related
-        attendances = Attendance.objects.filter(
-            student=student,
-            class_group=class_obj
-        ).select_related('student', 'class_group').order_by('-date')
+        # Помесячная сводка из таблицы балансов (без загрузки всех посещений)
+        summary = student_monthly_summary(student, class_obj)
         
-        # Получаем настройки оплаты для класса
-        try:
-            payment_settings = PaymentSettings.objects.get(class_group=class_obj)
-        except PaymentSettings.DoesNotExist:
-            payment_settings = PaymentSettings.objects.create(
-                class_group=class_obj,
-                payment_day=15
-            )
-        
-        # Группируем посещения по месяцам для создания табеля
-        from itertools import groupby
-        from operator import attrgetter
-        
-        # Сортируем по дате для группировки
-        attendances_sorted = sorted(attendances, key=attrgetter('date'))
-        
-        # Группируем по месяцу и году
-        monthly_attendances = {}
-        for attendance in attendances_sorted:
-            month_key = (attendance.date.year, attendance.date.month)
-            if month_key not in monthly_attendances:
-                monthly_attendances[month_key] = []
-            monthly_attendances[month_key].append(attendance)
+        # Подробно показывается один месяц: запрошенный или текущий/последний
+        shown_month = pick_month([row['month'] for row in summary], parse_month(request.GET.get('month')))
         
         # Создаем структуру табеля
         attendance_table = {}
-        
-        # Проверяем, что есть данные для группировки
-        if monthly_attendances:
-            for (year, month), month_attendances_list in monthly_attendances.items():
-                month_name = f"{year}-{month:02d}"
-                
-                # Расчет оплаты для каждого месяца
-                total_lessons = len(month_attendances_list)
-                attended_lessons = sum(1 for a in month_attendances_list if a.is_present)
-                paid_lessons = sum(1 for a in month_attendances_list if a.is_paid)
-                carried_over = sum(1 for a in month_attendances_list if a.payment_carried_over)
-                
+        for row in summary:
+            month = row['month']
+            month_name = f"{month.year}-{month.month:02d}"
+            attendance_table[month_name] = {
+                'year': month.year,
+                'month': month.month,
+                # Записи месяца — ленивый запрос, выполняется только для показываемого месяца
+                'attendances': Attendance.objects.filter(
+                    student=student,
+                    class_group=class_obj,
+                    date__gte=month,
+                    date__lt=next_month(month)
+                ).order_by('date') if month == shown_month else None,
+                'total_lessons': row['total'],
+                'attended_lessons': row['attended'],
+                'paid_lessons': row['paid'],
+                'carried_over': row['carried'],
                 # Расчет суммы оплаты для месяца по количеству занятий
-                month_payment = attended_lessons * lesson_fee if lesson_fee > 0 else 0
-                
-                attendance_table[month_name] = {
-                    'year': year,
-                    'month': month,
-                    'attendances': month_attendances_list,
-                    'total_lessons': total_lessons,
-                    'attended_lessons': attended_lessons,
-                    'paid_lessons': paid_lessons,
-                    'carried_over': carried_over,
-                    'month_payment': month_payment,
-                    'lesson_fee': lesson_fee
-                }
+                'month_payment': row['attended'] * lesson_fee if lesson_fee > 0 else 0,
+                'lesson_fee': lesson_fee
+            }
+        
+        # Оплата за текущий месяц и задолженность за предыдущие — из той же сводки
+        today = timezone.localdate()
+        current, current_month_payment, previous_months_debt = student_debt(summary, today)
+        total_lessons = current['total']
+        attended_lessons = current['attended']
+        paid_lessons = current['paid']
         
-        # Расчет оплаты для текущего месяца
-        from datetime import datetime
-        current_date = datetime.now()
-        current_month = current_date.month
-        current_year = current_date.year
-        
-        # ОПТИМИЗАЦИЯ: получаем посещения за текущий месяц одним запросом
-        month_attendances_list = list(attendances.filter(
-            date__month=current_month,
-            date__year=current_year
-        ))
-        
-        # Считаем статистику в Python, а не в БД
-        total_lessons = len(month_attendances_list)
-        attended_lessons = sum(1 for a in month_attendances_list if a.is_present)
-        paid_lessons = sum(1 for a in month_attendances_list if a.is_paid)
-        
-        # Расчет оплаты за текущий месяц по количеству занятий
-        monthly_payment = 0
         # Считаем ВСЕ занятия текущего месяца (включая пропуски)
         lessons_payment = total_lessons * lesson_fee if lesson_fee > 0 else 0
-        # Вычитаем стоимость уже оплаченных занятий
-        paid_lessons_cost = paid_lessons * lesson_fee if lesson_fee > 0 else 0
-        current_month_payment = max(0, lessons_payment - paid_lessons_cost)
-        
-        # Расчет задолженности за предыдущие месяцы
-        previous_months_debt = 0
-        
-        # Проверяем, что есть данные для расчета задолженности
-        if attendance_table:
-            for month_key, month_data in attendance_table.items():
-                # Парсим ключ месяца (формат: "2025-08")
-                try:
-                    year, month = map(int, month_key.split('-'))
-                except (ValueError, AttributeError):
-                    continue
-                
-                # Пропускаем текущий месяц
-                if year == current_year and month == current_month:
-                    continue
-                
-                # Пропускаем будущие месяцы - они не должны учитываться в задолженности
-                if (year > current_year) or (year == current_year and month > current_month):
-                    continue
-                
-                # Считаем задолженность по количеству занятий в месяце
-                month_lessons = month_data['total_lessons']
-                month_debt = month_lessons * lesson_fee if lesson_fee > 0 else 0
-                
-                # Вычитаем уже оплаченные занятия
-                paid_in_month = month_data['paid_lessons']
-                # Вычитаем стоимость оплаченных занятий
-                month_debt -= paid_in_month * lesson_fee if lesson_fee > 0 else 0
-                
-                # Добавляем к общей задолженности (только положительные значения)
-                if month_debt > 0:
-                    previous_months_debt += month_debt
         
         # Общая сумма к оплате
         total_payment = current_month_payment + previous_months_debt
@@ -2257,21 +1683,20 @@ def student_attendance_list(request):
             'total_lessons': total_lessons,
             'attended_lessons': attended_lessons,
             'paid_lessons': paid_lessons,
-            'monthly_payment': monthly_payment,
+            'monthly_payment': 0,
             'lessons_payment': lessons_payment,
             'current_month_payment': current_month_payment,
             'previous_months_debt': previous_months_debt,
             'total_payment': total_payment,
             'lesson_fee': lesson_fee,
-            'current_month': current_month,
-            'current_year': current_year,
+            'current_month': today.month,
+            'current_year': today.year,
             'paid_lessons_cost': paid_lessons * lesson_fee if lesson_fee > 0 else 0
         }
         
         return render(request, 'student_attendance_list.html', {
             'student': student,
             'class_obj': class_obj,
-            'attendances': attendances,
             'attendance_table': attendance_table,
             'payment_info': payment_info
         })
@@ -2333,36 +1758,32 @@ def monthly_schedule_create(request, class_id):
                         return redirect('monthly_schedule_create', class_id=class_id)
                 
                 # Получаем всех учеников класса
-                students = Students.objects.filter(student_class=class_obj)
+                student_ids = list(Students.objects.filter(student_class=class_obj).values_list('id', flat=True))
                 
                 # Проверяем, есть ли ученики в классе
-                if not students.exists():
+                if not student_ids:
                     messages.error(request, f'В классе "{class_obj.name}" нет учеников. Сначала добавьте учеников в класс, а затем создавайте расписание.')
                     return redirect('student_create_in_class', class_id=class_id)
                 
-                # Создаем записи посещения для всех дат и учеников
-                created_count = 0
+                # Даты занятий, валидные для указанного месяца и года
+                from datetime import date
+                valid_dates = set()
                 for day in lesson_dates:
                     try:
-                        # Проверяем, что дата валидна для указанного месяца и года
-                        from datetime import date
-                        lesson_date = date(year, month, day)
-                        
-                        for student in students:
-                            Attendance.objects.create(
-                                student=student,
-                                class_group=class_obj,
-                                monthly_schedule=monthly_schedule,
-                                date=lesson_date,
-                                is_present=True,
-                                is_paid=False,
-                                payment_carried_over=False
-                            )
-                        created_count += 1
+                        valid_dates.add(date(year, month, day))
                     except ValueError:
                         # Пропускаем невалидные даты
                         continue
                 
+                # Создаем записи посещения для всех дат и учеников одной пакетной вставкой
+                create_attendance_rows(
+                    class_obj, valid_dates,
+                    monthly_schedule=monthly_schedule,
+                    is_present=True,
+                    student_ids=student_ids
+                )
+                created_count = len(valid_dates)
+                
                 if created_count > 0:
                     messages.success(request, f'Месячное расписание создано! Создано {created_count} занятий')
                     return redirect('monthly_schedule_edit', class_id=class_id, schedule_id=monthly_schedule.id)
@@ -2401,19 +1822,20 @@ def monthly_schedule_create(request, class_id):
 def monthly_schedule_list(request, class_id):
     """Список месячных расписаний для класса"""
     try:
-        # ОПТИМИЗАЦИЯ: используем select_related для класса
-        class_obj = Class.objects.select_related('teacher__user').get(id=class_id)
+        # ОПТИМИЗАЦИЯ: используем select_related для класса, количество учеников — аннотацией
+        class_obj = Class.objects.select_related('teacher__user').annotate(
+            students_total=Count('students')
+        ).get(id=class_id)
         # Проверяем, что учитель имеет доступ к этому классу
         if class_obj.teacher != request.user.teacher_profile:
             return HttpResponseForbidden("У вас нет доступа к этому классу")
         
-        # ОПТИМИЗАЦИЯ: получаем все данные с select_related
+        # ОПТИМИЗАЦИЯ: получаем все данные с select_related, количество дат занятий — аннотацией
         monthly_schedules = MonthlySchedule.objects.filter(
             class_group=class_obj
-        ).select_related('class_group').order_by('-year', '-month')
-        
-        # Получаем всех учеников класса с оптимизацией
-        students = Students.objects.filter(student_class=class_obj).select_related('student_class').order_by('surname', 'name')
+        ).select_related('class_group').annotate(
+            lesson_dates_total=Count('attendances__date', distinct=True)
+        ).order_by('-year', '-month')
         
         # Получаем настройки оплаты
         payment_settings, created = PaymentSettings.objects.get_or_create(
@@ -2425,7 +1847,6 @@ def monthly_schedule_list(request, class_id):
         
         context = {
             'class_obj': class_obj,
-            'students': students,
             'monthly_schedules': monthly_schedules,
             'payment_settings': payment_settings,
         }
@@ -2447,73 +1868,45 @@ def monthly_schedule_edit(request, class_id, schedule_id):
             return HttpResponseForbidden("У вас нет доступа к этому классу")
         
         # Получаем всех учеников класса
-        students = Students.objects.filter(student_class=class_obj).order_by('surname', 'name')
+        students = list(Students.objects.filter(student_class=class_obj).order_by('surname', 'name'))
         
         # Получаем уникальные даты занятий для этого расписания
-        lesson_dates = Attendance.objects.filter(
+        lesson_dates = list(Attendance.objects.filter(
             monthly_schedule=monthly_schedule
-        ).values_list('date', flat=True).distinct().order_by('date')
+        ).values_list('date', flat=True).distinct().order_by('date'))
+        
+        # Весь табель одним запросом: (ученик, дата) → запись посещения
+        grid = load_attendance_grid(
+            class_obj, [student.id for student in students], lesson_dates, monthly_schedule
+        )
+        data = request.POST if request.method == 'POST' else None
+        
+        # Строки табеля: ученик и формы по датам занятий
+        grid_rows = [
+            (student, [
+                (date, MonthlyAttendanceForm(data, instance=grid[(student.id, date)],
+                                             prefix=f'attendance_{student.id}_{date.strftime("%Y%m%d")}'))
+                for date in lesson_dates
+            ])
+            for student in students
+        ]
         
         if request.method == 'POST':
-            # Обрабатываем POST запрос
-            forms_valid = True
-            attendance_forms = []
-            
-            for student in students:
-                for date in lesson_dates:
-                    # Получаем или создаем запись посещения
-                    attendance, created = Attendance.objects.get_or_create(
-                        student=student,
-                        monthly_schedule=monthly_schedule,
-                        date=date,
-                        defaults={
-                            'is_present': True,
-                            'is_paid': False,
-                            'payment_carried_over': False
-                        }
-                    )
-                    
-                    form = MonthlyAttendanceForm(request.POST, instance=attendance, 
-                                               prefix=f'attendance_{student.id}_{date.strftime("%Y%m%d")}')
-                    if not form.is_valid():
-                        forms_valid = False
-                        break
-                    attendance_forms.append((attendance, form))
-                
-                if not forms_valid:
-                    break
-            
-            if forms_valid:
-                for attendance, form in attendance_forms:
-                    form.save()
+            forms = [form for _, row in grid_rows for _, form in row]
+            if all(form.is_valid() for form in forms):
+                # Сохраняем только измененные клетки одним запросом
+                save_attendance_rows(
+                    [form.instance for form in forms if form.has_changed()],
+                    MonthlyAttendanceForm._meta.fields
+                )
                 
                 messages.success(request, f'Расписание на {monthly_schedule} обновлено!')
                 return redirect('monthly_schedule_list', class_id=class_id)
-        else:
-            # Создаем формы для каждой комбинации ученик-дата
-            attendance_forms = []
-            for student in students:
-                for date in lesson_dates:
-                    # Получаем или создаем запись посещения
-                    attendance, created = Attendance.objects.get_or_create(
-                        student=student,
-                        monthly_schedule=monthly_schedule,
-                        date=date,
-                        defaults={
-                            'is_present': True,
-                            'is_paid': False,
-                            'payment_carried_over': False
-                        }
-                    )
-                    
-                    form = MonthlyAttendanceForm(instance=attendance, 
-                                               prefix=f'attendance_{student.id}_{date.strftime("%Y%m%d")}')
-                    attendance_forms.append((student, date, attendance, form))
         
         return render(request, 'monthly_schedule_edit.html', {
             'class_obj': class_obj,
             'monthly_schedule': monthly_schedule,
-            'attendance_forms': attendance_forms,
+            'grid_rows': grid_rows,
             'students': students,
             'lesson_dates': lesson_dates,
             'title': f'Редактировать расписание на {monthly_schedule}'
@@ -2561,53 +1954,24 @@ def carry_over_payments(request, class_id, schedule_id):
             return HttpResponseForbidden("У вас нет доступа к этому классу")
         
         if request.method == 'POST':
-            # Получаем все неоплаченные занятия
-            unpaid_attendances = Attendance.objects.filter(
-                monthly_schedule=monthly_schedule,
-                is_present=True,
-                is_paid=False
-            )
-            
-            if unpaid_attendances.exists():
-                # Создаем следующий месяц
-                next_month = monthly_schedule.month + 1
-                next_year = monthly_schedule.year
-                if next_month > 12:
-                    next_month = 1
-                    next_year += 1
-                
-                # Создаем или получаем расписание на следующий месяц
-                next_schedule, created = MonthlySchedule.objects.get_or_create(
-                    class_group=class_obj,
-                    month=next_month,
-                    year=next_year
-                )
-                
-                # Переносим неоплаченные занятия
-                carried_over_count = 0
-                for attendance in unpaid_attendances:
-                    # Создаем новую запись на следующий месяц
-                    new_attendance = Attendance.objects.create(
-                        student=attendance.student,
-                        class_group=class_obj,
-                        monthly_schedule=next_schedule,
-                        date=attendance.date.replace(month=next_month, year=next_year),
-                        is_present=True,
-                        is_paid=False,
-                        payment_carried_over=True,
-                        notes=f"Перенесено с {monthly_schedule}"
-                    )
-                    carried_over_count += 1
-                
-                messages.success(request, f'Перенесено {carried_over_count} неоплаченных занятий на {next_schedule}')
+            result = carry_over_unpaid(class_obj, monthly_schedule)
+            if result.carried:
+                message = f'Перенесено {result.carried} неоплаченных занятий на {result.month:02d}.{result.year}'
+                if result.skipped:
+                    message += f' (пропущено: {result.skipped} — у ученика уже есть занятие в эту дату)'
+                messages.success(request, message)
+            elif result.unpaid:
+                messages.info(request, 'Все неоплаченные занятия уже перенесены')
             else:
                 messages.info(request, 'Нет неоплаченных занятий для переноса')
             
             return redirect('monthly_schedule_list', class_id=class_id)
         
+        # Предпросмотр: те же подсчеты без записи
         return render(request, 'carry_over_payments.html', {
             'class_obj': class_obj,
             'monthly_schedule': monthly_schedule,
+            'preview': carry_over_unpaid(class_obj, monthly_schedule, dry_run=True),
             'title': 'Перенос неоплаченных занятий'
         })
     except (Class.DoesNotExist, MonthlySchedule.DoesNotExist):
@@ -2615,56 +1979,13 @@ def carry_over_payments(request, class_id, schedule_id):
         return redirect('class_list')
 
 
-# делаем функцию определения колонок, return добавим в рендер, колонки обозначают разряд числа и будут добавляться в переменную
-# columns, в зависимости от числа, каждая колонка должна ставить список в нужном порядке
-def generate_abacus_columns(number):
-    # Список для всех колонок
-    columns = []
-    
-    # Специальная обработка для числа 0
-    if number == 0:
-        return [[[1, 0], [0, 1, 1, 1, 1]]]
-
-    while number > 0:
-        digit = number % 10
-
-        if digit == 0:
-            column = [[1, 0], [0, 1, 1, 1, 1]]
-        elif digit == 1:
-            column = [[1, 0], [1, 0, 1, 1, 1]]
-        elif digit == 2:
-            column = [[1, 0], [1, 1, 0, 1, 1]]
-        elif digit == 3:
-            column = [[1, 0], [1, 1, 1, 0, 1]]
-        elif digit == 4:
-            column = [[1, 0], [1, 1, 1, 1, 0]]
-        elif digit == 5:
-            column = [[0, 1], [0, 1, 1, 1, 1]]
-        elif digit == 6:
-            column = [[0, 1], [1, 0, 1, 1, 1]]
-        elif digit == 7:
-            column = [[0, 1], [1, 1, 0, 1, 1]]
-        elif digit == 8:
-            column = [[0, 1], [1, 1, 1, 0, 1]]
-        elif digit == 9:
-            column = [[0, 1], [1, 1, 1, 1, 0]]
-
-        columns.insert(0, column)  # Вставляем колонку в начало (от младшего к старшему разряду)
-        number //= 10
-
-    return columns
-
-
+@player_required
 def flashcards(request, mode):
     """
     Обрабатывает GET и POST запросы для страницы с флешкартами.
     GET — начальная загрузка формы.
     POST — обработка данных формы, генерация случайных чисел и колонок абакуса.
     """
-    # Проверяем авторизацию ученика или учителя
-    if not request.session.get('student_id') and not (hasattr(request.user, 'teacher_profile') and request.user.teacher_profile.status == 'approved'):
-        return redirect('student_login')
-    
     # Если пользователь только открыл страницу, обрабатываем GET-запрос
     if request.method == 'GET':
         # Отправляем шаблону flashcards.html данные с указанием, что нужно показать форму выбора параметров
@@ -2676,10 +1997,11 @@ def flashcards(request, mode):
     if request.method == 'POST':
         # Проверяем, является ли это переходом от обратного отсчета к показу абакуса
         if request.POST.get('start_game'):
+            game = current_game(request.session, 'flashcards')
             return render(request, 'flashcards.html', {
                 "mode": 2,           # Режим отображения абакуса
-                "columns_list": request.session.get('flashcards_columns', []),
-                "numbers": request.session.get('flashcards_numbers', []),
+                # Числа пересчитываются по зерну игры, колонки абакуса строятся при рендере (фильтр abacus_columns)
+                "numbers": game_sequence(game) if game else [],
                 "speed": request.session.get('flashcards_speed', 1.0)
             })
         
@@ -2694,8 +2016,9 @@ def flashcards(request, mode):
                     "error": "Введите корректное число."
                 })
             
-            # Получаем правильную сумму из сессии
-            numbers = request.session.get('flashcards_numbers', [])
+            # Пересчитываем числа по зерну игры из сессии
+            game = current_game(request.session, 'flashcards')
+            numbers = game_sequence(game) if game else []
             if not numbers:
                 return render(request, 'flashcards.html', {
                     "mode": 3,
@@ -2704,6 +2027,7 @@ def flashcards(request, mode):
             
             correct_sum = sum(numbers)
             is_correct = (user_answer == correct_sum)
+            record_game_result(request, 'flashcards', game['settings'], 1, int(is_correct))
             
             # Переходим в финальный режим (mode = 3) — вывод результата
             return render(request, 'flashcards.html', {
@@ -2725,42 +2049,20 @@ def flashcards(request, mode):
         # Получаем максимально допустимую цифру для числа
         max_digit = int(request.POST.get('max_digit', 9))
         
-        # Словарь, где для каждого уровня сложности задан свой диапазон чисел
-        difficulty_ranges = {
-            1: (0, 10),      # Простой уровень — числа от 0 до 9
-            2: (10, 100),    # Средний уровень — числа от 10 до 99
-            3: (100, 1000),  # Сложный уровень — числа от 100 до 999
-            4: (1000, 10000) # Очень сложный уровень — числа от 1000 до 9999
-        }
-        
-        # Извлекаем минимальное и максимальное значение диапазона для выбранного уровня сложности
-        min_val, max_val = difficulty_ranges.get(difficult_level, (0, 10))
-        
-        # Инициализируем пустой список для хранения итоговых чисел
-        numbers = []
-        
-        # Цикл для генерации заданного количества чисел
-        while len(numbers) < quantity:
-            # Генерируем случайное число в диапазоне сложности
-            num = random.randint(min_val, max_val - 1)
-            # Проверяем каждую цифру числа:
-            # если каждая цифра меньше или равна max_digit — добавляем число в список
-            if all(int(digit) <= max_digit for digit in str(num)):
-                numbers.append(num)
-        
-        # После формирования списка чисел создаём список представлений абакуса для каждого числа
-        columns_list = [generate_abacus_columns(number) for number in numbers]
-        
-        # Сохраняем данные в сессии для возможного использования в будущем
-        request.session['flashcards_numbers'] = numbers
-        request.session['flashcards_columns'] = columns_list
+        # Числа нужного уровня сложности, все цифры которых не больше max_digit,
+        # выбираются из заранее построенного индекса без перебора.
+        # В сессии хранятся только настройки и зерно: числа пересчитываются по нему при показе и проверке
+        game = start_game(request.session, 'flashcards', {
+            'difficult_level': difficult_level,
+            'max_digit': max_digit,
+            'quantity': quantity,
+        })
+        numbers = game_sequence(game)
         request.session['flashcards_speed'] = speed
-        request.session['flashcards_difficult_level'] = difficult_level
         
         # Передаём готовые данные в шаблон для отображения абакуса на странице
         return render(request, 'flashcards.html', {
             "mode": 2.5,         # Режим обратного отсчета перед показом абакуса
-            "columns_list": columns_list,  # Список готовых колонок для каждого числа
             "numbers": numbers,   # Список чисел для проверки или вывода
             "speed": speed        # Скорость показа абакусов, передаём в шаблон для анимации
         })
@@ -2783,52 +2085,23 @@ def configure_class_games(request, class_id):
         games = request.POST.getlist('games')
         enabled_list = request.POST.getlist('enabled')
         
-        print(f"DEBUG: Получены игры: {games}")
-        print(f"DEBUG: Получены состояния: {enabled_list}")
-        
         if games and enabled_list:
-            # Обновляем доступ ко всем играм
-            for i, game_code in enumerate(games):
-                if i < len(enabled_list):
-                    is_enabled = enabled_list[i] == 'true'
-                    print(f"DEBUG: Обновляем игру {game_code} -> {is_enabled}")
-                    
-                    # Создаем или обновляем доступ к игре
-                    game_access, created = ClassGameAccess.objects.get_or_create(
-                        class_group=class_obj,
-                        game=game_code,
-                        defaults={'is_enabled': is_enabled}
-                    )
-                    if not created:
-                        game_access.is_enabled = is_enabled
-                        game_access.save()
-                    
-                    print(f"DEBUG: {'Создана' if created else 'Обновлена'} запись для игры {game_code}")
+            # Обновляем доступ ко всем играм одним запросом
+            states = {
+                game_code: is_enabled == 'true'
+                for game_code, is_enabled in zip(games, enabled_list)
+            }
+            save_class_games(class_obj.id, states)
             
             messages.success(request, f'Настройки игр для класса обновлены')
             return redirect('configure_class_games', class_id=class_id)
     
-    # Получаем все доступные игры
-    available_games = ClassGameAccess.GAME_CHOICES
-    
-    # Получаем текущие настройки для класса
-    current_access = {}
-    print(f"DEBUG: Получаем настройки игр для класса {class_obj.name}")
-    for game_code, game_name in available_games:
-        try:
-            access = ClassGameAccess.objects.get(class_group=class_obj, game=game_code)
-            current_access[game_code] = access.is_enabled
-            print(f"DEBUG: Игра {game_code} -> {access.is_enabled}")
-        except ClassGameAccess.DoesNotExist:
-            current_access[game_code] = False
-            print(f"DEBUG: Игра {game_code} -> не найдена в БД")
-    
-    print(f"DEBUG: Итоговые настройки: {current_access}")
-    
     context = {
         'class_obj': class_obj,
-        'available_games': available_games,
-        'current_access': current_access,
+        # Игры, доступ к которым настраивает учитель (из реестра)
+        'available_games': CLASS_GAMES,
+        # Текущие настройки класса одним запросом
+        'current_access': class_games_access(class_obj.id),
     }
     
     return render(request, 'configure_class_games.html', context)
@@ -2894,6 +2167,35 @@ def attendance_update(request):
     
     return JsonResponse({'success': False, 'error': 'Только POST запросы'})
 
+@login_required
+def attendance_update_batch(request):
+    """
+    Пакетное обновление табеля через AJAX: {"changes": [{student_id, date, field, value}, ...]},
+    field — 'attendance' или 'payment'. Доступ ко всем ученикам проверяется одним запросом,
+    изменения применяются в одной транзакции.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Только POST запросы'})
+    
+    teacher_profile = getattr(request.user, 'teacher_profile', None)
+    if teacher_profile is None:
+        return JsonResponse({'success': False, 'error': 'Нет доступа к этому классу'})
+    
+    try:
+        data = json.loads(request.body)
+        changes = parse_attendance_changes(data.get('changes') if isinstance(data, dict) else None)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Неверный формат JSON'})
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    
+    student_classes = teacher_student_classes(teacher_profile, (student_id for student_id, _, _ in changes))
+    if any(student_id not in student_classes for student_id, _, _ in changes):
+        return JsonResponse({'success': False, 'error': 'Нет доступа к этому классу'})
+    
+    updated, created = apply_attendance_changes(student_classes, changes)
+    return JsonResponse({'success': True, 'updated': updated, 'created': created})
+
 def save_game_settings(user, game_type, settings_data):
     """Сохраняет настройки игры для пользователя"""
     try:
@@ -2922,120 +2224,62 @@ def load_game_settings(user, game_type):
         print(f"Ошибка загрузки настроек: {e}")
         return None
 
+@player_required
 def multiplication_table(request):
     """
     Представление для игры "Таблица умножения"
     """
-    # Проверяем авторизацию ученика или учителя
-    if not request.session.get('student_id') and not (hasattr(request.user, 'teacher_profile') and request.user.teacher_profile.status == 'approved'):
-        return redirect('student_login')
-    
     return render(request, 'multiplication_table.html')
 
 
+@player_required
 def brothers_game(request):
     """
     Представление для игры "Братья"
     """
-    # Проверяем авторизацию ученика или учителя
-    if not request.session.get('student_id') and not (hasattr(request.user, 'teacher_profile') and request.user.teacher_profile.status == 'approved'):
-        return redirect('student_login')
-    
-    # Цепочка примеров для Брат 1 однозначные (64 примера × 8 чисел)
-    brother1_chain = ''
-    chain1_path = settings.BASE_DIR / 'цепочка_примеров_брат1.txt'
-    if chain1_path.exists():
-        with open(chain1_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and (line.startswith('+') or line.startswith('-')):
-                    brother1_chain = line
-                    break
-    
-    # Цепочка примеров для Брат 1 двузначные (64 примера × 8 чисел)
-    brother1_chain_dvuznach = ''
-    chain1_dvuznach_path = settings.BASE_DIR / 'цепочка_примеров_брат1_двузначные.txt'
-    if chain1_dvuznach_path.exists():
-        with open(chain1_dvuznach_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and (line.startswith('+') or line.startswith('-')):
-                    brother1_chain_dvuznach = line
-                    break
-    
-    # Цепочка примеров для Брат 2 однозначные (64 примера × 8 чисел)
-    brother2_chain = ''
-    chain2_path = settings.BASE_DIR / 'цепочка_примеров_брат2.txt'
-    if chain2_path.exists():
-        with open(chain2_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and (line.startswith('+') or line.startswith('-')):
-                    brother2_chain = line
-                    break
-    
-    # Цепочка примеров для Брат 2 двузначные (64 примера × 8 чисел)
-    brother2_chain_dvuznach = ''
-    chain2_dvuznach_path = settings.BASE_DIR / 'цепочка_примеров_брат2_двузначные.txt'
-    if chain2_dvuznach_path.exists():
-        with open(chain2_dvuznach_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and (line.startswith('+') or line.startswith('-')):
-                    brother2_chain_dvuznach = line
-                    break
-    
-    # Цепочка примеров для Брат 3 однозначные (64 примера × 8 чисел)
-    brother3_chain = ''
-    chain3_path = settings.BASE_DIR / 'цепочка_примеров_брат3.txt'
-    if chain3_path.exists():
-        with open(chain3_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and (line.startswith('+') or line.startswith('-')):
-                    brother3_chain = line
-                    break
-    
-    # Цепочка примеров для Брат 4 однозначные (64 примера × 8 чисел)
-    brother4_chain = ''
-    chain_path = settings.BASE_DIR / 'цепочка_примеров_брат4.txt'
-    if chain_path.exists():
-        with open(chain_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and (line.startswith('+') or line.startswith('-')):
-                    brother4_chain = line
-                    break
-    
-    # Цепочка примеров для Брат 3 двузначные (64 примера × 8 чисел)
-    brother3_chain_dvuznach = ''
-    chain3_dvuznach_path = settings.BASE_DIR / 'цепочка_примеров_брат3_двузначные.txt'
-    if chain3_dvuznach_path.exists():
-        with open(chain3_dvuznach_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and (line.startswith('+') or line.startswith('-')):
-                    brother3_chain_dvuznach = line
-                    break
-    
-    # Цепочка примеров для Брат 4 двузначные (64 примера × 8 чисел)
-    brother4_chain_dvuznach = ''
-    chain_dvuznach_path = settings.BASE_DIR / 'цепочка_примеров_брат4_двузначные.txt'
-    if chain_dvuznach_path.exists():
-        with open(chain_dvuznach_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and (line.startswith('+') or line.startswith('-')):
-                    brother4_chain_dvuznach = line
-                    break
-    
-    return render(request, 'brothers_game.html', {
-        'brother1_chain': brother1_chain,
-        'brother1_chain_dvuznach': brother1_chain_dvuznach,
-        'brother2_chain': brother2_chain,
-        'brother2_chain_dvuznach': brother2_chain_dvuznach,
-        'brother3_chain': brother3_chain,
-        'brother3_chain_dvuznach': brother3_chain_dvuznach,
-        'brother4_chain': brother4_chain,
-        'brother4_chain_dvuznach': brother4_chain_dvuznach,
-    })
\ No newline at end of file
+    # Цепочки примеров не встраиваются в страницу: клиент запрашивает
+    # только нужную часть цепочки через brothers_chain
+    return render(request, 'brothers_game.html')
+
+
+@player_required_json
+def brothers_chain(request):
+    """
+    Часть цепочки примеров для игры "Братья" (JSON).
+    Параметры: formula (brothers, friends, friend_brother; по умолчанию brothers),
+    brother — номер формулы (брат 1-4, друг 1-9, друг+брат 6-9),
+    digits (1 — однозначные, 2 — двузначные),
+    start — номер первого примера, count — количество примеров (оба по кругу цепочки).
+    """
+    formula = request.GET.get('formula', 'brothers')
+    try:
+        brother = int(request.GET.get('brother', 1))
+        digits = int(request.GET.get('digits', 1))
+        start = max(0, int(request.GET.get('start', 0)))
+        count = max(1, min(int(request.GET.get('count', 1)), 64))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Неверные параметры'})
+
+    found = get_examples(formula, brother, digits, start, count)
+    if found is None:
+        return JsonResponse({'success': False, 'error': 'Цепочка не найдена'})
+    start, total, examples, version = found
+
+    # ETag зависит от версии цепочки (файла или пула) и запрошенной части
+    etag = quote_etag(f'{formula}-{brother}-{digits}-{start}-{count}-{version}')
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = JsonResponse({
+        'success': True,
+        'formula': formula,
+        'brother': brother,
+        'digits': digits,
+        'start': start,
+        'total': total,
+        'examples': examples,
+    })
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
\ No newline at end of file
@@ -0,0 +1,129 @@
+// Раунд игры на клиенте: пакет примеров загружается одним запросом,
+// ответы проверяются в браузере, результаты отправляются одним запросом в конце.
+// Без JavaScript форма выбора работает по-старому (пример за примером через сервер).
+
+(function () {
+    function formatNumber(number) {
+        return number > 0
+            ? `<span class="positive-number">+${number}</span>`
+            : `<span class="negative-number">${number}</span>`;
+    }
+
+    function parseAnswer(value) {
+        const text = value.trim();
+        return /^-?\d+$/.test(text) ? parseInt(text, 10) : null;
+    }
+
+    function startRound(form, round, pack) {
+        const progress = round.querySelector('[data-role="progress"]');
+        const problem = round.querySelector('[data-role="problem"]');
+        const answerForm = round.querySelector('[data-role="answer-form"]');
+        const answerInput = round.querySelector('[data-role="answer"]');
+        const submitButton = answerForm.querySelector('button');
+        const feedback = round.querySelector('[data-role="feedback"]');
+        const summary = round.querySelector('[data-role="summary"]');
+
+        const answers = [];
+        const startedAt = Date.now();
+        let index = 0;
+        let waitingForNext = false;
+
+        function showProblem() {
+            const [first, second] = pack.problems[index];
+            progress.textContent = `Пример ${index + 1} из ${pack.problems.length}`;
+            problem.innerHTML = `${formatNumber(first)} × ${formatNumber(second)} = ?`;
+            feedback.textContent = '';
+            answerInput.value = '';
+            answerInput.disabled = false;
+            submitButton.textContent = 'Проверить';
+            answerInput.focus();
+        }
+
+        function finishRound() {
+            answerForm.style.display = 'none';
+            problem.textContent = '';
+            feedback.textContent = '';
+            progress.textContent = 'Раунд завершен';
+
+            fetch(form.dataset.resultsUrl, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': form.querySelector('[name=csrfmiddlewaretoken]').value,
+                },
+                body: JSON.stringify({answers: answers, duration_ms: Date.now() - startedAt}),
+            })
+                .then(response => response.json())
+                .then(data => {
+                    const correct = data.success ? data.correct : answers.filter((a, i) => a === pack.answers[i]).length;
+                    summary.innerHTML = `Правильно ${correct} из ${pack.problems.length}`;
+                })
+                .catch(() => {
+                    const correct = answers.filter((a, i) => a === pack.answers[i]).length;
+                    summary.innerHTML = `Правильно ${correct} из ${pack.problems.length}`;
+                });
+        }
+
+        answerForm.addEventListener('submit', function (event) {
+            event.preventDefault();
+
+            if (waitingForNext) {
+                waitingForNext = false;
+                index += 1;
+                if (index < pack.problems.length) {
+                    showProblem();
+                } else {
+                    finishRound();
+                }
+                return;
+            }
+
+            const answer = parseAnswer(answerInput.value);
+            if (answer === null) {
+                feedback.style.color = 'red';
+                feedback.textContent = 'Введите целое число';
+                return;
+            }
+
+            answers.push(answer);
+            if (answer === pack.answers[index]) {
+                feedback.style.color = 'green';
+                feedback.textContent = 'Верно! Молодец!';
+            } else {
+                feedback.style.color = 'red';
+                feedback.textContent = `Неверно! Правильный ответ: ${pack.answers[index]}`;
+            }
+            answerInput.disabled = true;
+            submitButton.textContent = index + 1 < pack.problems.length ? 'Далее' : 'Завершить';
+            waitingForNext = true;
+            submitButton.focus();
+        });
+
+        form.closest('.form-container').style.display = 'none';
+        round.style.display = '';
+        showProblem();
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        const form = document.getElementById('operation-form');
+        const round = document.getElementById('pack-round');
+        if (!form || !round || !form.dataset.packUrl || !window.fetch) {
+            return;
+        }
+
+        form.addEventListener('submit', function (event) {
+            event.preventDefault();
+
+            fetch(form.dataset.packUrl, {method: 'POST', body: new FormData(form)})
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        throw new Error(data.error);
+                    }
+                    startRound(form, round, data);
+                })
+                // Если пакет получить не удалось, продолжаем по-старому через сервер
+                .catch(() => form.submit());
+        });
+    });
+})();